@@ -57,6 +57,12 @@ def load_env():
     log.info(f"Running in {os.getenv("ENV")}")
 
 
+# A preset may also set a "timeout" (in seconds), after which its ffmpeg commands are killed,
+# "segments", the number of segments rendered in parallel by the "segmented" render mode, and
+# "preview_preset", a preset rendering a quick preview of the video before the final render (see
+# generate_video_from_content). "max_height" and "max_bitrate" cap the size of single pass renders.
+# "renditions" lists the presets of other files rendered alongside the final video (from the same
+# ffmpeg graph in single pass mode), each written to the output dir as its "file_name" (see OutputSpec).
 ffmpeg_config = {
     "default": {
         "preset": "medium",
@@ -64,6 +70,11 @@ ffmpeg_config = {
         "capture_stdout": True,
         "capture_stderr": True,
         "global_args": ["-loglevel", "error"],
+        "render_mode": "single_pass",
+        "loop_mode": "copy",
+        "intermediates": "scratch",
+        "preview_preset": "preview",
+        "renditions": ["poster"],
     },
     "medium_debug": {
         "preset": "medium",
@@ -71,6 +82,10 @@ ffmpeg_config = {
         "capture_stdout": False,
         "capture_stderr": True,
         "global_args": [],
+        # Keep the intermediate files around (in the output dir) for debugging
+        "render_mode": "three_step",
+        "loop_mode": "copy",
+        "intermediates": "output_dir",
     },
     "test": {
         "preset": "ultrafast",
@@ -78,6 +93,9 @@ ffmpeg_config = {
         "capture_stdout": False,
         "capture_stderr": True,
         "global_args": [],
+        "render_mode": "single_pass",
+        "loop_mode": "copy",
+        "intermediates": "scratch",
     },
     "production_ssh": {
         "preset": "slow",
@@ -85,10 +103,59 @@ ffmpeg_config = {
         "capture_stdout": False,
         "capture_stderr": False,
         "global_args": ["-loglevel", "info"],
+        "render_mode": "single_pass",
+        "loop_mode": "copy",
+        "intermediates": "scratch",
+        "preview_preset": "preview",
+        "renditions": ["poster"],
+    },
+    "parallel": {
+        "preset": "medium",
+        "crf": 23,
+        "capture_stdout": True,
+        "capture_stderr": True,
+        "global_args": ["-loglevel", "error"],
+        # Split the render across the encode slots, for long videos on many cores
+        "render_mode": "segmented",
+        "segments": 4,
+        "loop_mode": "copy",
+        "intermediates": "scratch",
+        "preview_preset": "preview",
+        "renditions": ["poster"],
+    },
+    "preview": {
+        "preset": "ultrafast",
+        "crf": 28,
+        "capture_stdout": True,
+        "capture_stderr": True,
+        "global_args": ["-loglevel", "error"],
+        # Only used for the quick preview shown while the final video renders
+        "render_mode": "single_pass",
+        "file_name": "preview.mp4",
+        "max_height": 540,
+        "max_bitrate": "800k",
+        "loop_mode": "copy",
+        "intermediates": "scratch",
+    },
+    "poster": {
+        "format": "jpeg",
+        "file_name": "poster.jpg",
+        "max_height": 720,
+    },
+    "animated_preview": {
+        "format": "webp",
+        "file_name": "preview.webp",
+        "max_height": 360,
+        "duration": 3,
+        "fps": 10,
+        "quality": 60,
     },
     "low_quality": {
         "preset": "ultrafast",
         "crf": 28,
+        "render_mode": "single_pass",
+        "loop_mode": "copy",
+        "intermediates": "scratch",
     },
 }
 
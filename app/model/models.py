@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql.sqltypes import Enum
+from sqlalchemy.dialects import sqlite
 
 Base = declarative_base()
 
@@ -13,6 +14,8 @@ class Job(Base):
     reddit_post = Column(String, nullable=False)
     background_video = Column(String, nullable=False)
     final_video_path = Column(String, nullable=True)
+    # A quick, low resolution render, available while the final video is rendered
+    preview_video_path = Column(String, nullable=True)
     size = Column(String, nullable=True)
     step = Column(
         Enum(
@@ -21,6 +24,7 @@ class Job(Base):
             "generating_srt",
             "generating_title_image",
             "generating_background_video",
+            "generating_preview",
             "generating_final_video",
             name="step_types",
         ),
@@ -31,5 +35,37 @@ class Job(Base):
         default="pending",
     )
     error_msg = Column(String, nullable=True)
-    created_at = Column(DateTime, default=func.now())
+    # SQLite stores func.now() to the second, so values compared to it (ie the cursors of the job list)
+    # are bound in the same format, rather than with microseconds
+    created_at = Column(
+        DateTime().with_variant(
+            sqlite.DATETIME(
+                storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+            ),
+            "sqlite",
+        ),
+        default=func.now(),
+    )
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    # The job list is paginated newest first on (created_at, id), optionally filtered by status
+    __table_args__ = (
+        Index("ix_jobs_created_at_id", "created_at", "id"),
+        Index("ix_jobs_status_created_at_id", "status", "created_at", "id"),
+    )
+
+
+class JobStep(Base):
+    """A step of a job, from the time the job entered it to the time it left it (None while it's in it)."""
+
+    __tablename__ = "job_steps"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False)
+    step = Column(String, nullable=False)
+    # UTC, taken when the transition happened, rather than when it was written
+    started_at = Column(DateTime, nullable=False)
+    ended_at = Column(DateTime, nullable=True)
+
+    # The steps of a job are looked up (and the open one closed) by job
+    __table_args__ = (Index("ix_job_steps_job_id_started_at", "job_id", "started_at"),)
@@ -1,8 +1,29 @@
+from datetime import datetime, timezone
+from sqlalchemy import and_, case, func, insert, literal, or_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 import os
 
-from app.model.models import Job
+from app.model.models import Job, JobStep
+
+# Jobs shown per page of the job list
+JOBS_PAGE_SIZE = 30
+JOB_STATUSES = Job.status.type.enums
+# Characters of the post shown in the job list
+POST_PREVIEW_LENGTH = 100
+# The columns of the job list, the post is left out as it can be long
+JOB_LIST_COLUMNS = (
+    Job.id,
+    Job.reddit_title,
+    Job.final_video_path,
+    Job.preview_video_path,
+    Job.size,
+    Job.step,
+    Job.status,
+    Job.error_msg,
+    Job.created_at,
+    Job.updated_at,
+)
 
 
 async def add_job(
@@ -21,45 +42,214 @@ async def add_job(
     return new_job
 
 
+def utcnow() -> datetime:
+    # Naive, as the DateTime columns are
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def _transition_step(
+    session: AsyncSession, job_id: int, step: str | None, at: datetime
+):
+    """Close the open step of the job at the given time, and open the given one, if any."""
+    await session.execute(
+        update(JobStep)
+        .where(JobStep.job_id == job_id, JobStep.ended_at.is_(None))
+        .values(ended_at=at)
+    )
+    if step:
+        await session.execute(
+            insert(JobStep).values(job_id=job_id, step=step, started_at=at)
+        )
+
+
 async def update_job_step(
-    session: AsyncSession, job_id: int, step: str, final_video_path=""
+    session: AsyncSession,
+    job_id: int,
+    step: str,
+    final_video_path="",
+    at: datetime | None = None,
 ) -> Job:
+    """
+    Move the job to the given step, or complete it (step 'completed', with its final video).
+
+    The job is updated in one UPDATE ... RETURNING statement, and the transition recorded in its
+    job_steps, with the time it happened at (so it can be written after the fact, see JobWriter).
+
+    Args:
+        session (AsyncSession): The database session.
+        job_id (int): The ID of the job.
+        step (str): The new step of the job, or 'completed'.
+        final_video_path (str): The path to the final video, when completing the job.
+        at (datetime): When the job moved to the step (UTC), defaults to now.
+
+    Returns:
+        Job: The updated job.
+    """
+    at = at or utcnow()
+    # Sized before the transaction, so the write lock isn't held on a stat
+    size = None
+    if final_video_path:
+        size = f"{os.path.getsize(final_video_path) / 1024 / 1024:.2f} MB"
+
+    # update job to processing if previously pending, or failed and now retried
+    restarted = Job.status.in_(("pending", "failed"))
+    values = {
+        "status": case(
+            (restarted, literal("processing", Job.status.type)), else_=Job.status
+        ),
+        "error_msg": case((restarted, None), else_=Job.error_msg),
+    }
+    # if we 'complete a job' we set the status to completed, but dont change the step
+    if step == "completed":
+        values["status"] = "completed"
+    else:
+        values["step"] = step
+
+    if final_video_path:
+        values["final_video_path"] = final_video_path
+        values["size"] = size
+
     async with session.begin():
-        stmt = select(Job).filter_by(id=job_id)
-        result = await session.execute(stmt)
+        result = await session.execute(
+            update(Job).where(Job.id == job_id).values(**values).returning(Job)
+        )
         job = result.scalar_one()
-        # update job to processing if previously pending
-        if job.status == "pending":
-            job.status = "processing"
-
-        # if we 'complete a job' we set the status to completed, but dont change the step
-        if step == "completed":
-            job.status = "completed"
-        else:
-            job.step = step
-
-        if final_video_path:
-            job.final_video_path = final_video_path
-            file_size = os.path.getsize(final_video_path)
-            job.size = f"{file_size / 1024 / 1024:.2f} MB"
-        await session.commit()
+        await _transition_step(
+            session, job_id, None if step == "completed" else step, at
+        )
     return job
 
 
-async def fail_job(session: AsyncSession, job_id: int, error_msg: str) -> Job:
+async def set_job_preview(
+    session: AsyncSession, job_id: int, preview_video_path: str
+) -> Job:
     async with session.begin():
-        stmt = select(Job).filter_by(id=job_id)
-        result = await session.execute(stmt)
+        result = await session.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(preview_video_path=preview_video_path)
+            .returning(Job)
+        )
+        return result.scalar_one()
+
+
+async def fail_job(
+    session: AsyncSession, job_id: int, error_msg: str, at: datetime | None = None
+) -> Job:
+    async with session.begin():
+        result = await session.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(status="failed", error_msg=error_msg)
+            .returning(Job)
+        )
         job = result.scalar_one()
-        job.status = "failed"
-        job.error_msg = error_msg
-        await session.commit()
+        await _transition_step(session, job_id, None, at or utcnow())
     return job
 
 
-async def get_jobs(session: AsyncSession) -> list[Job]:
+async def get_job_steps(session: AsyncSession, job_id: int) -> list:
+    """Get the steps of a job in the order it went through them, with how long each took (None while in it)."""
+    async with session.begin():
+        result = await session.execute(
+            select(JobStep.step, JobStep.started_at, JobStep.ended_at)
+            .where(JobStep.job_id == job_id)
+            .order_by(JobStep.started_at, JobStep.id)
+        )
+        return [
+            {
+                "step": step,
+                "started_at": started_at,
+                "ended_at": ended_at,
+                "duration": (
+                    (ended_at - started_at).total_seconds() if ended_at else None
+                ),
+            }
+            for step, started_at, ended_at in result.all()
+        ]
+
+
+def encode_jobs_cursor(created_at: datetime, id: int) -> str:
+    """The cursor of the jobs after the given job, see get_jobs_page."""
+    return f"{created_at.isoformat()}_{id}"
+
+
+def decode_jobs_cursor(cursor: str) -> tuple:
+    """
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    created_at, id = cursor.rsplit("_", 1)
+    return datetime.fromisoformat(created_at), int(id)
+
+
+def _select_job_list():
+    """Selects the columns of the job list, with the start (and length) of the post."""
+    return select(
+        *JOB_LIST_COLUMNS,
+        func.substr(Job.reddit_post, 1, POST_PREVIEW_LENGTH).label("post_preview"),
+        func.length(Job.reddit_post).label("post_length"),
+    )
+
+
+async def get_jobs_page(
+    session: AsyncSession,
+    limit: int = JOBS_PAGE_SIZE,
+    status: str | None = None,
+    cursor: str | None = None,
+) -> tuple:
+    """
+    Get a page of jobs, newest first.
+
+    Pages are keyed on the (created_at, id) of the last job of the previous page, so every page is
+    an index range scan, however far down the list it is. Only the columns of the job list are
+    loaded, with the start of the post (see get_job_post for the whole post).
+
+    Args:
+        session (AsyncSession): The database session.
+        limit (int): The max number of jobs of the page.
+        status (str): Only get the jobs of this status, if given.
+        cursor (str): The cursor returned with the previous page, None for the first page.
+
+    Returns:
+        tuple: The jobs of the page, and the cursor of the next page (None if this is the last page).
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    stmt = _select_job_list()
+    if status:
+        stmt = stmt.where(Job.status == status)
+    if cursor:
+        created_at, id = decode_jobs_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                Job.created_at < created_at,
+                and_(Job.created_at == created_at, Job.id < id),
+            )
+        )
+    # One more job than the page, to know whether there is a next page
+    stmt = stmt.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1)
+
     async with session.begin():
-        stmt = select(Job).order_by(Job.id.desc())
         result = await session.execute(stmt)
-        jobs = result.scalars().all()
-    return jobs
+        jobs = result.all()
+
+    if len(jobs) <= limit:
+        return jobs, None
+    jobs = jobs[:limit]
+    return jobs, encode_jobs_cursor(jobs[-1].created_at, jobs[-1].id)
+
+
+async def get_job_summary(session: AsyncSession, job_id: int):
+    """Get a job as listed by get_jobs_page, None if there is no such job."""
+    async with session.begin():
+        result = await session.execute(_select_job_list().where(Job.id == job_id))
+        return result.one_or_none()
+
+
+async def get_job_post(session: AsyncSession, job_id: int) -> str | None:
+    """Get the whole post of a job, None if there is no such job."""
+    async with session.begin():
+        result = await session.execute(select(Job.reddit_post).filter_by(id=job_id))
+        return result.scalar_one_or_none()
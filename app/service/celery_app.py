@@ -1,11 +1,16 @@
 from celery import Celery
 import app.config
-import os
+from app.service.job_events import redis_url
 
-redis_url = os.getenv("REDIS_URL", "127.0.0.0.1")
-redis_port = os.getenv("REDIS_PORT", "6379")
-redis_db = os.getenv("REDIS_DB", "0")
+celery_app = Celery("worker", broker=redis_url())
 
-celery_app = Celery("worker", broker=f"redis://{redis_url}:{redis_port}/{redis_db}")
+# Final renders go to their own queue. Workers consume their queues in the order given to -Q
+# (ie "-Q celery,render"), so new jobs get their preview before any queued final render starts
+celery_app.conf.task_routes = {
+    "app.service.task.render_final_video": {"queue": "render"}
+}
+celery_app.conf.broker_transport_options = {"queue_order_strategy": "priority"}
+# Don't reserve tasks from the render queue while a preview could be picked up instead
+celery_app.conf.worker_prefetch_multiplier = 1
 
 import app.service.task
@@ -1,4 +1,11 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event, inspect, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import (
+    create_async_engine,
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+)
 from typing import AsyncGenerator
 import os
 
@@ -6,7 +13,75 @@ import os
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./video_jobs.db")
 print(DATABASE_URL)
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Set on every SQLite connection. The web app and the workers write to the same file, so:
+SQLITE_PRAGMAS = {
+    # Readers don't wait on the writer (and the writer doesn't wait on readers)
+    "journal_mode": "WAL",
+    # Only syncs on checkpoints, which is safe with WAL (a power loss can only lose the last commits)
+    "synchronous": "NORMAL",
+    # Writers wait for the lock, rather than failing with 'database is locked'
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS") or 5000),
+    # Reads go through the page cache of the OS, rather than copies
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE") or 256 * 1024**2),
+}
+
+# (pool_size, max_overflow) of each PROCESS_ROLE, overridden by DATABASE_POOL_SIZE and
+# DATABASE_MAX_OVERFLOW. The web app serves concurrent requests, while a worker runs one job at a
+# time (each task disposes of the pool before its event loop closes, see task.py)
+POOL_SIZES = {"web": (5, 10), "worker": (1, 1)}
+
+
+def create_engine(
+    url: str = DATABASE_URL,
+    role: str | None = None,
+    sqlite_pragmas: dict | None = SQLITE_PRAGMAS,
+) -> AsyncEngine:
+    """
+    Create the database engine of the process.
+
+    Args:
+        url (str): The database URL.
+        role (str): The role of the process ('web' or 'worker'), sizing its connection pool.
+            Defaults to PROCESS_ROLE, or 'web'.
+        sqlite_pragmas (dict): The pragmas set on every SQLite connection, None to keep the defaults.
+
+    Returns:
+        AsyncEngine: The engine. SQL statements are only logged in dev (or with DATABASE_ECHO=1).
+
+    Raises:
+        ValueError: If the role is unknown.
+    """
+    role = role or os.getenv("PROCESS_ROLE") or "web"
+    if role not in POOL_SIZES:
+        raise ValueError(
+            f"Unknown process role {role}, expected one of {', '.join(POOL_SIZES)}"
+        )
+    echo = os.getenv("DATABASE_ECHO", "1" if os.getenv("ENV") == "dev" else "0") == "1"
+
+    options = {}
+    # Every in-memory connection is its own database, so keep the default pool of the dialect
+    if ":memory:" not in url:
+        pool_size, max_overflow = POOL_SIZES[role]
+        options = {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": int(os.getenv("DATABASE_POOL_SIZE") or pool_size),
+            "max_overflow": int(os.getenv("DATABASE_MAX_OVERFLOW") or max_overflow),
+        }
+    engine = create_async_engine(url, echo=echo, **options)
+
+    if engine.dialect.name == "sqlite" and sqlite_pragmas:
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in sqlite_pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return engine
+
+
+engine = create_engine()
 AsyncSessionLocal = async_sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -21,6 +96,25 @@ async def init_db():
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_migrate)
+
+
+def _migrate(conn):
+    """Adds the columns, indexes (and enum values) introduced since a database was created"""
+    from app.model.models import Job
+
+    columns = {column["name"] for column in inspect(conn).get_columns("jobs")}
+    if "preview_video_path" not in columns:
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN preview_video_path VARCHAR"))
+
+    for index in Job.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+    # SQLite stores enums as plain strings, Postgres has to be told about new values
+    if conn.dialect.name == "postgresql":
+        conn.execute(
+            text("ALTER TYPE step_types ADD VALUE IF NOT EXISTS 'generating_preview'")
+        )
 
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
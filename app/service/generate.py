@@ -1,33 +1,357 @@
+import json
 import os
+import uuid
+
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import Callable
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 from app.utils.openaitts import OpenAITTS
-from app.utils.image_generator import generate_title_image
+from app.utils.image_generator import TitleCard, render_title_card
 from app.utils.gentle_aligner import GentleAligner
-from app.utils.openai import determine_gender_from_text, improve_content_from_text
+from app.utils.subtitles import write_ass
+from app.utils.openai import analyse_content
+from app.utils.audio import AudioBuffer
+from app.utils.probe import probe_media_async
+from app.utils.scratch import ScratchDir
 from app.utils.ffmpeg import (
-    get_audio_duration,
-    buffer_audio,
     loop_video_to_audio,
-    concatenate_audios,
-    delay_srt,
+    write_loop_concat_list,
     embed_srt_and_audio,
     overlay_image_on_video,
     get_video_dimensions,
-    resize_image,
+    get_title_image_width,
+    render_single_pass,
+    render_outputs,
+    render_segmented,
+    OutputSpec,
     FFMpegProcessingError,
+    FFmpegProgress,
 )
 
-from app.utils.background_video import get_random_chunk_from_video
+from app.utils.background_video import (
+    get_random_chunk_from_video,
+    get_random_chunk_from_pool,
+    load_clip_pool,
+)
 
-from app.repository.job_repository import update_job_step, fail_job
+from app.service.job_writer import JobWriter
+from app.service.pipeline import Manifest, Stage, run_pipeline
 
 import app.config
 
 from app.utils.logger import log
 
+# Seconds of silence added after the title and the content audio
+AUDIO_BUFFER_DURATION = 1
+# Length of the random chunk taken from the base background video, looped to the audio duration
+BACKGROUND_CHUNK_DURATION = 60
+# Written to the output dir when the final render is deferred to its own task
+RENDER_PLAN_FILE = "render_plan.json"
+# Written to the output dir, recording the completed stages of the job, see Manifest
+MANIFEST_FILE = "manifest.json"
+
+
+@dataclass
+class RenderPlan:
+    """
+    Everything needed to render a video once its audio, subtitles and background are ready.
+
+    The plan is saved as JSON when the final render is deferred (after the preview), so it can be
+    picked up by another task. It refers to the intermediate files of the job, which stay in its
+    scratch dir until the final render closes it.
+    """
+
+    id: int | str
+    title: str
+    output_dir: str
+    config_preset: str
+    # The name of the job's scratch dir, None if the intermediates are kept in the output dir
+    scratch_name: str | None
+    background_video: str
+    background_video_duration: float
+    video_width: int
+    # How long the title is shown, ie the duration of the title audio
+    title_duration: float
+    audio: str
+    subtitles: str
+    duration: float
+    # The presets of the other renditions rendered with the final video, see _rendition_spec
+    renditions: list
+
+    def open_scratch(self) -> ScratchDir:
+        if self.scratch_name:
+            return ScratchDir(self.scratch_name)
+        return ScratchDir.in_dir(self.output_dir)
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(asdict(self), f)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r") as f:
+            return cls(**json.load(f))
+
+
+def _rendition_spec(output_dir: str, config_preset: str) -> OutputSpec:
+    """The output of a rendition preset, written to the output dir as the preset's 'file_name'."""
+    file_name = app.config.ffmpeg_config[config_preset]["file_name"]
+    return OutputSpec(os.path.join(output_dir, file_name), config_preset)
+
+
+async def _estimate_video_bytes(video_path: str, duration: float) -> int:
+    """Estimates the size of a chunk of the given video, from its (cached) bit rate."""
+    bit_rate = (await probe_media_async(video_path, sidecar=True)).bit_rate or 0
+    return int(bit_rate * duration / 8)
+
+
+def _log_render_progress(duration: float, writer: JobWriter):
+    """Returns an ffmpeg progress callback, logging how much of the video has been rendered, and publishing it on the job."""
+
+    def on_progress(progress: FFmpegProgress):
+        log.debug(
+            f"Rendered {progress.out_time:.1f}/{duration:.1f}s "
+            f"(frame {progress.frame}, speed {progress.speed}x)"
+        )
+        writer.progress(progress.out_time / duration)
+
+    return on_progress
+
+
+@asynccontextmanager
+async def _fail_job_on_error(
+    writer: JobWriter, will_retry: Callable[[Exception], bool] | None = None
+):
+    """Marks the job as failed if the wrapped stage raises, unless the job will be retried."""
+    try:
+        yield
+    except Exception as e:
+        if isinstance(e, FFMpegProcessingError):
+            log.error(f"{e}: {e.stderr}")
+        else:
+            log.error(f"An unexpected error occurred while generating video: {e}")
+        if will_retry and will_retry(e):
+            # Still processing as far as the job list is concerned
+            log.info("The job will be retried")
+        else:
+            writer.fail(str(e))
+        raise
+
+
+def _update_job_step_on_stage(writer: JobWriter):
+    """Returns a run_pipeline on_stage_start callback, updating the job step of stages that have one."""
+
+    async def on_stage_start(stage: Stage):
+        if stage.step:
+            writer.update_step(stage.step)
+
+    return on_stage_start
+
+
+def _media_stages(
+    title: str,
+    content: str,
+    base_background_video: str,
+    clip_pool: dict | None,
+    scratch: ScratchDir,
+    config_preset: str,
+) -> list:
+    """
+    The stages producing the audio, subtitles, title card and background of a video, see run_pipeline.
+
+    Once the voice is known, the title and content audio are synthesized side by side, and the
+    alignment only waits on the content audio. The title card, and the background chunk (unless it
+    is cut from a clip pool to the length of the audio), are produced while the audio is.
+
+    Every stage but the (cheap) title card checkpoints its outputs in the job manifest, so a rerun
+    of the job doesn't repeat the paid API calls or the encodes that already completed.
+    """
+    openaitts = OpenAITTS()
+    tts_params = {"provider": openaitts.provider, "model": openaitts.model}
+
+    async def analysis() -> tuple:
+        # Determining the voice and improving the audio content, in one concurrent stage
+        analysis = await analyse_content(content)
+        return analysis.gender, analysis.content
+
+    def content_tts(gender: str, improved_content: str) -> str:
+        pre_content_audio = scratch.path("pre_content.mp3")
+        openaitts.generate_mp3(improved_content, gender, pre_content_audio)
+        return pre_content_audio
+
+    def title_tts(gender: str) -> str:
+        pre_title_audio = scratch.path("pre_title.mp3")
+        openaitts.generate_mp3(title, gender, pre_title_audio)
+        return pre_title_audio
+
+    # The TTS output is decoded once, and assembled in memory. Durations come from the sample counts
+    async def content_audio(content_tts: str) -> str:
+        content_audio_buffer = (await AudioBuffer.from_file(content_tts)).pad(
+            "END", AUDIO_BUFFER_DURATION
+        )
+        content_audio = scratch.path("content.wav", content_audio_buffer.samples.nbytes)
+        content_audio_buffer.write_wav(content_audio)
+        return content_audio
+
+    async def title_audio(title_tts: str) -> tuple:
+        pre_title_audio_buffer = await AudioBuffer.from_file(title_tts)
+        title_audio_buffer = pre_title_audio_buffer.pad("END", AUDIO_BUFFER_DURATION)
+        title_audio = scratch.path("title.wav", title_audio_buffer.samples.nbytes)
+        title_audio_buffer.write_wav(title_audio)
+        return title_audio, pre_title_audio_buffer.duration, title_audio_buffer.duration
+
+    def alignment(improved_content: str, content_audio: str) -> list:
+        gentle_aligner = GentleAligner()
+        return gentle_aligner.group_words(
+            gentle_aligner.generate_aligned(improved_content, content_audio)
+        )
+
+    def subtitles(alignment: list, title_audio_duration: float) -> str:
+        # Subtitles start after the title, so they are delayed by the title audio
+        subtitles_file = scratch.path("content.ass")
+        write_ass(alignment, subtitles_file, title_audio_duration)
+        return subtitles_file
+
+    def video_audio(title_audio: str, content_audio: str) -> tuple:
+        # Lossless until the final mux, which is the only lossy audio encode
+        video_audio_buffer = AudioBuffer.concatenate(
+            AudioBuffer.read_wav(title_audio), AudioBuffer.read_wav(content_audio)
+        )
+        video_audio = scratch.path("video.wav", video_audio_buffer.samples.nbytes)
+        video_audio_buffer.write_wav(video_audio)
+        return video_audio, video_audio_buffer.duration
+
+    def title_card() -> tuple:
+        if clip_pool:
+            video_width = clip_pool["width"]
+        else:
+            # Background chunks are stream copies, so share the dimensions of the (cached) base video
+            video_width = get_video_dimensions(base_background_video, sidecar=True)[0]
+        return video_width, render_title_card(title, get_title_image_width(video_width))
+
+    if clip_pool:
+        # With a pool, take a chunk of exactly the length we need from the pre-cut clips
+        async def background(duration: float) -> tuple:
+            background_video = scratch.path(
+                "background.mp4",
+                await _estimate_video_bytes(base_background_video, duration),
+            )
+            await get_random_chunk_from_pool(clip_pool, duration, background_video)
+            return background_video, duration
+
+        background_inputs = ("duration",)
+    else:
+
+        async def background() -> tuple:
+            background_video = scratch.path(
+                "background.mp4",
+                await _estimate_video_bytes(
+                    base_background_video, BACKGROUND_CHUNK_DURATION
+                ),
+            )
+            await get_random_chunk_from_video(
+                base_background_video,
+                BACKGROUND_CHUNK_DURATION,
+                background_video,
+                config_preset,
+            )
+            return background_video, BACKGROUND_CHUNK_DURATION
+
+        background_inputs = ()
+
+    return [
+        Stage(
+            "title_card",
+            title_card,
+            outputs=("video_width", "title_card"),
+            executor="thread",
+            step="generating_title_image",
+        ),
+        Stage(
+            "background",
+            background,
+            background_inputs,
+            outputs=("background_video", "background_video_duration"),
+            step="generating_background_video",
+            checkpoint=True,
+            files=("background_video",),
+            params={
+                "base_background_video": base_background_video,
+                "config_preset": config_preset,
+            },
+        ),
+        Stage(
+            "analysis",
+            analysis,
+            outputs=("gender", "improved_content"),
+            step="generating_audio",
+            checkpoint=True,
+            params={"content": content},
+        ),
+        Stage(
+            "content_tts",
+            content_tts,
+            ("gender", "improved_content"),
+            executor="thread",
+            checkpoint=True,
+            files=("content_tts",),
+            params=tts_params,
+        ),
+        Stage(
+            "title_tts",
+            title_tts,
+            ("gender",),
+            executor="thread",
+            checkpoint=True,
+            files=("title_tts",),
+            params={"title": title, **tts_params},
+        ),
+        Stage(
+            "content_audio",
+            content_audio,
+            ("content_tts",),
+            checkpoint=True,
+            files=("content_audio",),
+        ),
+        Stage(
+            "title_audio",
+            title_audio,
+            ("title_tts",),
+            outputs=("title_audio", "title_duration", "title_audio_duration"),
+            checkpoint=True,
+            files=("title_audio",),
+        ),
+        Stage(
+            "alignment",
+            alignment,
+            ("improved_content", "content_audio"),
+            executor="thread",
+            step="generating_srt",
+            checkpoint=True,
+        ),
+        Stage(
+            "subtitles",
+            subtitles,
+            ("alignment", "title_audio_duration"),
+            executor="thread",
+            checkpoint=True,
+            files=("subtitles",),
+        ),
+        Stage(
+            "video_audio",
+            video_audio,
+            ("title_audio", "content_audio"),
+            outputs=("video_audio", "duration"),
+            executor="thread",
+            checkpoint=True,
+            files=("video_audio",),
+        ),
+    ]
+
 
 async def generate_video_from_content(
     id: int,
@@ -37,16 +361,38 @@ async def generate_video_from_content(
     output_dir: str,
     db: AsyncSession = None,
     config_preset: str = "default",
+    defer_final_render: Callable[[str], None] | None = None,
+    keep_on_failure: bool = False,
+    will_retry: Callable[[Exception], bool] | None = None,
 ):
     """
     Generate a video from the given content.
 
+    The completed stages of the job are recorded in a manifest in the output dir, so running the
+    job again (ie when its task is retried) resumes from the first stage that didn't complete.
+
+    If the preset has a 'preview_preset' and the final render can be deferred, a quick preview is
+    rendered (and linked on the job) as soon as the audio and subtitles exist. The final render is
+    then handed off, by saving its RenderPlan and passing the path to defer_final_render, to be
+    picked up by render_final_video_from_plan. Otherwise the final video is rendered right away.
+
     Args:
         id (int): The ID of the video.
         title (str): The title of the video.
         content (str): The content of the video.
         base_background_video (str): The path to the base background video.
         output_dir (str): The directory where the generated media will be saved.
+        db (AsyncSession): The database session used to track the job, if any.
+        config_preset (str): The ffmpeg configuration preset to use. Its 'render_mode' decides
+            whether the final video is rendered in a single ffmpeg pass, in segments encoded in
+            parallel, or in three steps, and its
+            'intermediates' whether the intermediate files are kept in the output dir, or in a
+            (RAM backed) scratch dir, so only the final video is written to the output dir.
+        defer_final_render (callable): Called with the path of the render plan, to queue the final render.
+        keep_on_failure (bool): Whether to keep the scratch dir of the job if it fails, for a retry
+            to resume from. See discard_job_intermediates.
+        will_retry (callable): Called with the error the job failed with, returns whether the job
+            will be retried, in which case it isn't marked as failed.
 
     Raises:
         FFMpegProcessingError: If an error occurs during video processing using ffmpeg.
@@ -55,119 +401,325 @@ async def generate_video_from_content(
     Returns:
         None
     """
+    settings = app.config.ffmpeg_config.get(
+        config_preset, app.config.ffmpeg_config["default"]
+    )
+    manifest = Manifest(os.path.join(output_dir, MANIFEST_FILE))
+    if settings.get("intermediates", "output_dir") == "scratch":
+        # A rerun of the job picks up the intermediates its previous run kept
+        scratch_name = (
+            manifest.data.get("scratch_name") or f"job-{id}-{uuid.uuid4().hex[:8]}"
+        )
+        manifest.data["scratch_name"] = scratch_name
+        scratch = ScratchDir(scratch_name)
+    else:
+        scratch_name = None
+        scratch = ScratchDir.in_dir(output_dir)
+
+    # The scratch dir is handed off with the render plan when the final render is deferred
+    deferred = False
+    completed = False
     try:
-        log.info("Generating video from content")
-        log.debug(f"Config preset: {config_preset}")
-        log.debug(f"ID: {id}")
-        log.debug(f"Title: {title}")
-        log.debug(f"Content: {content}")
-        log.debug(f"Base Background Video: {base_background_video}")
-        log.debug(f"Output Directory: {output_dir}")
-
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Generating audio
-        if db:
-            await update_job_step(db, id, "generating_audio")
-        gender = determine_gender_from_text(content)
-
-        # Improving audio content
-        content = improve_content_from_text(content)
+        async with JobWriter(db, id) as writer, _fail_job_on_error(writer, will_retry):
+            log.info("Generating video from content")
+            log.debug(f"Config preset: {config_preset}")
+            log.debug(f"ID: {id}")
+            log.debug(f"Title: {title}")
+            log.debug(f"Content: {content}")
+            log.debug(f"Base Background Video: {base_background_video}")
+            log.debug(f"Output Directory: {output_dir}")
+
+            os.makedirs(output_dir, exist_ok=True)
+
+            clip_pool = load_clip_pool(base_background_video)
+            values, report = await run_pipeline(
+                _media_stages(
+                    title,
+                    content,
+                    base_background_video,
+                    clip_pool,
+                    scratch,
+                    config_preset,
+                ),
+                on_stage_start=_update_job_step_on_stage(writer),
+                manifest=manifest,
+            )
+            log.info(f"Media of job {id} generated:\n{report.format()}")
+            title_card = values["title_card"]
+
+            plan = RenderPlan(
+                id=id,
+                title=title,
+                output_dir=output_dir,
+                config_preset=config_preset,
+                scratch_name=scratch_name,
+                background_video=values["background_video"],
+                background_video_duration=values["background_video_duration"],
+                video_width=values["video_width"],
+                title_duration=values["title_duration"],
+                audio=values["video_audio"],
+                subtitles=values["subtitles"],
+                duration=values["duration"],
+                renditions=list(settings.get("renditions", [])),
+            )
+
+            preview_preset = settings.get("preview_preset")
+            if preview_preset and not defer_final_render:
+                # Nobody is waiting on the preview, render it with the final video
+                plan.renditions.append(preview_preset)
+            if preview_preset and defer_final_render:
+                await _render_preview(plan, title_card, preview_preset, writer)
+
+                plan_path = os.path.join(output_dir, RENDER_PLAN_FILE)
+                plan.save(plan_path)
+                defer_final_render(plan_path)
+                deferred = True
+                log.info(f"Final render deferred, with render plan {plan_path}")
+                return
+
+            await _render_final_video(plan, scratch, writer, title_card)
+            completed = True
+    finally:
+        if completed or not (deferred or keep_on_failure):
+            scratch.close()
+
+
+async def render_final_video_from_plan(
+    plan_path: str,
+    db: AsyncSession = None,
+    keep_on_failure: bool = False,
+    will_retry: Callable[[Exception], bool] | None = None,
+):
+    """
+    Render the final video of a job from the render plan saved by generate_video_from_content.
 
-        openaitts = OpenAITTS()
-        pre_content_audio = os.path.join(output_dir, "pre_content.mp3")
-        openaitts.generate_mp3(content, gender, pre_content_audio)
+    The scratch dir of the job, and the plan itself, are removed once the video is rendered.
 
-        content_audio = os.path.join(output_dir, "content.mp3")
-        buffer_audio(pre_content_audio, "END", 1, content_audio)
+    Args:
+        plan_path (str): The path to the render plan.
+        db (AsyncSession): The database session used to track the job, if any.
+        keep_on_failure (bool): Whether to keep the plan and the scratch dir if the render fails,
+            for a retry. See discard_job_intermediates.
+        will_retry (callable): Called with the error the render failed with, returns whether it
+            will be retried, in which case the job isn't marked as failed.
 
-        pre_title_audio = os.path.join(output_dir, "pre_title.mp3")
-        openaitts.generate_mp3(title, gender, pre_title_audio)
-        pre_title_audio_duration = get_audio_duration(pre_title_audio)
+    Raises:
+        FFMpegProcessingError: If an error occurs during video processing using ffmpeg.
+        Exception: If an unexpected error occurs.
+    """
+    plan = RenderPlan.load(plan_path)
+    scratch = plan.open_scratch()
 
-        title_audio = os.path.join(output_dir, "title.mp3")
-        buffer_audio(pre_title_audio, "END", 1, title_audio)
-        title_audio_duration = get_audio_duration(title_audio)
+    completed = False
+    try:
+        async with JobWriter(db, plan.id) as writer, _fail_job_on_error(
+            writer, will_retry
+        ):
+            await _render_final_video(plan, scratch, writer)
+        completed = True
+    finally:
+        if completed or not keep_on_failure:
+            scratch.close()
+            os.remove(plan_path)
+
+
+def discard_job_intermediates(output_dir: str):
+    """
+    Remove the scratch dir and render plan kept for a retry of a failed job (see keep_on_failure),
+    once it won't be retried.
 
-        # Generating SRT
-        if db:
-            await update_job_step(db, id, "generating_srt")
-        gentle_aligner = GentleAligner()
-        aligned_text = gentle_aligner.generate_aligned(content, content_audio)
-
-        srt_file = os.path.join(output_dir, "content.srt")
-        gentle_aligner.generate_srt(aligned_text, srt_file)
-
-        # Generating Title image
-        if db:
-            await update_job_step(db, id, "generating_title_image")
-        title_image = os.path.join(output_dir, "title_image.png")
-        generate_title_image(title_image, title)
-
-        # Generating background video
-        if db:
-            await update_job_step(db, id, "generating_background_video")
-        video_audio = os.path.join(output_dir, "video.mp3")
-        concatenate_audios(title_audio, content_audio, video_audio)
-        total_video_audio_length = get_audio_duration(video_audio)
-
-        background_video = os.path.join(output_dir, "background.mp4")
-        get_random_chunk_from_video(
-            base_background_video, 60, background_video, config_preset
+    The manifest is kept, so a manual rerun still reuses the stages that don't depend on the
+    removed files (ie the OpenAI analysis).
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = Manifest(manifest_path)
+    scratch_name = manifest.data.pop("scratch_name", None)
+    if scratch_name:
+        log.info(f"Removing the scratch dir {scratch_name} of the failed job")
+        ScratchDir(scratch_name).close()
+    if os.path.exists(manifest_path):
+        manifest.save()
+
+    plan_path = os.path.join(output_dir, RENDER_PLAN_FILE)
+    if os.path.exists(plan_path):
+        os.remove(plan_path)
+
+
+async def _render_preview(
+    plan: RenderPlan, title_card: TitleCard, preview_preset: str, writer: JobWriter
+):
+    """Render a quick, low resolution preview of the video to the output dir, and link it on the job."""
+    writer.update_step("generating_preview")
+
+    preview_video = _rendition_spec(plan.output_dir, preview_preset).path
+    await render_single_pass(
+        plan.background_video,
+        title_card,
+        plan.title_duration,
+        plan.audio,
+        plan.subtitles,
+        plan.duration,
+        preview_video,
+        preview_preset,
+        plan.video_width,
+        on_progress=_log_render_progress(plan.duration, writer),
+    )
+
+    log.info(f"Preview video generated at {preview_video}")
+    writer.set_preview(preview_video)
+
+
+async def _render_final_video(
+    plan: RenderPlan,
+    scratch: ScratchDir,
+    writer: JobWriter,
+    title_card: TitleCard | None = None,
+):
+    """Render the final video of the plan to the output dir, and complete the job."""
+    output_dir = plan.output_dir
+    config_preset = plan.config_preset
+    settings = app.config.ffmpeg_config.get(
+        config_preset, app.config.ffmpeg_config["default"]
+    )
+
+    background_video = plan.background_video
+    background_video_duration = plan.background_video_duration
+    pre_title_audio_duration = plan.title_duration
+    video_audio = plan.audio
+    subtitles_file = plan.subtitles
+    total_video_audio_length = plan.duration
+    video_width = plan.video_width
+    if title_card is None:
+        title_card = render_title_card(plan.title, get_title_image_width(video_width))
+
+    render_mode = settings.get("render_mode", "three_step")
+    log.debug(f"Render mode: {render_mode}")
+
+    final_video = os.path.join(output_dir, "final.mp4")
+    renditions = [_rendition_spec(output_dir, preset) for preset in plan.renditions]
+
+    if render_mode in ("single_pass", "segmented"):
+        # Generating final video
+        writer.update_step("generating_final_video")
+
+        if render_mode == "segmented":
+            await render_segmented(
+                background_video,
+                title_card,
+                pre_title_audio_duration,
+                video_audio,
+                subtitles_file,
+                total_video_audio_length,
+                final_video,
+                config_preset,
+                video_width,
+                on_progress=_log_render_progress(total_video_audio_length, writer),
+                concat_list_path=scratch.path(
+                    "segments.ffconcat",
+                    await _estimate_video_bytes(
+                        background_video, total_video_audio_length
+                    ),
+                ),
+            )
+        else:
+            # The renditions are split from the same graph, so they only cost their own encode
+            await render_outputs(
+                background_video,
+                title_card,
+                pre_title_audio_duration,
+                video_audio,
+                subtitles_file,
+                total_video_audio_length,
+                [OutputSpec(final_video, config_preset), *renditions],
+                config_preset,
+                video_width,
+                on_progress=_log_render_progress(total_video_audio_length, writer),
+            )
+    else:
+        if settings.get("loop_mode", "reencode") == "copy":
+            # Feed the looped background to the overlay as a concat list, no intermediate file
+            looped_background_video = await write_loop_concat_list(
+                total_video_audio_length,
+                background_video,
+                scratch.path("looped_background.ffconcat"),
+                background_video_duration,
+            )
+        else:
+            looped_background_video = scratch.path(
+                "looped_background.mp4",
+                await _estimate_video_bytes(background_video, total_video_audio_length),
+            )
+            await loop_video_to_audio(
+                total_video_audio_length,
+                background_video,
+                looped_background_video,
+                config_preset,
+                background_video_duration,
+            )
+
+        # overlay_image_on_video reads the title image from a file
+        title_image_file = scratch.path("title_image.png")
+        title_card.image.save(title_image_file)
+
+        overlayed_video = scratch.path(
+            "overlayed.mp4",
+            await _estimate_video_bytes(background_video, total_video_audio_length),
         )
-
-        looped_background_video = os.path.join(output_dir, "looped_background.mp4")
-        loop_video_to_audio(
-            total_video_audio_length,
-            background_video,
+        await overlay_image_on_video(
             looped_background_video,
+            title_image_file,
+            pre_title_audio_duration,
+            overlayed_video,
             config_preset,
+            f"(W-{title_card.full_width})/2+{title_card.left}",
+            f"(H-{title_card.full_height})/2+{title_card.top}",
+            on_progress=_log_render_progress(total_video_audio_length, writer),
         )
 
-        video_width = get_video_dimensions(looped_background_video)[0]
-        resized_title_image = os.path.join(output_dir, "resized_title_image.png")
-        resize_image(title_image, video_width, resized_title_image)
+        # Generating final video
+        writer.update_step("generating_final_video")
 
-        overlayed_video = os.path.join(output_dir, "overlayed.mp4")
-        overlay_image_on_video(
-            looped_background_video,
-            resized_title_image,
-            pre_title_audio_duration,
+        await embed_srt_and_audio(
             overlayed_video,
+            video_audio,
+            subtitles_file,
+            final_video,
             config_preset,
+            on_progress=_log_render_progress(total_video_audio_length, writer),
         )
 
-        # Generating final video
-        if db:
-            await update_job_step(db, id, "generating_final_video")
-        delayed_srt_file = os.path.join(output_dir, "delayed_content.srt")
-        delay_srt(srt_file, title_audio_duration, delayed_srt_file)
-
-        final_video = os.path.join(output_dir, "final.mp4")
-        embed_srt_and_audio(
-            overlayed_video, video_audio, delayed_srt_file, final_video, config_preset
+    if renditions and render_mode != "single_pass":
+        # The other render modes don't share a graph with the renditions, so they get their own pass
+        await render_outputs(
+            background_video,
+            title_card,
+            pre_title_audio_duration,
+            video_audio,
+            subtitles_file,
+            total_video_audio_length,
+            renditions,
+            config_preset,
+            video_width,
         )
 
-        log.info(f"Final video generated at {final_video}")
-        if db:
-            await update_job_step(db, id, "completed", final_video)
-
-        # Clean up temporary files, if in production to save disk space
-        if os.getenv("ENV") == "prod":
-            try:
-                for file in os.listdir(output_dir):
-                    if file != "final.mp4":
-                        os.remove(os.path.join(output_dir, file))
-            except Exception as e:
-                log.error(f"Error while cleaning up temporary files: {e}")
-
-    except FFMpegProcessingError as e:
-        log.error(f"{e}: {e.stderr}")
-        if db:
-            await fail_job(db, id, str(e))
-        raise
-    except Exception as e:
-        log.error(f"An unexpected error occurred while generating video: {e}")
-        if db:
-            await fail_job(db, id, str(e))
-        raise
+    log.info(f"Final video generated at {final_video}")
+    preview_preset = settings.get("preview_preset")
+    if preview_preset in plan.renditions:
+        writer.set_preview(_rendition_spec(output_dir, preview_preset).path)
+    writer.update_step("completed", final_video)
+
+    # Clean up temporary files, if in production to save disk space
+    if os.getenv("ENV") == "prod":
+        try:
+            keep = {"final.mp4", RENDER_PLAN_FILE, MANIFEST_FILE}
+            # The preview linked on the job, also when rendered before a deferred render
+            keep.update(
+                app.config.ffmpeg_config[preset]["file_name"]
+                for preset in [*plan.renditions, preview_preset]
+                if preset
+            )
+            for file in os.listdir(output_dir):
+                if file not in keep:
+                    os.remove(os.path.join(output_dir, file))
+        except Exception as e:
+            log.error(f"Error while cleaning up temporary files: {e}")
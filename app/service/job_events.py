@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+
+from typing import AsyncGenerator
+
+import anyio
+import redis
+import redis.asyncio
+
+from app.utils.logger import log
+
+# The Redis channel workers publish the events of their jobs on, see /events
+JOB_EVENTS_CHANNEL = "job_events"
+# Seconds a subscriber waits for an event before yielding a heartbeat
+HEARTBEAT_INTERVAL = 15
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def redis_url() -> str:
+    """The URL of the Redis server, also the Celery broker."""
+    host = os.getenv("REDIS_URL", "127.0.0.0.1")
+    port = os.getenv("REDIS_PORT", "6379")
+    db = os.getenv("REDIS_DB", "0")
+    return f"redis://{host}:{port}/{db}"
+
+
+def _get_client() -> redis.Redis:
+    # Shared by the jobs (and their writer threads) of the process
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = redis.Redis.from_url(
+                redis_url(), socket_connect_timeout=1, socket_timeout=1
+            )
+        return _client
+
+
+def job_state_event(job) -> dict:
+    """The event of the state of a job, as written to the database."""
+    return {
+        "id": job.id,
+        "status": job.status,
+        "step": job.step,
+        "error_msg": job.error_msg,
+        "size": job.size,
+        "final_video_path": job.final_video_path,
+        "preview_video_path": job.preview_video_path,
+        # Formatted as the job list formats it
+        "updated_at": str(job.updated_at),
+    }
+
+
+def publish_job_event(event: dict):
+    """
+    Publish an event of a job (its state, see job_state_event, or its render progress) to the
+    subscribers of JOB_EVENTS_CHANNEL.
+
+    Events are only pushed to the pages open at the time, so a failure to publish is logged, rather
+    than raised.
+    """
+    try:
+        _get_client().publish(JOB_EVENTS_CHANNEL, json.dumps(event))
+    except redis.RedisError as e:
+        log.error(f"Error publishing the event of job {event.get('id')}: {e}")
+
+
+async def subscribe_job_events() -> AsyncGenerator[dict | None, None]:
+    """
+    Yields the events of the jobs as they are published, or None if there was no event for
+    HEARTBEAT_INTERVAL seconds (to keep the connection of the subscriber alive). Cancelling the
+    subscriber (ie when its page is closed) unsubscribes it.
+
+    Raises:
+        redis.RedisError: If the Redis server can't be reached.
+    """
+    client = redis.asyncio.Redis.from_url(redis_url())
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(JOB_EVENTS_CHANNEL)
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=HEARTBEAT_INTERVAL
+            )
+            yield json.loads(message["data"]) if message else None
+    finally:
+        # A cancel scope (ie of a response whose client disconnected) cancels every await under it,
+        # which would leave the connection open
+        with anyio.CancelScope(shield=True):
+            await pubsub.aclose()
+            await client.aclose()
@@ -0,0 +1,113 @@
+import asyncio
+
+from time import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repository.job_repository import (
+    update_job_step,
+    set_job_preview,
+    fail_job,
+    utcnow,
+)
+from app.service.job_events import job_state_event, publish_job_event
+from app.utils.logger import log
+
+# Min seconds between the render progress events of a job
+PROGRESS_INTERVAL = 1
+
+
+class JobWriter:
+    """
+    Writes the state of a job (its step, preview and failure) to the database in the background.
+
+    Writes are queued, and made one at a time, in order, by a task of the writer, which is the only
+    user of the database session. So the render pipeline never waits on the database (ie on the lock
+    of SQLite, held by another worker). Step transitions are timestamped when they are queued, so the
+    job_steps of the job are accurate however late they are written.
+
+    Once written, the state of the job is published to the pages watching it (see job_events), along
+    with the progress of its renders.
+
+    A failed write is logged, rather than failing the job. Closing the writer waits for the queued writes.
+    """
+
+    def __init__(self, db: AsyncSession | None, job_id: int):
+        """
+        Args:
+            db (AsyncSession): The database session used to track the job, None to not track it.
+            job_id (int): The ID of the job.
+        """
+        self.db = db
+        self.job_id = job_id
+        self._step = None
+        self._progress_time = 0.0
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def update_step(self, step: str, final_video_path: str = ""):
+        """Queue the move of the job to the step (see update_job_step), unless it's already in it."""
+        if step == self._step:
+            return
+        self._step = step
+        self._submit(self._write, update_job_step, step, final_video_path, at=utcnow())
+
+    def set_preview(self, preview_video_path: str):
+        self._submit(self._write, set_job_preview, preview_video_path)
+
+    def fail(self, error_msg: str):
+        self._submit(self._write, fail_job, error_msg, at=utcnow())
+
+    def progress(self, progress: float):
+        """Queue an event of the progress (0 to 1) of the render of the current step, at most every PROGRESS_INTERVAL."""
+        if progress < 1 and time() - self._progress_time < PROGRESS_INTERVAL:
+            return
+        self._progress_time = time()
+        self._submit(
+            asyncio.to_thread,
+            publish_job_event,
+            {
+                "id": self.job_id,
+                "step": self._step,
+                "progress": round(min(progress, 1), 3),
+            },
+        )
+
+    async def _write(self, write, *args, **kwargs):
+        start_time = time()
+        job = await write(self.db, self.job_id, *args, **kwargs)
+        log.debug(f"Wrote the state of job {self.job_id} in {time() - start_time:.3f}s")
+        await asyncio.to_thread(publish_job_event, job_state_event(job))
+
+    def _submit(self, write, *args, **kwargs):
+        if not self.db:
+            return
+        # Started on the first write, from the event loop of the job
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self._queue.put_nowait((write, args, kwargs))
+
+    async def _run(self):
+        while True:
+            write, args, kwargs = await self._queue.get()
+            if write is None:
+                return
+
+            try:
+                await write(*args, **kwargs)
+            except Exception as e:
+                log.error(f"Error writing the state of job {self.job_id}: {e}")
+
+    async def close(self):
+        """Wait for the queued writes to be made."""
+        if self._task is None:
+            return
+        self._queue.put_nowait((None, (), {}))
+        await self._task
+        self._task = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
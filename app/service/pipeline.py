@@ -0,0 +1,334 @@
+import asyncio
+import json
+import os
+
+from dataclasses import dataclass, field
+from time import time
+from typing import Any, Awaitable, Callable
+
+from app.utils.disk_cache import hash_file, make_cache_key
+from app.utils.logger import log
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    A stage of a pipeline.
+
+    The stage is called with the values of its inputs as keyword arguments, once they have all been
+    produced. Its return value is its output, named after the stage, or, if it declares several
+    outputs, a tuple of their values, in order.
+    """
+
+    name: str
+    run: Callable[..., Any]
+    inputs: tuple = ()
+    # The names of the values produced by the stage. Defaults to the name of the stage
+    outputs: tuple = ()
+    # "async" to await run on the event loop, for I/O bound stages (requests, ffmpeg subprocesses),
+    # "thread" to call it in a worker thread, for blocking or CPU bound stages
+    executor: str = "async"
+    # The job step reported when the stage starts, if any
+    step: str | None = None
+    # Whether the outputs of the stage are recorded in the manifest of the run, so the stage is
+    # skipped when resuming. Its inputs and outputs must then be JSON serializable
+    checkpoint: bool = False
+    # The outputs of the stage that are paths to files, recorded with the hash of their content
+    files: tuple = ()
+    # The parameters of the stage other than its inputs, a change of which invalidates its checkpoint
+    params: dict = field(default_factory=dict)
+
+    @property
+    def output_names(self) -> tuple:
+        return self.outputs or (self.name,)
+
+
+@dataclass(frozen=True)
+class StageTiming:
+    name: str
+    # Seconds since the start of the pipeline
+    start: float
+    end: float
+    # The stages producing the inputs of the stage
+    depends_on: tuple
+    # Whether the outputs were taken from the manifest, rather than running the stage
+    resumed: bool = False
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class PipelineReport:
+    """The timings of the stages of a pipeline run, and its critical path."""
+
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def total(self) -> float:
+        return max((timing.end for timing in self.timings.values()), default=0.0)
+
+    @property
+    def critical_path(self) -> list:
+        """
+        The chain of stages that decided how long the pipeline took.
+
+        Starting from the stage finishing last, each stage is preceded by the dependency that
+        finished last, ie the one it was waiting on. Shortening any other stage doesn't make the
+        pipeline faster.
+        """
+        if not self.timings:
+            return []
+
+        path = [max(self.timings.values(), key=lambda timing: timing.end)]
+        while path[-1].depends_on:
+            path.append(
+                max(
+                    (self.timings[name] for name in path[-1].depends_on),
+                    key=lambda timing: timing.end,
+                )
+            )
+        return [timing.name for timing in reversed(path)]
+
+    def format(self) -> str:
+        critical_path = self.critical_path
+        lines = [
+            f"Pipeline took {self.total:.2f}s, critical path: {' -> '.join(critical_path)}"
+        ]
+        for timing in sorted(self.timings.values(), key=lambda timing: timing.start):
+            marker = "*" if timing.name in critical_path else " "
+            lines.append(
+                f"{marker} {timing.name:20} {timing.start:7.2f}s -> {timing.end:7.2f}s "
+                f"({'resumed' if timing.resumed else f'{timing.duration:.2f}s'})"
+            )
+        return "\n".join(lines)
+
+
+class Manifest:
+    """
+    The checkpoint of a pipeline run, saved as JSON next to the outputs of the job.
+
+    It records the outputs of each completed stage (that checkpoints), the hashes of its files, and
+    the key of the parameters and inputs it ran with. When the pipeline is run again, a stage whose
+    key is unchanged and whose files are intact is skipped, so the run resumes from the first
+    invalid stage. Other values can be kept in 'data', ie the scratch dir of the job.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "r") as f:
+                self.data = json.load(f)
+        except FileNotFoundError:
+            self.data = {}
+        except ValueError:
+            log.error(f"Ignoring the invalid manifest {path}")
+            self.data = {}
+
+    @property
+    def stages(self) -> dict:
+        return self.data.setdefault("stages", {})
+
+    def lookup(self, name: str, key: str) -> dict | None:
+        """Returns the recorded outputs of the stage, if they are still valid for the key."""
+        entry = self.stages.get(name)
+        if not entry or entry["key"] != key:
+            return None
+
+        for path, file_hash in entry["files"].values():
+            if not os.path.isfile(path) or hash_file(path) != file_hash:
+                log.info(f"File {path} of stage {name} changed, running it again")
+                return None
+        return entry["outputs"]
+
+    def file_hashes(self, name: str) -> dict:
+        """Returns the hash of each file output of the stage."""
+        return {
+            output: file_hash
+            for output, (_, file_hash) in self.stages[name]["files"].items()
+        }
+
+    def record(self, name: str, key: str, outputs: dict, files: tuple):
+        """Record the outputs of a completed stage, hashing those that are files."""
+        self.stages[name] = {
+            "key": key,
+            "outputs": outputs,
+            "files": {
+                output: (outputs[output], hash_file(outputs[output]))
+                for output in files
+            },
+        }
+
+    def save(self):
+        # Written to a temporary file and renamed into place, so a crash never leaves half a manifest
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.data, f)
+        os.replace(temp_path, self.path)
+
+
+def _producers(stages: list, initial: dict) -> dict:
+    """Returns the stage producing each value, checking the graph can be run."""
+    producers = {}
+    for stage in stages:
+        if stage.executor not in ("async", "thread"):
+            raise ValueError(
+                f"Unknown executor {stage.executor} for stage {stage.name}"
+            )
+        for output in stage.output_names:
+            if output in producers or output in initial:
+                raise ValueError(f"Value {output} is produced more than once")
+            producers[output] = stage.name
+
+    for stage in stages:
+        for input in stage.inputs:
+            if input not in producers and input not in initial:
+                raise ValueError(f"No stage produces {input}, needed by {stage.name}")
+
+    # Every stage must eventually be runnable, ie the graph has no cycle
+    available = set(initial)
+    remaining = list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if available.issuperset(stage.inputs)]
+        if not ready:
+            raise ValueError(
+                f"Stages {', '.join(stage.name for stage in remaining)} depend on each other"
+            )
+        for stage in ready:
+            available.update(stage.output_names)
+            remaining.remove(stage)
+
+    return producers
+
+
+def _stage_key(stage: Stage, inputs: dict, file_hashes: dict) -> str:
+    # Input files are identified by their content, as recorded by the stages producing them
+    return make_cache_key(
+        stage.name,
+        stage.params,
+        inputs,
+        {input: file_hashes[input] for input in stage.inputs if input in file_hashes},
+    )
+
+
+async def _run_stage(stage: Stage, kwargs: dict):
+    if stage.executor == "thread":
+        return await asyncio.to_thread(stage.run, **kwargs)
+    return await stage.run(**kwargs)
+
+
+async def run_pipeline(
+    stages: list,
+    initial: dict | None = None,
+    on_stage_start: Callable[[Stage], Awaitable[None]] | None = None,
+    manifest: Manifest | None = None,
+) -> tuple:
+    """
+    Run the stages of a pipeline, each as soon as its inputs have been produced.
+
+    Independent stages run concurrently. If a stage fails, the stages still running are cancelled
+    and the error is raised (stages in worker threads run to completion, but their output is dropped).
+
+    Args:
+        stages (list): The stages of the pipeline.
+        initial (dict): The values available to the stages from the start.
+        on_stage_start (callable): Awaited before each stage starts, one at a time (ie to update the
+            job step, without sharing the database session between concurrent stages).
+        manifest (Manifest): The manifest to resume from, and record the stages that checkpoint in.
+
+    Returns:
+        tuple: The values produced by the pipeline (including the initial ones), and the PipelineReport of the run.
+
+    Raises:
+        ValueError: If an input isn't produced by any stage, or stages depend on each other.
+        Exception: The error of the first stage that failed.
+    """
+    values = dict(initial or {})
+    producers = _producers(stages, values)
+
+    report = PipelineReport()
+    file_hashes = {}
+    pending = list(stages)
+    running = {}
+    start_time = time()
+
+    def record_timing(stage: Stage, stage_start: float, resumed: bool = False):
+        report.timings[stage.name] = StageTiming(
+            stage.name,
+            stage_start,
+            time() - start_time,
+            tuple(dict.fromkeys(producers[i] for i in stage.inputs if i in producers)),
+            resumed,
+        )
+
+    try:
+        while pending or running:
+            ready = [
+                stage for stage in pending if all(i in values for i in stage.inputs)
+            ]
+            while ready:
+                for stage in ready:
+                    pending.remove(stage)
+                    inputs = {i: values[i] for i in stage.inputs}
+
+                    key = None
+                    if manifest and stage.checkpoint:
+                        key = _stage_key(stage, inputs, file_hashes)
+                        outputs = await asyncio.to_thread(
+                            manifest.lookup, stage.name, key
+                        )
+                        if outputs is not None:
+                            log.info(f"Resuming stage {stage.name} from the manifest")
+                            values.update(outputs)
+                            file_hashes.update(manifest.file_hashes(stage.name))
+                            record_timing(stage, time() - start_time, resumed=True)
+                            continue
+
+                    if on_stage_start:
+                        await on_stage_start(stage)
+                    log.debug(f"Starting stage {stage.name}")
+                    task = asyncio.create_task(_run_stage(stage, inputs))
+                    running[task] = (stage, time() - start_time, key)
+
+                # Resumed stages may have made others ready
+                ready = [
+                    stage for stage in pending if all(i in values for i in stage.inputs)
+                ]
+
+            if not running:
+                continue
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stage, stage_start, key = running.pop(task)
+                result = task.result()
+                record_timing(stage, stage_start)
+                log.debug(
+                    f"Stage {stage.name} took {report.timings[stage.name].duration:.2f}s"
+                )
+
+                if stage.outputs:
+                    if len(result) != len(stage.outputs):
+                        raise ValueError(
+                            f"Stage {stage.name} returned {len(result)} values, "
+                            f"expected {len(stage.outputs)}"
+                        )
+                    outputs = dict(zip(stage.outputs, result))
+                else:
+                    outputs = {stage.name: result}
+                values.update(outputs)
+
+                if key:
+                    await asyncio.to_thread(
+                        manifest.record, stage.name, key, outputs, stage.files
+                    )
+                    manifest.save()
+                    file_hashes.update(manifest.file_hashes(stage.name))
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    return values, report
@@ -1,12 +1,58 @@
 from app.service.celery_app import celery_app
-from app.service.generate import generate_video_from_content
-from app.service.database import AsyncSessionLocal
+from app.service.generate import (
+    generate_video_from_content,
+    render_final_video_from_plan,
+    discard_job_intermediates,
+)
+from app.service.database import AsyncSessionLocal, engine
+from app.utils.http_client import close_async_clients
 import asyncio
+import os
 
+from functools import partial
 
-@celery_app.task(name="app.service.task.generate_video")
+import httpx
+import openai
+import redis
+
+# Transient failures, worth retrying: a provider or Redis that can't be reached, or timing out.
+# Others (ie a missing background video, or a bad input failing ffmpeg the same way every time)
+# fail the job at once. OpenAI wraps the transport errors of httpx in APIConnectionError
+RETRYABLE_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    httpx.TransportError,
+    openai.APIConnectionError,
+    redis.RedisError,
+)
+
+# Jobs resume from their manifest (see generate_video_from_content), so a retry doesn't repeat the
+# OpenAI and TTS calls, or the encodes, that completed before the failure
+RETRY_OPTIONS = {
+    # Acknowledged once done, so the task of a worker that crashed is redelivered
+    "acks_late": True,
+    "reject_on_worker_lost": True,
+    "autoretry_for": RETRYABLE_ERRORS,
+    "max_retries": 2,
+    "retry_backoff": True,
+}
+
+
+def _will_retry(task, error: Exception) -> bool:
+    """Whether the task will be retried after failing with the error."""
+    return (
+        isinstance(error, RETRYABLE_ERRORS) and task.request.retries < task.max_retries
+    )
+
+
+@celery_app.task(name="app.service.task.generate_video", bind=True, **RETRY_OPTIONS)
 def generate_video(
-    job_id: int, title: str, content: str, base_background_video: str, output_dir: str
+    self,
+    job_id: int,
+    title: str,
+    content: str,
+    base_background_video: str,
+    output_dir: str,
 ):
     async def run_task():
         loop = asyncio.new_event_loop()
@@ -15,9 +61,49 @@ def generate_video(
         try:
             async with AsyncSessionLocal() as db:
                 await generate_video_from_content(
-                    job_id, title, content, base_background_video, output_dir, db
+                    job_id,
+                    title,
+                    content,
+                    base_background_video,
+                    output_dir,
+                    db,
+                    defer_final_render=render_final_video.delay,
+                    keep_on_failure=True,
+                    will_retry=partial(_will_retry, self),
                 )
         finally:
+            # Pooled connections are bound to the event loop of the task
+            await engine.dispose()
+            await close_async_clients()
             loop.close()
 
-    asyncio.run(run_task())
+    try:
+        asyncio.run(run_task())
+    except Exception as e:
+        if not _will_retry(self, e):
+            discard_job_intermediates(output_dir)
+        raise
+
+
+# Routed to the lower priority 'render' queue, so previews of new jobs aren't stuck behind final renders
+@celery_app.task(name="app.service.task.render_final_video", bind=True, **RETRY_OPTIONS)
+def render_final_video(self, plan_path: str):
+    async def run_task():
+        try:
+            async with AsyncSessionLocal() as db:
+                await render_final_video_from_plan(
+                    plan_path,
+                    db,
+                    keep_on_failure=True,
+                    will_retry=partial(_will_retry, self),
+                )
+        finally:
+            await engine.dispose()
+            await close_async_clients()
+
+    try:
+        asyncio.run(run_task())
+    except Exception as e:
+        if not _will_retry(self, e):
+            discard_job_intermediates(os.path.dirname(plan_path))
+        raise
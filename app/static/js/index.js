@@ -26,3 +26,170 @@ document.addEventListener('DOMContentLoaded', function() {
         localStorage.setItem('background_video', background_video.value);
     })
 })
+
+document.addEventListener('DOMContentLoaded', function() {
+    const status_filter = document.getElementById('status-filter');
+    const job_cards = document.getElementById('job-cards');
+    const load_more = document.getElementById('load-more');
+    const loaded_posts = new Set();
+
+    status_filter.addEventListener('change', function() {
+        window.location.search = status_filter.value ? '?status=' + encodeURIComponent(status_filter.value) : '';
+    })
+
+    // The job list only has the start of each post, the whole post is fetched when its tooltip is opened
+    job_cards.addEventListener('mouseover', function(e) {
+        const see_more = e.target.closest('[data-post-id]');
+        if (!see_more || loaded_posts.has(see_more.dataset.postId)) {
+            return;
+        }
+        loaded_posts.add(see_more.dataset.postId);
+
+        fetch('/api/jobs/' + see_more.dataset.postId + '/post')
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.json();
+            })
+            .then(function(data) {
+                document.getElementById('tooltip-' + see_more.dataset.postId).textContent = data.reddit_post;
+            })
+            .catch(function(error) {
+                console.log(error);
+                loaded_posts.delete(see_more.dataset.postId);
+            });
+    })
+
+    load_more.addEventListener('click', function() {
+        const params = new URLSearchParams({ cursor: load_more.dataset.nextCursor });
+        if (status_filter.value) {
+            params.set('status', status_filter.value);
+        }
+        load_more.disabled = true;
+
+        fetch('/jobs?' + params)
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                load_more.dataset.nextCursor = response.headers.get('X-Next-Cursor');
+                return response.text();
+            })
+            .then(function(html) {
+                job_cards.insertAdjacentHTML('beforeend', html);
+                if (typeof initTooltips === 'function') {
+                    // Attach the tooltips of the new cards
+                    initTooltips();
+                }
+                if (!load_more.dataset.nextCursor) {
+                    load_more.classList.add('hidden');
+                }
+            })
+            .catch(function(error) {
+                console.log(error);
+            })
+            .finally(function() {
+                load_more.disabled = false;
+            });
+    })
+})
+
+// Job cards are updated in place from the events the workers publish, rather than reloading the list
+document.addEventListener('DOMContentLoaded', function() {
+    const status_filter = document.getElementById('status-filter');
+    const job_cards = document.getElementById('job-cards');
+    const live_status = document.getElementById('live-status');
+    const status_colors = { failed: 'bg-red-100', completed: 'bg-green-100' };
+    const fetching_cards = new Set();
+
+    // As media_url in webapp.py, files are served from /media/<job_id>/<file_name>
+    function mediaUrl(path) {
+        return path ? '/media/' + path.split('/').slice(-2).join('/') : '';
+    }
+
+    function setField(card, field, value) {
+        card.querySelectorAll('[data-field="' + field + '"]').forEach(function(element) {
+            if (element.tagName === 'A') {
+                element.href = mediaUrl(value) + ('download' in element.dataset ? '?download=true' : '');
+            } else {
+                // As the job list renders missing values
+                element.textContent = value === null ? 'None' : value;
+            }
+        });
+    }
+
+    function updateJobCard(card, job) {
+        card.classList.remove('bg-red-100', 'bg-green-100', 'bg-white');
+        card.classList.add(status_colors[job.status] || 'bg-white');
+
+        ['status', 'step', 'error_msg', 'size', 'updated_at', 'final_video_path', 'preview_video_path'].forEach(function(field) {
+            setField(card, field, job[field]);
+        });
+        // The progress is of the previous step
+        setField(card, 'progress', '');
+
+        const shown = {
+            completed: job.status === 'completed',
+            preview: job.status === 'processing' && !!job.preview_video_path,
+            processing: job.status === 'processing',
+            failed: job.status === 'failed',
+        };
+        card.querySelectorAll('[data-show]').forEach(function(section) {
+            section.classList.toggle('hidden', !shown[section.dataset.show]);
+        });
+    }
+
+    function addJobCard(job) {
+        // Only new jobs are added, to the top of the list if it shows them
+        if (fetching_cards.has(job.id) || job.status !== 'pending' || (status_filter.value && status_filter.value !== job.status)) {
+            return;
+        }
+        fetching_cards.add(job.id);
+
+        fetch('/jobs/' + job.id)
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.text();
+            })
+            .then(function(html) {
+                if (!document.getElementById('job-' + job.id)) {
+                    job_cards.insertAdjacentHTML('afterbegin', html);
+                    if (typeof initTooltips === 'function') {
+                        initTooltips();
+                    }
+                }
+            })
+            .catch(function(error) {
+                console.log(error);
+            })
+            .finally(function() {
+                fetching_cards.delete(job.id);
+            });
+    }
+
+    const events = new EventSource('/events');
+
+    events.addEventListener('open', function() {
+        live_status.textContent = 'Live';
+    })
+
+    events.addEventListener('error', function() {
+        // The browser reconnects by itself
+        live_status.textContent = 'Reconnecting...';
+    })
+
+    events.addEventListener('job', function(e) {
+        const job = JSON.parse(e.data);
+        const card = document.getElementById('job-' + job.id);
+        if (!card) {
+            addJobCard(job);
+        } else if ('progress' in job) {
+            setField(card, 'progress', '(' + Math.round(job.progress * 100) + '%)');
+        } else {
+            updateJobCard(card, job);
+        }
+    })
+})
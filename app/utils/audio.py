@@ -0,0 +1,109 @@
+import ffmpeg
+import numpy as np
+import wave
+
+from app.utils.ffmpeg_runner import run_ffmpeg
+from app.utils.logger import log
+
+# All audio is decoded to 16-bit mono PCM at this rate, so buffers can be joined directly
+SAMPLE_RATE = 44100
+
+
+class AudioBuffer:
+    """
+    Decoded 16-bit mono PCM audio, held in memory.
+
+    Padding and concatenation happen on the samples, and durations are derived from the sample
+    count, so assembling the audio of a video costs one decode per input and no lossy re-encodes.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int = SAMPLE_RATE):
+        self.samples = samples.astype(np.int16, copy=False)
+        self.sample_rate = sample_rate
+
+    @classmethod
+    async def from_file(cls, audio_path: str, sample_rate: int = SAMPLE_RATE):
+        """
+        Decode an audio file into PCM.
+
+        Args:
+            audio_path (str): The path to the audio file.
+            sample_rate (int): The sample rate to resample the audio to.
+
+        Raises:
+            FFMpegProcessingError: If an error occurs during the FFmpeg command execution.
+        """
+        log.info("Decoding audio...")
+        log.debug("Audio path: %s", audio_path)
+
+        command = (
+            ffmpeg.input(audio_path)
+            .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=sample_rate)
+            .global_args("-loglevel", "error")
+        )
+        out = await run_ffmpeg(
+            command, "Error during decode audio ffmpeg command", capture_stdout=True
+        )
+
+        return cls(np.frombuffer(out, dtype=np.int16), sample_rate)
+
+    @classmethod
+    def read_wav(cls, wav_path: str):
+        """Read a WAV file written by write_wav, without going through ffmpeg."""
+        with wave.open(wav_path, "rb") as f:
+            if f.getnchannels() != 1 or f.getsampwidth() != 2:
+                raise ValueError(f"{wav_path} is not 16-bit mono PCM")
+            return cls(
+                np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16),
+                f.getframerate(),
+            )
+
+    @classmethod
+    def concatenate(cls, *buffers: "AudioBuffer"):
+        """Join audio buffers (of the same sample rate) one after the other."""
+        sample_rates = {buffer.sample_rate for buffer in buffers}
+        if len(sample_rates) != 1:
+            raise ValueError(f"Cannot concatenate audio of sample rates {sample_rates}")
+
+        return cls(
+            np.concatenate([buffer.samples for buffer in buffers]), sample_rates.pop()
+        )
+
+    @property
+    def duration(self) -> float:
+        """The duration of the audio in seconds."""
+        return len(self.samples) / self.sample_rate
+
+    def pad(self, pos: str, duration: float):
+        """
+        Return a copy of the audio with silence added at the start or end.
+
+        Args:
+            pos (str): Position to add the silence ('START' or 'END').
+            duration (float): Duration of the silence to add in seconds.
+        """
+        silence = np.zeros(round(duration * self.sample_rate), dtype=np.int16)
+        if pos == "START":
+            samples = np.concatenate([silence, self.samples])
+        elif pos == "END":
+            samples = np.concatenate([self.samples, silence])
+        else:
+            raise ValueError("Invalid position. Use 'START' or 'END'.")
+
+        return AudioBuffer(samples, self.sample_rate)
+
+    def write_wav(self, output_path: str):
+        """
+        Write the audio as a (lossless) WAV file.
+
+        Args:
+            output_path (str): The path to save the WAV file.
+        """
+        log.info("Writing wav...")
+        log.debug("Output path: %s", output_path)
+
+        with wave.open(output_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.sample_rate)
+            f.writeframes(self.samples.tobytes())
@@ -1,14 +1,28 @@
+import asyncio
+import bisect
+import itertools
+import json
 import math
 import sys
 import os
 import random
 
-from app.utils.ffmpeg import get_video_duration, split_video, split_video_at_time
+from app.utils.ffmpeg import (
+    concat_video_clips,
+    get_keyframe_times,
+    split_video,
+    split_video_at_time,
+)
 
 from app.utils.logger import log
+from app.utils.probe import probe_media_async
 
+# Target length of the clips in a background clip pool, the segment muxer cuts at the next keyframe
+POOL_CLIP_DURATION = 10
+POOL_INDEX_FILE = "index.json"
 
-def get_random_chunk_from_video(
+
+async def get_random_chunk_from_video(
     video_path: str, duration: float, output_path: str, config_preset: str = "default"
 ):
     """
@@ -23,7 +37,7 @@ def get_random_chunk_from_video(
 
     log.info(f"Extracting a random {duration} second clip from {video_path}")
 
-    total_duration = get_video_duration(video_path)
+    total_duration = (await probe_media_async(video_path, sidecar=True)).video_duration
     if total_duration <= duration:
         raise ValueError(
             "The video is too short to extract a clip of the desired length"
@@ -39,10 +53,12 @@ def get_random_chunk_from_video(
 
     log.info(f"Extracting a random {duration} second clip from {video_path}")
 
-    split_video_at_time(video_path, start_time, duration, output_path, config_preset)
+    await split_video_at_time(
+        video_path, start_time, duration, output_path, config_preset
+    )
 
 
-def split_video_into_chunks(
+async def split_video_into_chunks(
     video_path: str, into: float, output_path: str, file_name: str
 ):
     """
@@ -56,7 +72,7 @@ def split_video_into_chunks(
     """
     log.info(f"Splitting video {video_path} into {into} parts")
 
-    video_duration = get_video_duration(video_path)
+    video_duration = (await probe_media_async(video_path)).video_duration
     duration_of_chunk = math.ceil(video_duration / into)
 
     log.debug(f"Video duration: {video_duration}")
@@ -64,7 +80,157 @@ def split_video_into_chunks(
 
     file_name_template = f"{output_path}/{file_name}%01d.mp4"
 
-    split_video(video_path, duration_of_chunk, file_name_template)
+    await split_video(video_path, duration_of_chunk, file_name_template)
+
+
+def get_clip_pool_dir(video_path: str) -> str:
+    """Returns the directory the clip pool of a background video is stored in."""
+    return f"{os.path.splitext(video_path)[0]}_pool"
+
+
+async def index_background_video(
+    video_path: str, clip_duration: float = POOL_CLIP_DURATION
+) -> str:
+    """
+    Pre-cuts a background video into a pool of keyframe aligned clips, with an index file
+    describing the start, duration and keyframe offsets of each clip.
+    This is an offline step, so picking a chunk at job time doesn't need to probe the video.
+
+    Args:
+        video_path (str): The path of the background video to index.
+        clip_duration (float): The target duration of each clip in the pool.
+
+    Returns:
+        str: The path to the index file of the pool.
+    """
+    log.info(f"Indexing background video {video_path} into {clip_duration}s clips")
+
+    pool_dir = get_clip_pool_dir(video_path)
+    os.makedirs(pool_dir, exist_ok=True)
+    for file in os.listdir(pool_dir):
+        os.remove(os.path.join(pool_dir, file))
+
+    # The segment muxer only cuts on keyframes, so every clip starts with one
+    await split_video(video_path, clip_duration, os.path.join(pool_dir, "clip%05d.mp4"))
+
+    clips = []
+    start = 0.0
+    for file in sorted(f for f in os.listdir(pool_dir) if f.endswith(".mp4")):
+        clip_path = os.path.join(pool_dir, file)
+        duration = (await probe_media_async(clip_path)).video_duration
+        clips.append(
+            {
+                "file": file,
+                "start": start,
+                "duration": duration,
+                "keyframes": await get_keyframe_times(clip_path),
+            }
+        )
+        start += duration
+
+    if not clips:
+        raise ValueError(f"No clips were generated for {video_path}")
+
+    width, height = (
+        await probe_media_async(os.path.join(pool_dir, clips[0]["file"]))
+    ).dimensions
+    stat = os.stat(video_path)
+    index = {
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "width": width,
+        "height": height,
+        "duration": start,
+        "clips": clips,
+    }
+
+    index_path = os.path.join(pool_dir, POOL_INDEX_FILE)
+    with open(index_path, "w") as f:
+        json.dump(index, f)
+
+    log.info(f"Indexed {len(clips)} clips ({start:.2f}s) into {index_path}")
+    return index_path
+
+
+def load_clip_pool(video_path: str) -> dict | None:
+    """
+    Loads the clip pool index of a background video.
+
+    Args:
+        video_path (str): The path of the background video.
+
+    Returns:
+        dict | None: The pool index, or None if the video has not been indexed (or changed since).
+    """
+    pool_dir = get_clip_pool_dir(video_path)
+    try:
+        with open(os.path.join(pool_dir, POOL_INDEX_FILE), "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    stat = os.stat(video_path)
+    if (
+        index.get("source_size") != stat.st_size
+        or index.get("source_mtime_ns") != stat.st_mtime_ns
+    ):
+        log.warning(f"Clip pool of {video_path} is out of date, ignoring it")
+        return None
+
+    index["dir"] = pool_dir
+    return index
+
+
+async def get_random_chunk_from_pool(
+    clip_pool: dict, duration: float, output_path: str
+):
+    """
+    Extracts a random chunk of at least the specified duration from a clip pool.
+    The chunk is joined from consecutive clips by stream copy, and ends on the first keyframe
+    of the last clip at or after the requested duration. A chunk longer than the pool loops the
+    pool from its start, as a background video shorter than the audio is looped.
+
+    Args:
+        clip_pool (dict): The pool index, as returned by load_clip_pool.
+        duration (float): The minimum duration of the chunk to extract.
+        output_path (str): The path where the extracted chunk will be saved.
+    """
+    clips = clip_pool["clips"]
+    if clip_pool["duration"] <= 0:
+        raise ValueError("The clip pool is empty")
+
+    if clip_pool["duration"] <= duration:
+        first = 0
+        log.info(
+            f"Looping the {clip_pool['duration']:.2f}s pool for a {duration} second clip"
+        )
+    else:
+        # Any clip starting early enough to leave 'duration' seconds of footage is a valid start
+        starts = [clip["start"] for clip in clips]
+        last_start = bisect.bisect_right(starts, clip_pool["duration"] - duration) - 1
+        first = random.randint(0, last_start)
+        log.info(
+            f"Extracting a random {duration} second clip from the pool at {clips[first]['start']:.2f}s"
+        )
+
+    lines = []
+    remaining = duration
+    # Only wraps around to the first clip when looping
+    for clip in itertools.islice(itertools.cycle(clips), first, None):
+        path = os.path.abspath(os.path.join(clip_pool["dir"], clip["file"]))
+        lines.append(f"file '{path}'")
+        if remaining <= clip["duration"]:
+            outpoint = next((k for k in clip["keyframes"] if k >= remaining), None)
+            if outpoint is not None and outpoint > 0:
+                lines.append(f"outpoint {outpoint}")
+            break
+        remaining -= clip["duration"]
+
+    concat_list_path = f"{os.path.splitext(output_path)[0]}_concat.txt"
+    with open(concat_list_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+    await concat_video_clips(concat_list_path, output_path)
 
 
 if __name__ == "__main__":
@@ -75,7 +241,7 @@ if __name__ == "__main__":
         duration = float(sys.argv[3])
         output_path = sys.argv[4]
 
-        get_random_chunk_from_video(video_path, duration, output_path)
+        asyncio.run(get_random_chunk_from_video(video_path, duration, output_path))
 
     if sys.argv[1] == "split_into":
         video_path = sys.argv[2]
@@ -85,4 +251,10 @@ if __name__ == "__main__":
 
         os.makedirs(output_path, exist_ok=True)
 
-        split_video_into_chunks(video_path, into, output_path, file_name)
+        asyncio.run(split_video_into_chunks(video_path, into, output_path, file_name))
+
+    if sys.argv[1] == "index":
+        video_path = sys.argv[2]
+        clip_duration = float(sys.argv[3]) if len(sys.argv) > 3 else POOL_CLIP_DURATION
+
+        asyncio.run(index_background_video(video_path, clip_duration))
@@ -0,0 +1,212 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+from contextlib import contextmanager
+
+from app.utils.logger import log
+
+
+def make_cache_key(*parts) -> str:
+    """Returns the content address of the given (JSON serializable) parts, as a hex sha256."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode()).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """Returns the content address of the file, as a hex sha256."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@contextmanager
+def locked_json_file(path: str):
+    """
+    Open a JSON file (created if missing) under an exclusive lock, shared with other processes.
+
+    Yields:
+        tuple: The file descriptor, to write the updated content with write_locked_json_file, and the content.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            content = json.loads(_read_fd(fd) or b"{}")
+        except ValueError:
+            content = {}
+        yield fd, content
+    finally:
+        os.close(fd)
+
+
+def write_locked_json_file(fd: int, content: dict):
+    os.ftruncate(fd, 0)
+    os.pwrite(fd, json.dumps(content).encode(), 0)
+
+
+def _read_fd(fd: int) -> bytes:
+    return os.pread(fd, os.fstat(fd).st_size, 0)
+
+
+class DiskCache:
+    """
+    Content addressed file cache, bounded to a byte budget with LRU eviction.
+
+    Entries are files named after their key, so the cache can be shared by every process using the
+    same directory (the web app and the Celery workers). A hit touches the entry, so the least
+    recently used entries are evicted first once the cache grows past its budget. Entries are
+    written to a temporary file and renamed into place, so readers never see a partial entry.
+
+    Hit, miss and eviction counters are kept in the cache directory too, so they cover every process.
+    """
+
+    STATS_FILE = "stats.json"
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ""):
+        """
+        Args:
+            directory (str): The directory of the cache.
+            max_bytes (int): The byte budget of the cache. 0 disables the cache.
+            suffix (str): The suffix of the entry files, ie their extension.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def get(self, key: str, output_path: str) -> bool:
+        """
+        Copy the entry of the key to the output path, if it is cached.
+
+        Returns:
+            bool: Whether the entry was cached.
+        """
+        hit, _ = self._read(
+            key, lambda entry_path: shutil.copyfile(entry_path, output_path)
+        )
+        return hit
+
+    def get_bytes(self, key: str) -> bytes | None:
+        """Returns the content of the entry of the key, if it is cached."""
+        hit, content = self._read(key, _read_file)
+        return content if hit else None
+
+    def _read(self, key: str, read) -> tuple:
+        if not self.enabled:
+            return False, None
+
+        entry_path = self._entry_path(key)
+        try:
+            result = read(entry_path)
+            # Mark the entry as recently used
+            os.utime(entry_path)
+        except FileNotFoundError:
+            self._count("misses")
+            return False, None
+
+        self._count("hits")
+        return True, result
+
+    def put(self, key: str, file_path: str):
+        """Store a copy of the file as the entry of the key, evicting old entries past the budget."""
+        self._write(key, lambda temp_path: shutil.copyfile(file_path, temp_path))
+
+    def put_bytes(self, key: str, content: bytes):
+        """Store the content as the entry of the key, evicting old entries past the budget."""
+
+        def write(temp_path: str):
+            with open(temp_path, "wb") as f:
+                f.write(content)
+
+        self._write(key, write)
+
+    def _write(self, key: str, write):
+        if not self.enabled:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        try:
+            write(temp_path)
+            os.replace(temp_path, self._entry_path(key))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self._evict()
+
+    def _entries(self) -> list:
+        """Returns the (mtime, size, path) of the entries, least recently used first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".") or entry.name == self.STATS_FILE:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                # Evicted by another process
+                pass
+            total -= size
+
+        if evicted:
+            log.debug(f"Evicted {evicted} entries from the cache in {self.directory}")
+            self._count("evictions", evicted)
+
+    def _locked_stats(self):
+        return locked_json_file(os.path.join(self.directory, self.STATS_FILE))
+
+    def _count(self, name: str, amount: int = 1):
+        with self._locked_stats() as (fd, stats):
+            stats[name] = stats.get(name, 0) + amount
+            write_locked_json_file(fd, stats)
+
+    def stats(self) -> dict:
+        """Returns the hit, miss and eviction counters, and the current size of the cache."""
+        if not self.enabled:
+            return {"enabled": False}
+
+        with self._locked_stats() as (_, stats):
+            pass
+        entries = self._entries()
+        return {
+            "enabled": True,
+            "hits": stats.get("hits", 0),
+            "misses": stats.get("misses", 0),
+            "evictions": stats.get("evictions", 0),
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
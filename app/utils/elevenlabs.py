@@ -1,24 +1,29 @@
-import requests
+import httpx
 import os
 
 from app.utils.tts import TTS
 from app.utils.elevenlabs_voice_id import ElevenLabsVoiceId
+from app.utils.http_client import get_client
 from app.utils.logger import log
 
 
 class ElevenLabs(TTS):
+    provider = "elevenlabs"
+    model = "eleven_monolingual_v1"
+
     def __init__(self):
         pass
 
-    def generate_mp3(self, text: str, gender: str, output_path: str):
-        voiceid = (
+    def get_voice_id(self, gender: str) -> str:
+        return (
             ElevenLabsVoiceId.SOFT_FEMALE
             if gender == "f"
             else ElevenLabsVoiceId.DEEP_MALE
         )
 
+    def synthesize(self, text: str, voice_id: str, output_path: str):
         CHUNK_SIZE = 1024
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voiceid}"
+        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
 
         headers = {
             "Accept": "audio/mpeg",
@@ -29,21 +34,27 @@ class ElevenLabs(TTS):
         # todo review model and settings
         data = {
             "text": text,
-            "model_id": "eleven_monolingual_v1",
+            "model_id": self.model,
             "voice_settings": {"stability": 0.5, "similarity_boost": 0.5},
         }
 
         try:
-            response = requests.post(url, json=data, headers=headers)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            log.error(f"HTTP Error requesting ElevenLabs: {response.status_code} - {e}")
+            with get_client("elevenlabs").stream(
+                "POST",
+                url,
+                json=data,
+                headers=headers,
+                extensions={"endpoint": "/v1/text-to-speech/{voice_id}"},
+            ) as response:
+                response.raise_for_status()
+                with open(output_path, "wb") as f:
+                    for chunk in response.iter_bytes(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+        except httpx.HTTPStatusError as e:
+            log.error(
+                f"HTTP Error requesting ElevenLabs: {e.response.status_code} - {e}"
+            )
             raise e
         except Exception as e:
             log.error(f"Unexpected error requests ElevenLabs: {e}")
             raise e
-
-        with open(output_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-                if chunk:
-                    f.write(chunk)
@@ -0,0 +1,205 @@
+import asyncio
+import fcntl
+import json
+import os
+import uuid
+
+from contextlib import asynccontextmanager
+from time import time
+
+from app.utils.logger import log
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+class EncodeScheduler:
+    """
+    Host-wide pool of encode slots, shared by every process using the same slot directory.
+
+    Each slot is a lock file held (with flock) for the duration of an encode, so the number of
+    concurrent encodes is capped across Celery workers and scripts, and a crashed process releases
+    its slot automatically. Processes waiting for a slot hold a lock file too, so the queue depth
+    is visible to everyone.
+
+    An encode is given a thread budget when it acquires its slot: the cores split between the
+    running and queued encodes (up to the number of slots). A lone encode gets every core, while a
+    full queue gives each encode an equal share, instead of every libx264 process using all cores.
+    """
+
+    WAITING_DIR = "waiting"
+
+    def __init__(
+        self,
+        slot_dir: str,
+        max_concurrent: int,
+        cpu_count: int,
+        poll_interval: float = 0.25,
+    ):
+        self.slot_dir = slot_dir
+        self.max_concurrent = max(1, max_concurrent)
+        self.cpu_count = max(1, cpu_count)
+        self.poll_interval = poll_interval
+
+    @classmethod
+    def from_env(cls):
+        cpu_count = int(os.getenv("ENCODE_CPU_COUNT") or _available_cpus())
+        return cls(
+            os.getenv("ENCODE_SLOT_DIR") or os.path.join("tmp", "encode_slots"),
+            # libx264 gains little past a few threads per encode, so run a few encodes side by side
+            int(os.getenv("ENCODE_MAX_CONCURRENT") or max(1, cpu_count // 4)),
+            cpu_count,
+        )
+
+    def _slot_path(self, slot: int) -> str:
+        return os.path.join(self.slot_dir, f"slot-{slot}.lock")
+
+    def _waiting_dir(self) -> str:
+        return os.path.join(self.slot_dir, self.WAITING_DIR)
+
+    def _try_acquire(self) -> tuple | None:
+        for slot in range(self.max_concurrent):
+            fd = os.open(self._slot_path(slot), os.O_RDWR | os.O_CREAT, 0o644)
+            if _try_lock(fd):
+                return slot, fd
+            os.close(fd)
+        return None
+
+    def _count_active(self) -> int:
+        return sum(1 for _ in self._active_slots())
+
+    def _active_slots(self):
+        """Yields the slot numbers and allocations of the slots currently held."""
+        for slot in range(self.max_concurrent):
+            path = self._slot_path(slot)
+            if not os.path.exists(path):
+                continue
+            fd = os.open(path, os.O_RDWR)
+            try:
+                # A lock on a separate open of the file fails while it is held, even by this process
+                if _try_lock(fd):
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    continue
+                try:
+                    allocation = json.loads(os.pread(fd, 4096, 0) or b"{}")
+                except ValueError:
+                    # The holder is still writing its allocation
+                    allocation = {}
+                yield slot, allocation
+            finally:
+                os.close(fd)
+
+    def _count_waiting(self) -> int:
+        waiting_dir = self._waiting_dir()
+        count = 0
+        for file in os.listdir(waiting_dir):
+            path = os.path.join(waiting_dir, file)
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                if _try_lock(fd):
+                    # Left behind by a process that died while waiting
+                    os.remove(path)
+                else:
+                    count += 1
+            finally:
+                os.close(fd)
+        return count
+
+    def thread_budget(self, active: int, waiting: int) -> int:
+        """Returns the threads an encode should use, given the running and queued encodes."""
+        competing = min(self.max_concurrent, max(1, active + waiting))
+        return max(1, self.cpu_count // competing)
+
+    @asynccontextmanager
+    async def slot(self, label: str = "encode"):
+        """
+        Wait for a free encode slot, and hold it for the duration of the context.
+
+        Args:
+            label (str): A description of the encode, shown in the allocation.
+
+        Yields:
+            int: The number of threads the encode should use.
+        """
+        os.makedirs(self._waiting_dir(), exist_ok=True)
+
+        # Locked before it is moved into the waiting directory, so other processes never see it
+        # unlocked, and take it for the stale file of a dead process
+        name = f"{os.getpid()}-{uuid.uuid4().hex}"
+        new_path = os.path.join(self.slot_dir, f".{name}")
+        waiting_path = os.path.join(self._waiting_dir(), name)
+        waiting_fd = os.open(new_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(waiting_fd, fcntl.LOCK_EX)
+        os.rename(new_path, waiting_path)
+
+        start_time = time()
+        try:
+            acquired = self._try_acquire()
+            while acquired is None:
+                await asyncio.sleep(self.poll_interval)
+                acquired = self._try_acquire()
+        finally:
+            os.remove(waiting_path)
+            os.close(waiting_fd)
+
+        slot, fd = acquired
+        try:
+            threads = self.thread_budget(self._count_active(), self._count_waiting())
+            allocation = {
+                "pid": os.getpid(),
+                "label": label,
+                "threads": threads,
+                "since": time(),
+            }
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, json.dumps(allocation).encode(), 0)
+
+            log.debug(
+                f"Acquired encode slot {slot} for {label} with {threads} threads, after {time() - start_time:.2f}s"
+            )
+            yield threads
+        finally:
+            os.ftruncate(fd, 0)
+            os.close(fd)
+
+    def get_allocation(self) -> dict:
+        """Returns the current encodes and their thread budgets, for monitoring."""
+        os.makedirs(self._waiting_dir(), exist_ok=True)
+
+        return {
+            "cpu_count": self.cpu_count,
+            "max_concurrent": self.max_concurrent,
+            "active": [
+                {"slot": slot, **allocation}
+                for slot, allocation in self._active_slots()
+            ],
+            "waiting": self._count_waiting(),
+        }
+
+
+encode_scheduler = EncodeScheduler.from_env()
+
+
+def encode_slot(label: str = "encode"):
+    """Waits for and holds a host-wide encode slot, yielding its thread budget. See EncodeScheduler.slot."""
+    return encode_scheduler.slot(label)
+
+
+def get_encode_allocation() -> dict:
+    """Returns the current allocation of the encode slots. See EncodeScheduler.get_allocation."""
+    return encode_scheduler.get_allocation()
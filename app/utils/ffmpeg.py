@@ -1,21 +1,44 @@
+import asyncio
 import ffmpeg
 import math
 import os
 
+from dataclasses import dataclass
+from fractions import Fraction
+from time import time
 from typing import cast
 
+from PIL import Image
+
 from app.config import ffmpeg_config
 
+from app.utils.image_generator import TitleCard
+from app.utils.encode_scheduler import encode_scheduler, encode_slot
+from app.utils.ffmpeg_runner import (
+    FFMpegProcessingError,
+    FFmpegProgress,
+    ProgressCallback,
+    run_ffmpeg,
+    run_ffprobe,
+)
 from app.utils.logger import log
+from app.utils.probe import probe_media, probe_media_async
+from app.utils.subtitles import get_fonts_dir, slice_ass
 
 
-class FFMpegProcessingError(Exception):
-    def __init__(self, message, stderr=None):
-        super().__init__(message)
-        self.stderr = stderr
+# Output options of the videos that are played or downloaded (ie not intermediates). The moov atom is
+# moved to the start of the file, so playback starts after the first request rather than the whole file
+FASTSTART = {"movflags": "+faststart"}
+# Style applied to SRT subtitles. ASS subtitles carry their own style (see app.utils.subtitles)
+SUBTITLE_STYLE = "FontName=Mont,FontSize=18,PrimaryColour=&H00ffffff,OutlineColour=&H00000000,BackColour=&H80000000,Bold=1,Italic=0,Alignment=10,Outline=1.5"
 
 
-def resize_video(video_path: str, output_path: str, config_preset="default"):
+async def resize_video(
+    video_path: str,
+    output_path: str,
+    config_preset="default",
+    on_progress: ProgressCallback | None = None,
+):
     """
     Resize a video to maintain a 16:9 aspect ratio on height.
 
@@ -23,6 +46,7 @@ def resize_video(video_path: str, output_path: str, config_preset="default"):
     video_path (str): The path to the input video file.
     output_file_path (str): The path to the output resized video file.
     config_preset (str): The configuration preset to use for FFmpeg commands.
+    on_progress (callable): Called with an FFmpegProgress as the command runs, see run_ffmpeg.
 
     Raises:
         FFMpegProcessingError: If an error occurs during the FFmpeg command execution.
@@ -35,32 +59,34 @@ def resize_video(video_path: str, output_path: str, config_preset="default"):
     settings = ffmpeg_config.get(config_preset, ffmpeg_config["default"])
     log.debug("FFmpeg settings: %s", settings)
 
-    width, height = get_video_dimensions(video_path)
+    width, height = (await probe_media_async(video_path)).dimensions
     log.debug("Video dimensions: %dx%d", width, height)
     target_width = min(width, height * 9 // 16)
     target_height = height
 
-    try:
-        (
+    async with encode_slot("resize_video") as threads:
+        command = (
             ffmpeg.input(video_path)
             .filter("crop", target_width, target_height)
             .output(
-                output_path, vcodec="libx264", acodec="copy", preset=settings["preset"]
+                output_path,
+                vcodec="libx264",
+                acodec="copy",
+                preset=settings["preset"],
+                threads=threads,
             )
             .global_args(*settings["global_args"])
-            .run(
-                overwrite_output=True,
-                capture_stdout=settings["capture_stdout"],
-                capture_stderr=settings["capture_stderr"],
-            )
         )
-    except ffmpeg.Error as e:
-        raise FFMpegProcessingError(
-            "Error during resize_video ffmpeg command", stderr=e.stderr
+        await run_ffmpeg(
+            command,
+            "Error during resize_video ffmpeg command",
+            capture_stderr=settings["capture_stderr"],
+            timeout=settings.get("timeout"),
+            on_progress=on_progress,
         )
 
 
-def split_video_at_time(
+async def split_video_at_time(
     video_path: str,
     start_time: str,
     duration: float,
@@ -90,25 +116,21 @@ def split_video_at_time(
     settings = ffmpeg_config.get(config_preset, ffmpeg_config["default"])
     log.debug("FFmpeg settings: %s", settings)
 
-    try:
-        (
-            ffmpeg.input(video_path, ss=start_time)
-            .output(output_path, t=duration, c="copy")
-            .global_args("-loglevel", "error")
-            .global_args(*settings["global_args"])
-            .run(
-                overwrite_output=True,
-                capture_stdout=settings["capture_stdout"],
-                capture_stderr=settings["capture_stderr"],
-            )
-        )
-    except ffmpeg.Error as e:
-        raise FFMpegProcessingError(
-            "Error during split_video_at_time ffmpeg command", stderr=e.stderr
-        )
+    command = (
+        ffmpeg.input(video_path, ss=start_time)
+        .output(output_path, t=duration, c="copy")
+        .global_args("-loglevel", "error")
+        .global_args(*settings["global_args"])
+    )
+    await run_ffmpeg(
+        command,
+        "Error during split_video_at_time ffmpeg command",
+        capture_stderr=settings["capture_stderr"],
+        timeout=settings.get("timeout"),
+    )
 
 
-def split_video(video_path: str, duration: float, output_pattern_path: str):
+async def split_video(video_path: str, duration: float, output_pattern_path: str):
     """
     Split a video into multiple segments of specified duration.
     Note: This has not been tested, this is just a utility function, for running as a script.
@@ -127,37 +149,127 @@ def split_video(video_path: str, duration: float, output_pattern_path: str):
     log.debug("Duration: %d", duration)
     log.debug("Output pattern: %s", output_pattern_path)
 
-    try:
-        (
-            ffmpeg.input(video_path)
-            .output(
-                output_pattern_path,
-                format="segment",
-                segment_time=duration,
-                c="copy",
-                reset_timestamps=1,
-                map=0,
-            )
-            .global_args("-loglevel", "error")
-            .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+    command = (
+        ffmpeg.input(video_path)
+        .output(
+            output_pattern_path,
+            format="segment",
+            segment_time=duration,
+            c="copy",
+            reset_timestamps=1,
+            map=0,
         )
-    except ffmpeg.Error as e:
-        raise FFMpegProcessingError(
-            "Error during split_video ffmpeg command", stderr=e.stderr
+        .global_args("-loglevel", "error")
+    )
+    await run_ffmpeg(command, "Error during split_video ffmpeg command")
+
+
+async def concat_video_clips(concat_list_path: str, output_path: str):
+    """
+    Join the clips listed in a concat demuxer list file into a single video, without re-encoding.
+
+    Args:
+    concat_list_path (str): The path to the concat demuxer list file.
+    output_path (str): The path to save the output video file.
+
+    Raises:
+        FFMpegProcessingError: If an error occurs during the FFmpeg command execution.
+    """
+
+    log.info("Concatenating video clips...")
+    log.debug("Concat list path: %s", concat_list_path)
+    log.debug("Output path: %s", output_path)
+
+    command = (
+        ffmpeg.input(concat_list_path, format="concat", safe=0)
+        .output(output_path, c="copy")
+        .global_args("-loglevel", "error")
+    )
+    await run_ffmpeg(command, "Error during concat_video_clips ffmpeg command")
+
+
+async def write_loop_concat_list(
+    audio_duration: float,
+    video_path: str,
+    concat_list_path: str,
+    video_duration: float | None = None,
+) -> str:
+    """
+    Write a concat demuxer list that loops an (already encoded) video to the specified audio duration.
+    The video is repeated as many whole times as fit, followed by a tail of the video that ends on the
+    first keyframe at or after the remaining duration, so the list can be read by stream copy.
+
+    The list can be joined with concat_video_clips, or used directly as the video input of the next
+    stage (see overlay_image_on_video), without writing a looped file at all.
+
+    Args:
+    audio_duration (float): The duration of the audio in seconds.
+    video_path (str): The path to the input video file.
+    concat_list_path (str): The path to save the concat list to, by convention with a .ffconcat extension.
+    video_duration (float): The duration of the input video, if already known. Probed otherwise.
+
+    Returns:
+    str: The path to the concat list.
+    """
+
+    log.info("Writing loop concat list...")
+    log.debug("Audio duration: %s", audio_duration)
+    log.debug("Video path: %s", video_path)
+    log.debug("Concat list path: %s", concat_list_path)
+
+    if video_duration is None:
+        video_duration = (await probe_media_async(video_path)).video_duration
+
+    number_of_repeats = math.floor(audio_duration / video_duration)
+    remaining = audio_duration - number_of_repeats * video_duration
+
+    video_path = os.path.abspath(video_path)
+    lines = ["ffconcat version 1.0"]
+    lines += [f"file '{video_path}'"] * number_of_repeats
+    if remaining > 0:
+        lines.append(f"file '{video_path}'")
+        outpoint = next(
+            (k for k in await get_keyframe_times(video_path) if k >= remaining), None
         )
+        if outpoint is not None:
+            lines.append(f"outpoint {outpoint}")
+
+    log.info(f"Looping video {number_of_repeats} times, plus a {remaining:.2f}s tail.")
+
+    with open(concat_list_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+    return concat_list_path
 
 
-def loop_video_to_audio(
-    audio_duration: float, video_path: str, output_path: str, config_preset="default"
+def _video_input(video_path: str, **kwargs):
+    """Returns an ffmpeg input for a video file, or for a .ffconcat concat list of videos."""
+    if video_path.endswith(".ffconcat"):
+        return ffmpeg.input(video_path, format="concat", safe=0, **kwargs)
+    return ffmpeg.input(video_path, **kwargs)
+
+
+async def loop_video_to_audio(
+    audio_duration: float,
+    video_path: str,
+    output_path: str,
+    config_preset="default",
+    video_duration: float | None = None,
+    on_progress: ProgressCallback | None = None,
 ):
     """
     Loop a video to match the specified audio duration and save it as a new video file.
 
+    With the 'copy' loop_mode of the preset, the video is looped by stream copy instead of being
+    re-encoded, see write_loop_concat_list.
+
     Args:
     audio_duration (float): The duration of the audio in seconds.
     video_path (str): The path to the input video file.
-    output_video_path (str): The path to save the output video file.
+    output_path (str): The path to save the output video file.
     config_preset (str): The configuration preset to use for FFmpeg commands.
+    video_duration (float): The duration of the input video, if already known. Probed otherwise.
+    on_progress (callable): Called with an FFmpegProgress as the command runs, see run_ffmpeg.
 
     Raises:
         FFMpegProcessingError: If an error occurs during the FFmpeg command execution.
@@ -171,35 +283,44 @@ def loop_video_to_audio(
     settings = ffmpeg_config.get(config_preset, ffmpeg_config["default"])
     log.debug("FFmpeg settings: %s", settings)
 
-    video_duration = get_video_duration(video_path)
+    if video_duration is None:
+        video_duration = (await probe_media_async(video_path)).video_duration
     log.debug("Video duration: %s", video_duration)
+
+    if settings.get("loop_mode", "reencode") == "copy":
+        concat_list_path = f"{os.path.splitext(output_path)[0]}.ffconcat"
+        await write_loop_concat_list(
+            audio_duration, video_path, concat_list_path, video_duration
+        )
+        await concat_video_clips(concat_list_path, output_path)
+        return
+
     number_of_repeats = math.ceil(audio_duration / video_duration)
 
     log.info(f"Looping video {number_of_repeats} times.")
 
-    try:
-        (
+    async with encode_slot("loop_video_to_audio") as threads:
+        command = (
             ffmpeg.input(video_path, stream_loop=number_of_repeats)
             .output(
                 output_path,
                 vf=f"trim=duration={audio_duration}",
                 acodec="copy",
                 preset=settings["preset"],
+                threads=threads,
             )
             .global_args(*settings["global_args"])
-            .run(
-                overwrite_output=True,
-                capture_stdout=settings["capture_stdout"],
-                capture_stderr=settings["capture_stderr"],
-            )
         )
-    except ffmpeg.Error as e:
-        raise FFMpegProcessingError(
-            "Error during loop_video_to_audio ffmpeg command", stderr=e.stderr
+        await run_ffmpeg(
+            command,
+            "Error during loop_video_to_audio ffmpeg command",
+            capture_stderr=settings["capture_stderr"],
+            timeout=settings.get("timeout"),
+            on_progress=on_progress,
         )
 
 
-def concatenate_audios(audio_path1: str, audio_path2: str, output_path: str):
+async def concatenate_audios(audio_path1: str, audio_path2: str, output_path: str):
     """
     Concatenate two audio files using ffmpeg-python.
 
@@ -218,34 +339,36 @@ def concatenate_audios(audio_path1: str, audio_path2: str, output_path: str):
     log.debug("Output path: %s", output_path)
 
     input_str = f"concat:{audio_path1}|{audio_path2}"
-    try:
-        (
-            ffmpeg.input(input_str)
-            .output(output_path, codec="copy")
-            .global_args("-loglevel", "error")
-            .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
-        )
-    except ffmpeg.Error as e:
-        log.error(f"Error during ffmpeg command: {e.stderr}")
-        raise
+    command = (
+        ffmpeg.input(input_str)
+        .output(output_path, codec="copy")
+        .global_args("-loglevel", "error")
+    )
+    await run_ffmpeg(command, "Error during concatenate_audios ffmpeg command")
 
 
-def overlay_image_on_video(
+async def overlay_image_on_video(
     video_path: str,
     image_path: str,
     duration: int,
     output_path: str,
     config_preset="default",
+    x: str = "(W-w)/2",
+    y: str = "(H-h)/2",
+    on_progress: ProgressCallback | None = None,
 ):
     """
     Overlay an image on a video
 
     Args:
-    video_path (str): Path to the input video file.
+    video_path (str): Path to the input video file, or to a .ffconcat list of video files.
     image_path (str): Path to the image file to overlay.
     duration (int): Duration in seconds for which the image should be visible on the video.
     output_path (str): Path to the output video file.
     config_preset (str): The configuration preset to use for FFmpeg commands.
+    x (str): The x position expression of the image. Centered by default.
+    y (str): The y position expression of the image. Centered by default.
+    on_progress (callable): Called with an FFmpegProgress as the command runs, see run_ffmpeg.
 
     Raises:
         FFMpegProcessingError: If an error occurs during the FFmpeg command execution.
@@ -260,35 +383,37 @@ def overlay_image_on_video(
     settings = ffmpeg_config.get(config_preset, ffmpeg_config["default"])
     log.debug("FFmpeg settings: %s", settings)
 
-    try:
-        input_video = ffmpeg.input(video_path)
-        input_image = ffmpeg.input(image_path)
+    input_video = _video_input(video_path)
+    input_image = ffmpeg.input(image_path)
 
-        overlay_filter = (
+    async with encode_slot("overlay_image_on_video") as threads:
+        command = (
             ffmpeg.filter_(
                 [input_video, input_image],
                 "overlay",
-                x="(W-w)/2",
-                y="(H-h)/2",
+                x=x,
+                y=y,
                 enable=f"between(t,0,{duration})",
             )
             .output(
-                output_path, vcodec="libx264", acodec="copy", preset=settings["preset"]
+                output_path,
+                vcodec="libx264",
+                acodec="copy",
+                preset=settings["preset"],
+                threads=threads,
             )
             .global_args(*settings["global_args"])
-            .run(
-                overwrite_output=True,
-                capture_stdout=settings["capture_stdout"],
-                capture_stderr=settings["capture_stderr"],
-            )
         )
-    except ffmpeg.Error as e:
-        raise FFMpegProcessingError(
-            "Error during overlay_image_on_video ffmpeg command", stderr=e.stderr
+        await run_ffmpeg(
+            command,
+            "Error during overlay_image_on_video ffmpeg command",
+            capture_stderr=settings["capture_stderr"],
+            timeout=settings.get("timeout"),
+            on_progress=on_progress,
         )
 
 
-def resize_image(image_path: str, target_width: int, output_path: str):
+async def resize_image(image_path: str, target_width: int, output_path: str):
     """
     Resize an image to a specified width, keeping the aspect ratio.
 
@@ -306,24 +431,25 @@ def resize_image(image_path: str, target_width: int, output_path: str):
     log.debug("Target width: %s", target_width)
     log.debug("Output path: %s", output_path)
 
-    # TODO validate why we do this (this line comes from my original java implementation, but I don't remember why I did it)
-    target_width += 200
+    target_width = get_title_image_width(target_width)
+
+    command = (
+        ffmpeg.input(image_path)
+        .filter("scale", target_width, -1)  # -1 in scale maintains the aspect ratio
+        .output(output_path)
+        .global_args("-loglevel", "error")
+    )
+    await run_ffmpeg(command, "Error during resize_image ffmpeg command")
 
-    try:
-        (
-            ffmpeg.input(image_path)
-            .filter("scale", target_width, -1)  # -1 in scale maintains the aspect ratio
-            .output(output_path)
-            .global_args("-loglevel", "error")
-            .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
-        )
-    except ffmpeg.Error as e:
-        raise FFMpegProcessingError(
-            "Error during resize_image ffmpeg command", stderr=e.stderr
-        )
 
+def get_title_image_width(video_width: int) -> int:
+    """Returns the width the title image should be scaled to for a video of the given width."""
+
+    # TODO validate why we do this (this line comes from my original java implementation, but I don't remember why I did it)
+    return video_width + 200
 
-def buffer_audio(audio_path: str, pos: str, duration: float, output_path: str):
+
+async def buffer_audio(audio_path: str, pos: str, duration: float, output_path: str):
     """
     Buffer audio by adding silence at the start or end of the audio file.
 
@@ -352,25 +478,35 @@ def buffer_audio(audio_path: str, pos: str, duration: float, output_path: str):
     else:
         raise ValueError("Invalid position. Use 'START' or 'END'.")
 
-    try:
-        (
-            ffmpeg.input(audio_path)
-            .output(output_path, af=filter_complex)
-            .global_args("-loglevel", "error")
-            .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
-        )
-    except ffmpeg.Error as e:
-        raise FFMpegProcessingError(
-            "Error during buffer_audio ffmpeg command", stderr=e.stderr
-        )
+    command = (
+        ffmpeg.input(audio_path)
+        .output(output_path, af=filter_complex)
+        .global_args("-loglevel", "error")
+    )
+    await run_ffmpeg(command, "Error during buffer_audio ffmpeg command")
+
+
+def _subtitles_filter(subtitles_path: str) -> tuple:
+    """
+    Returns the ffmpeg filter name and options to burn in a subtitle file.
+
+    ASS files are already styled. fontsdir adds our bundled fonts to the ones libass can use, so
+    the font of the style is found on any host, whether or not it is installed. libass still
+    initializes fontconfig for the system fonts, the filter has no option to disable it. SRT files
+    are styled with SUBTITLE_STYLE.
+    """
+    if subtitles_path.endswith(".ass"):
+        return "ass", {"fontsdir": get_fonts_dir()}
+    return "subtitles", {"force_style": SUBTITLE_STYLE}
 
 
-def embed_srt_and_audio(
+async def embed_srt_and_audio(
     video_path: str,
     audio_path: str,
     srt_path: str,
     output_path: str,
     config_preset="default",
+    on_progress: ProgressCallback | None = None,
 ):
     """
     Embeds subtitles and audio into a video file using FFmpeg.
@@ -378,9 +514,10 @@ def embed_srt_and_audio(
     Args:
         video_path (str): The path to the input video file.
         audio_path (str): The path to the input audio file.
-        srt_path (str): The path to the input subtitle file in SRT format.
+        srt_path (str): The path to the input subtitle file, in ASS (see write_ass) or SRT format.
         output_path (str): The path to save the output video file.
         config_preset (str): The configuration preset to use for FFmpeg commands.
+        on_progress (callable): Called with an FFmpegProgress as the command runs, see run_ffmpeg.
 
     Raises:
         FFMpegProcessingError: If an error occurs during the FFmpeg command execution.
@@ -395,9 +532,12 @@ def embed_srt_and_audio(
     settings = ffmpeg_config.get(config_preset, ffmpeg_config["default"])
     log.debug("FFmpeg settings: %s", settings)
 
-    subtitles_filter = f"subtitles={srt_path}:force_style='FontName=Mont,FontSize=18,PrimaryColour=&H00ffffff,OutlineColour=&H00000000,BackColour=&H80000000,Bold=1,Italic=0,Alignment=10,Outline=1.5'"
-    try:
-        (
+    filter_name, filter_options = _subtitles_filter(srt_path)
+    subtitles_filter = f"{filter_name}={srt_path}" + "".join(
+        f":{key}='{value}'" for key, value in filter_options.items()
+    )
+    async with encode_slot("embed_srt_and_audio") as threads:
+        command = (
             ffmpeg.input(video_path)
             .output(
                 ffmpeg.input(audio_path),
@@ -409,75 +549,485 @@ def embed_srt_and_audio(
                 audio_bitrate="192k",
                 crf=20,
                 preset=settings["preset"],
+                threads=threads,
+                # A video looped by stream copy runs on to the next keyframe, end it with the audio
+                shortest=None,
+                **FASTSTART,
             )
             .global_args(*settings["global_args"])
-            .run(
-                overwrite_output=True,
-                capture_stdout=settings["capture_stdout"],
-                capture_stderr=settings["capture_stderr"],
-            )
         )
-    except ffmpeg.Error as e:
-        raise FFMpegProcessingError(
-            "Error during embed_srt_and_audio ffmpeg command", stderr=e.stderr
+        await run_ffmpeg(
+            command,
+            "Error during embed_srt_and_audio ffmpeg command",
+            capture_stderr=settings["capture_stderr"],
+            timeout=settings.get("timeout"),
+            on_progress=on_progress,
+        )
+
+
+def _title_image_input(image: str | Image.Image | TitleCard, video_width: int):
+    """
+    Returns an ffmpeg input for the title image, the bytes to pipe to ffmpeg's stdin for it, and the
+    x/y overlay position expressions that center the full title image on the video.
+
+    A path to an image file is scaled to the title width within the filter graph. An in-memory image
+    or title card is expected to already be rendered at the title width, and is piped to ffmpeg as raw
+    RGBA. It is converted to yuva420p once, so overlaying it doesn't need any per-frame conversion.
+    """
+    if isinstance(image, str):
+        scaled = ffmpeg.input(image).filter(
+            "scale", get_title_image_width(video_width), -1
+        )
+        return scaled, None, "(W-w)/2", "(H-h)/2"
+
+    if isinstance(image, TitleCard):
+        x = f"(W-{image.full_width})/2+{image.left}"
+        y = f"(H-{image.full_height})/2+{image.top}"
+        image = image.image
+    else:
+        x, y = "(W-w)/2", "(H-h)/2"
+
+    image = image.convert("RGBA")
+    raw = ffmpeg.input(
+        "pipe:", format="rawvideo", pix_fmt="rgba", s=f"{image.width}x{image.height}"
+    ).filter("format", "yuva420p")
+    return raw, image.tobytes(), x, y
+
+
+def _bitrate_cap(settings: dict) -> dict:
+    """Returns the output options capping the video bitrate of a preset's 'max_bitrate', if it has one."""
+    if "max_bitrate" not in settings:
+        return {}
+    max_bitrate = settings["max_bitrate"]
+    return {"maxrate": max_bitrate, "bufsize": max_bitrate}
+
+
+@dataclass(frozen=True)
+class OutputSpec:
+    """
+    A rendition written by render_outputs.
+
+    The preset decides what is written: its 'format' is "mp4" (the default) for a video, "jpeg" for
+    a poster frame taken at the end of the title card, or "webp" for a short animated preview of its
+    'duration' seconds at its 'fps'. 'max_height' (and 'max_bitrate' for videos) cap its size.
+    """
+
+    path: str
+    config_preset: str = "default"
+
+
+def _scale_to_preset(video, settings: dict):
+    if "max_height" not in settings:
+        return video
+    # Scaled last, so the title and subtitles are laid out as in the full size render
+    return video.filter("scale", -2, f"min({settings['max_height']},ih)").filter(
+        "setsar", 1
+    )
+
+
+def _rendition_output(
+    video, audio, spec: OutputSpec, duration: float, image_duration: float, threads: int
+):
+    """Returns the ffmpeg output node writing a rendition, from its branch of the render graph."""
+    settings = ffmpeg_config.get(spec.config_preset, ffmpeg_config["default"])
+    output_format = settings.get("format", "mp4")
+
+    if output_format == "jpeg":
+        # The last frame before the title disappears, so the poster shows the title over the video
+        poster_time = max(0, image_duration - 0.1)
+        video = video.trim(start=poster_time).filter("setpts", "PTS-STARTPTS")
+        return ffmpeg.output(
+            _scale_to_preset(video, settings), spec.path, vframes=1, **{"q:v": 2}
+        )
+
+    if output_format == "webp":
+        video = video.trim(duration=settings.get("duration", 3)).filter(
+            "fps", settings.get("fps", 10)
+        )
+        return ffmpeg.output(
+            _scale_to_preset(video, settings),
+            spec.path,
+            vcodec="libwebp_anim",
+            loop=0,
+            quality=settings.get("quality", 75),
+            threads=threads,
         )
 
+    return ffmpeg.output(
+        _scale_to_preset(video, settings),
+        audio,
+        spec.path,
+        vcodec="libx264",
+        acodec="libmp3lame",
+        # Quality optimizations
+        audio_bitrate="192k",
+        crf=20,
+        preset=settings["preset"],
+        t=duration,
+        threads=threads,
+        **_bitrate_cap(settings),
+        **FASTSTART,
+    )
+
 
-def delay_srt(srt_path: str, delay: float, output_path: str):
+async def render_outputs(
+    video_path: str,
+    image: str | Image.Image | TitleCard,
+    image_duration: float,
+    audio_path: str,
+    srt_path: str,
+    duration: float,
+    outputs: list[OutputSpec],
+    config_preset="default",
+    video_width: int | None = None,
+    on_progress: ProgressCallback | None = None,
+):
     """
-    Delay an SRT subtitle file by a certain number of seconds using ffmpeg-python.
+    Render the final video, and any other renditions of it, in a single ffmpeg pass.
+
+    Loops the background video to the given duration, overlays the title image, burns in the
+    subtitles and maps the audio in one filter graph, so the video is only encoded once.
+    The graph is split between the outputs, so the background is decoded (and the title and
+    subtitles drawn) once, and each rendition only costs its own scaling and encode.
 
     Args:
-    srt_path (str): Path to the SRT file.
-    delay (float): Amount of delay to add in seconds.
-    output_path (str): Path where the delayed SRT file will be saved.
+        video_path (str): The path to the background video file.
+        image (str | Image.Image | TitleCard): The path to the (unscaled) title image, or the title
+            image/card already rendered at the title width (see render_title_card), which is piped to
+            ffmpeg. A title card is overlaid at its offset, so only the visible card is blended.
+        image_duration (float): Duration in seconds for which the title image should be visible.
+        audio_path (str): The path to the input audio file.
+        srt_path (str): The path to the (already delayed) subtitle file, in ASS (see write_ass) or SRT format.
+        duration (float): The duration of the final video in seconds.
+        outputs (list): The OutputSpecs of the renditions.
+        config_preset (str): The configuration preset of the command itself (logging, timeout).
+        video_width (int): The width of the background video, if already known. Probed otherwise.
+        on_progress (callable): Called with an FFmpegProgress as the command runs, see run_ffmpeg.
 
     Raises:
         FFMpegProcessingError: If an error occurs during the FFmpeg command execution.
     """
-    log.info(f"Delaying srt by {delay} seconds.")
+
+    log.info(f"Rendering {len(outputs)} outputs in a single pass...")
+    log.debug("Video path: %s", video_path)
+    log.debug("Image: %s", image)
+    log.debug("Image duration: %s", image_duration)
+    log.debug("Audio path: %s", audio_path)
     log.debug("SRT path: %s", srt_path)
+    log.debug("Duration: %s", duration)
+    log.debug("Outputs: %s", outputs)
+
+    settings = ffmpeg_config.get(config_preset, ffmpeg_config["default"])
+    log.debug("FFmpeg settings: %s", settings)
+
+    if video_width is None and isinstance(image, str):
+        video_width = (await probe_media_async(video_path)).dimensions[0]
+
+    # The trim starts at 0, so there is no need to reset the timestamps (setpts would also drop the frame rate)
+    video = ffmpeg.input(video_path, stream_loop=-1).video.trim(duration=duration)
+    image_input, image_bytes, x, y = _title_image_input(image, video_width)
+    video = ffmpeg.overlay(
+        video,
+        image_input,
+        x=x,
+        y=y,
+        enable=f"between(t,0,{image_duration})",
+        format="yuv420",
+    )
+    filter_name, filter_options = _subtitles_filter(srt_path)
+    video = video.filter(filter_name, srt_path, **filter_options)
+    audio = ffmpeg.input(audio_path).audio
+
+    if len(outputs) > 1:
+        branches = video.split()
+        videos = [branches[i] for i in range(len(outputs))]
+    else:
+        videos = [video]
+
+    async with encode_slot("render_outputs") as threads:
+        command = ffmpeg.merge_outputs(
+            *(
+                _rendition_output(
+                    branch, audio, spec, duration, image_duration, threads
+                )
+                for branch, spec in zip(videos, outputs)
+            )
+        ).global_args(*settings["global_args"])
+        await run_ffmpeg(
+            command,
+            "Error during render_outputs ffmpeg command",
+            input=image_bytes,
+            capture_stderr=settings["capture_stderr"],
+            timeout=settings.get("timeout"),
+            on_progress=on_progress,
+        )
+
+
+async def render_single_pass(
+    video_path: str,
+    image: str | Image.Image | TitleCard,
+    image_duration: float,
+    audio_path: str,
+    srt_path: str,
+    duration: float,
+    output_path: str,
+    config_preset="default",
+    video_width: int | None = None,
+    on_progress: ProgressCallback | None = None,
+):
+    """
+    Render the final video in a single ffmpeg pass. See render_outputs, for a single output.
+
+    This replaces the loop_video_to_audio -> overlay_image_on_video -> embed_srt_and_audio chain.
+
+    Args:
+        video_path (str): The path to the background video file.
+        image (str | Image.Image | TitleCard): The title image, see render_outputs.
+        image_duration (float): Duration in seconds for which the title image should be visible.
+        audio_path (str): The path to the input audio file.
+        srt_path (str): The path to the (already delayed) subtitle file, in ASS (see write_ass) or SRT format.
+        duration (float): The duration of the final video in seconds.
+        output_path (str): The path to save the output video file.
+        config_preset (str): The configuration preset to use for FFmpeg commands.
+        video_width (int): The width of the background video, if already known. Probed otherwise.
+        on_progress (callable): Called with an FFmpegProgress as the command runs, see run_ffmpeg.
+
+    Raises:
+        FFMpegProcessingError: If an error occurs during the FFmpeg command execution.
+    """
+    await render_outputs(
+        video_path,
+        image,
+        image_duration,
+        audio_path,
+        srt_path,
+        duration,
+        [OutputSpec(output_path, config_preset)],
+        config_preset,
+        video_width,
+        on_progress,
+    )
+
+
+def get_segment_boundaries(
+    duration: float, segments: int, frame_rate: Fraction
+) -> list:
+    """
+    Split a timeline into (start, end) segments of about equal length, starting on frame boundaries.
+
+    Args:
+    duration (float): The duration of the timeline in seconds.
+    segments (int): The number of segments, fewer if the timeline has fewer frames.
+    frame_rate (Fraction): The frame rate of the video.
+
+    Returns:
+    list: The (start, end) tuples of the segments, in seconds.
+    """
+    frames = max(1, round(duration * frame_rate))
+    segments = max(1, min(segments, frames))
+    starts = [float(round(frames * i / segments) / frame_rate) for i in range(segments)]
+    return list(zip(starts, starts[1:] + [duration]))
+
+
+async def render_segmented(
+    video_path: str,
+    image: str | Image.Image | TitleCard,
+    image_duration: float,
+    audio_path: str,
+    srt_path: str,
+    duration: float,
+    output_path: str,
+    config_preset="default",
+    video_width: int | None = None,
+    on_progress: ProgressCallback | None = None,
+    segments: int | None = None,
+    concat_list_path: str | None = None,
+):
+    """
+    Render the final video as segments encoded in parallel, joined without re-encoding.
+
+    The timeline is split into frame aligned segments, and each segment is rendered like
+    render_single_pass (without audio) by its own ffmpeg process: the background is seeked to the
+    segment start, and the segment only gets the subtitles and the part of the title overlay that
+    fall in it. Each segment starts on a keyframe, so the segments are joined by a stream copy
+    concat, which also muxes in the audio.
+
+    The segment encodes are scheduled on the host-wide encode slots, so they run side by side on
+    otherwise idle cores, each with its share of the threads. A single libx264 process doesn't
+    scale to many cores, so a long video on a large host renders faster this way.
+
+    Args:
+        video_path (str): The path to the background video file.
+        image (str | Image.Image | TitleCard): The title image, see render_single_pass.
+        image_duration (float): Duration in seconds for which the title image should be visible.
+        audio_path (str): The path to the input audio file.
+        srt_path (str): The path to the (already delayed) subtitle file, in ASS format (see write_ass).
+        duration (float): The duration of the final video in seconds.
+        output_path (str): The path to save the output video file.
+        config_preset (str): The configuration preset to use for FFmpeg commands.
+        video_width (int): The width of the background video, if already known. Probed otherwise.
+        on_progress (callable): Called with the combined FFmpegProgress of the segments, see run_ffmpeg.
+        segments (int): The number of segments. Defaults to the preset's 'segments', or the encode slots.
+        concat_list_path (str): The path to write the segment list to, the segments are written next to it.
+            Defaults to next to the output. The segments and list are removed once joined.
+
+    Raises:
+        FFMpegProcessingError: If an error occurs during the FFmpeg command execution.
+    """
+
+    log.info("Rendering video in segments...")
+    log.debug("Video path: %s", video_path)
+    log.debug("Image: %s", image)
+    log.debug("Image duration: %s", image_duration)
+    log.debug("Audio path: %s", audio_path)
+    log.debug("SRT path: %s", srt_path)
+    log.debug("Duration: %s", duration)
     log.debug("Output path: %s", output_path)
 
-    latency = 0.1  # additional latency to add in seconds
-    total_delay = delay + latency
+    settings = ffmpeg_config.get(config_preset, ffmpeg_config["default"])
+    log.debug("FFmpeg settings: %s", settings)
+
+    if segments is None:
+        segments = settings.get("segments") or encode_scheduler.max_concurrent
+    if concat_list_path is None:
+        concat_list_path = f"{os.path.splitext(output_path)[0]}_segments.ffconcat"
+
+    probe = await probe_media_async(video_path)
+    if video_width is None:
+        video_width = probe.dimensions[0]
+    background_duration = probe.video_duration
+
+    boundaries = get_segment_boundaries(duration, segments, probe.frame_rate)
+    log.debug("Segment boundaries: %s", boundaries)
+
+    segment_base = os.path.splitext(concat_list_path)[0]
+    segment_files = [f"{segment_base}_{i}.mp4" for i in range(len(boundaries))]
+    subtitle_files = [f"{segment_base}_{i}.ass" for i in range(len(boundaries))]
+
+    progress = {}
+    start_time = time()
+
+    def segment_progress(i: int):
+        def callback(event: FFmpegProgress):
+            progress[i] = event
+            out_time = sum(event.out_time for event in progress.values())
+            return on_progress(
+                FFmpegProgress(
+                    frame=sum(event.frame for event in progress.values()),
+                    out_time=out_time,
+                    speed=out_time / max(time() - start_time, 1e-3),
+                )
+            )
+
+        return callback
+
+    async def render_segment(i: int):
+        start, end = boundaries[i]
+
+        # Accurate input seeking decodes from the previous keyframe, so this reads the same frames
+        # as the looped background of render_single_pass
+        video = ffmpeg.input(
+            video_path, stream_loop=-1, ss=start % background_duration
+        ).video
+
+        image_bytes = None
+        if start < image_duration:
+            image_input, image_bytes, x, y = _title_image_input(image, video_width)
+            video = ffmpeg.overlay(
+                video,
+                image_input,
+                x=x,
+                y=y,
+                enable=f"between(t,0,{image_duration - start})",
+                format="yuv420",
+            )
+
+        if slice_ass(srt_path, start, end, subtitle_files[i]):
+            filter_name, filter_options = _subtitles_filter(subtitle_files[i])
+            video = video.filter(filter_name, subtitle_files[i], **filter_options)
+
+        async with encode_slot(
+            f"render_segmented {i + 1}/{len(boundaries)}"
+        ) as threads:
+            command = ffmpeg.output(
+                video,
+                segment_files[i],
+                vcodec="libx264",
+                crf=20,
+                preset=settings["preset"],
+                t=end - start,
+                threads=threads,
+            ).global_args(*settings["global_args"])
+            await run_ffmpeg(
+                command,
+                "Error during render_segmented ffmpeg command",
+                input=image_bytes,
+                capture_stderr=settings["capture_stderr"],
+                timeout=settings.get("timeout"),
+                on_progress=segment_progress(i) if on_progress else None,
+            )
 
     try:
-        (
-            ffmpeg.input(srt_path, itsoffset=total_delay)
-            .output(output_path, codec="copy")
-            .global_args("-loglevel", "error")
-            .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
-        )
-    except ffmpeg.Error as e:
-        # log.error(f"Error during ffmpeg command: {e.stderr}")
-        # raise
-        raise FFMpegProcessingError(
-            "Error during delay_srt ffmpeg command", stderr=e.stderr
+        tasks = [asyncio.create_task(render_segment(i)) for i in range(len(boundaries))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Don't leave the other segments encoding
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        with open(concat_list_path, "w") as f:
+            f.write("ffconcat version 1.0\n")
+            for segment_file in segment_files:
+                f.write(f"file '{os.path.abspath(segment_file)}'\n")
+
+        log.info(f"Joining {len(boundaries)} segments...")
+        command = ffmpeg.output(
+            ffmpeg.input(concat_list_path, format="concat", safe=0).video,
+            ffmpeg.input(audio_path).audio,
+            output_path,
+            vcodec="copy",
+            acodec="libmp3lame",
+            audio_bitrate="192k",
+            t=duration,
+            **FASTSTART,
+        ).global_args(*settings["global_args"])
+        await run_ffmpeg(
+            command,
+            "Error during render_segmented ffmpeg command",
+            capture_stderr=settings["capture_stderr"],
+            timeout=settings.get("timeout"),
         )
+    finally:
+        for file in [concat_list_path, *segment_files, *subtitle_files]:
+            if os.path.exists(file):
+                os.remove(file)
+
 
+def get_video_duration(video_path: str, sidecar: bool = False) -> float:
+    """
+    Returns the duration of the video in seconds.
 
-def get_video_duration(video_path: str) -> float:
-    """Returns the duration of the video in seconds."""
+    Args:
+    video_path (str): The path to the video file.
+    sidecar (bool): Whether to persist the probe next to the file, for long-lived assets.
+    """
 
     log.info("Getting video duration...")
     log.debug("Video path: %s", video_path)
 
-    probe = ffmpeg.probe(video_path)
-    duration = float(
-        next(stream for stream in probe["streams"] if stream["codec_type"] == "video")[
-            "duration"
-        ]
-    )
-    return duration
+    return probe_media(video_path, sidecar).video_duration
 
 
-def get_video_dimensions(video_path: str) -> tuple:
+def get_video_dimensions(video_path: str, sidecar: bool = False) -> tuple:
     """
     Get the dimensions of a video file.
 
     Args:
     video_path (str): The path to the video file.
+    sidecar (bool): Whether to persist the probe next to the file, for long-lived assets.
 
     Returns:
     tuple (width:int, height:int): A tuple containing the width and height of the video.
@@ -486,21 +1036,44 @@ def get_video_dimensions(video_path: str) -> tuple:
     log.info("Getting video dimensions...")
     log.debug("Video path: %s", video_path)
 
-    probe = ffmpeg.probe(video_path)
-    video_streams = [
-        stream for stream in probe["streams"] if stream["codec_type"] == "video"
-    ]
-    width = int(video_streams[0]["width"])
-    height = int(video_streams[0]["height"])
-    return width, height
+    return probe_media(video_path, sidecar).dimensions
 
 
-def get_audio_duration(audio_path: str):
+async def get_keyframe_times(video_path: str) -> list:
+    """
+    Get the timestamps of the keyframes of a video file, from its packets (without decoding).
+
+    Args:
+    video_path (str): The path to the video file.
+
+    Returns:
+    list[float]: The keyframe timestamps in seconds, in ascending order.
+    """
+
+    log.info("Getting keyframe times...")
+    log.debug("Video path: %s", video_path)
+
+    probe = await run_ffprobe(
+        video_path,
+        "Error during get_keyframe_times ffprobe command",
+        select_streams="v:0",
+        show_entries="packet=pts_time,flags",
+    )
+
+    return sorted(
+        float(packet["pts_time"])
+        for packet in probe.get("packets", [])
+        if "K" in packet.get("flags", "") and "pts_time" in packet
+    )
+
+
+def get_audio_duration(audio_path: str, sidecar: bool = False):
     """
     Get the duration of an audio file in seconds.
 
     Args:
     audio_path (str): The file path to the audio file.
+    sidecar (bool): Whether to persist the probe next to the file, for long-lived assets.
 
     Returns:
     float: Duration of the audio in seconds.
@@ -509,17 +1082,11 @@ def get_audio_duration(audio_path: str):
     log.info("Getting audio length...")
     log.debug("Audio path: %s", audio_path)
 
-    probe = ffmpeg.probe(audio_path)
-    audio_streams = [
-        stream for stream in probe["streams"] if stream["codec_type"] == "audio"
-    ]
-    if audio_streams:
-        duration = float(audio_streams[0]["duration"])
-        return duration
+    return probe_media(audio_path, sidecar).audio_duration
 
 
 # Some additional logic to compress test files
-def compress_video(input_path, output_path, config_preset="default"):
+async def compress_video(input_path, output_path, config_preset="default"):
     """Compress video files to a lower bitrate."""
     log.info("Compressing video...")
     log.debug("Input path: %s", input_path)
@@ -529,8 +1096,8 @@ def compress_video(input_path, output_path, config_preset="default"):
     log.debug("FFmpeg settings: %s", settings)
     log
 
-    try:
-        (
+    async with encode_slot("compress_video") as threads:
+        command = (
             ffmpeg.input(input_path)
             .output(
                 output_path,
@@ -539,49 +1106,52 @@ def compress_video(input_path, output_path, config_preset="default"):
                 preset=settings["preset"],
                 acodec="aac",
                 strict="experimental",
+                threads=threads,
             )
             .global_args(*settings["global_args"])
-            .run(
-                overwrite_output=True,
-                capture_stdout=settings["capture_stdout"],
-                capture_stderr=settings["capture_stderr"],
-            )
         )
-    except ffmpeg.Error as e:
-        raise FFMpegProcessingError(
-            "Error during compress_video ffmpeg command", stderr=e.stderr
+        await run_ffmpeg(
+            command,
+            "Error during compress_video ffmpeg command",
+            capture_stderr=settings["capture_stderr"],
+            timeout=settings.get("timeout"),
         )
 
 
-def compress_directory(directory):
+async def compress_directory(directory):
     """Compress all MP4 files in the specified directory."""
     for filename in os.listdir(directory):
         if filename.endswith(".mp4"):
             input_path = os.path.join(directory, filename)
             output_path = os.path.join(directory, f"compressed_{filename}")
             log.info(f"Compressing {input_path} to {output_path}...")
-            compress_video(input_path, output_path)
+            await compress_video(input_path, output_path)
 
 
 if __name__ == "__main__":
     """
     Provides a command-line interface for the ffmpeg utility functions.
     """
+    import asyncio
     import sys
 
     if sys.argv[1] == "resize_video":
-        resize_video(sys.argv[2], "cmd_line_output.mp4")
+        asyncio.run(resize_video(sys.argv[2], "cmd_line_output.mp4"))
     elif sys.argv[1] == "split_video":
-        split_video(
-            sys.argv[2], cast(float, sys.argv[3]), "cmd_line_looped_output%01d.mp4"
+        asyncio.run(
+            split_video(
+                sys.argv[2], cast(float, sys.argv[3]), "cmd_line_looped_output%01d.mp4"
+            )
         )
     elif sys.argv[1] == "loop_video_to_audio":
         audio_duration = get_audio_duration(sys.argv[2])
-        loop_video_to_audio(
-            cast(float, audio_duration), sys.argv[3], "cmd_line_looped_video.mp4"
+        asyncio.run(
+            loop_video_to_audio(
+                cast(float, audio_duration), sys.argv[3], "cmd_line_looped_video.mp4"
+            )
         )
     elif sys.argv[1] == "compress":
-        compress_directory(sys.argv[2])
+        asyncio.run(compress_directory(sys.argv[2]))
     else:
         print("Invalid command")
         sys.exit(1)
@@ -0,0 +1,224 @@
+import asyncio
+import inspect
+import json
+import sys
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import ffmpeg
+
+from app.utils.logger import log
+
+# Number of stderr lines kept for the error of a failed command
+STDERR_TAIL_LINES = 200
+
+
+class FFMpegProcessingError(Exception):
+    def __init__(self, message, stderr=None):
+        super().__init__(message)
+        self.stderr = stderr
+
+
+@dataclass(frozen=True)
+class FFmpegProgress:
+    """A progress update of a running ffmpeg command, parsed from '-progress pipe:1'."""
+
+    frame: int
+    # Seconds of output written so far
+    out_time: float
+    # Encoding speed as a multiple of realtime, None until ffmpeg can estimate it
+    speed: float | None
+
+
+ProgressCallback = Callable[[FFmpegProgress], Any]
+
+
+def _parse_number(value: str | None, cast: Callable = float):
+    try:
+        return cast(value.strip().rstrip("x"))
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_progress(fields: dict) -> FFmpegProgress:
+    """Parse one block of key=value fields written by '-progress' into an FFmpegProgress."""
+    out_time_us = _parse_number(fields.get("out_time_us"), int)
+    return FFmpegProgress(
+        frame=_parse_number(fields.get("frame"), int) or 0,
+        out_time=max(out_time_us or 0, 0) / 1_000_000,
+        speed=_parse_number(fields.get("speed")),
+    )
+
+
+async def _read_progress(stream: asyncio.StreamReader, on_progress: ProgressCallback):
+    fields = {}
+    async for line in stream:
+        key, _, value = line.decode(errors="replace").strip().partition("=")
+        fields[key] = value
+        # Every block of fields ends with progress=continue (or progress=end)
+        if key == "progress":
+            result = on_progress(parse_progress(fields))
+            if inspect.isawaitable(result):
+                await result
+            fields = {}
+
+
+async def _read_stderr(stream: asyncio.StreamReader, tail: deque, echo: bool):
+    async for line in stream:
+        tail.append(line)
+        if echo:
+            sys.stderr.buffer.write(line)
+            sys.stderr.buffer.flush()
+
+
+async def _write_stdin(stream: asyncio.StreamWriter, input: bytes):
+    try:
+        stream.write(input)
+        await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # ffmpeg exited early, its stderr will tell us why
+        pass
+    finally:
+        stream.close()
+
+
+async def run_ffmpeg(
+    stream_spec,
+    error_message: str,
+    input: bytes | None = None,
+    capture_stdout: bool = False,
+    capture_stderr: bool = True,
+    timeout: float | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> bytes | None:
+    """
+    Run an ffmpeg-python command as an asyncio subprocess, without blocking the event loop.
+
+    The stderr of the command is always read, so a failed command raises with it. When it is not
+    captured (for presets that show the ffmpeg output), it is also echoed to our stderr as it arrives.
+    If the awaiting task is cancelled or the timeout expires, the ffmpeg process is killed.
+
+    Args:
+        stream_spec: The ffmpeg-python output node of the command.
+        error_message (str): The message of the FFMpegProcessingError raised if the command fails.
+        input (bytes): Bytes to write to the stdin of the command.
+        capture_stdout (bool): Whether to capture and return the stdout of the command.
+        capture_stderr (bool): Whether to keep the stderr of the command out of our stderr.
+        timeout (float): Seconds after which the command is killed, if any.
+        on_progress (callable): Called (or awaited) with an FFmpegProgress on every progress update.
+            Cannot be combined with capture_stdout, as progress is read from stdout.
+
+    Returns:
+        bytes: The stdout of the command, if captured.
+
+    Raises:
+        FFMpegProcessingError: If the command fails or times out.
+    """
+    if capture_stdout and on_progress:
+        raise ValueError("Progress is written to stdout, so stdout cannot be captured")
+
+    args = ffmpeg.compile(stream_spec, overwrite_output=True)
+    if on_progress:
+        args[1:1] = ["-progress", "pipe:1", "-nostats"]
+    log.debug("Running ffmpeg: %s", args)
+
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=(
+            asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL
+        ),
+        stdout=(
+            asyncio.subprocess.PIPE
+            if capture_stdout or on_progress
+            else asyncio.subprocess.DEVNULL
+        ),
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    tasks = [_read_stderr(process.stderr, stderr_tail, not capture_stderr)]
+    if input is not None:
+        tasks.append(_write_stdin(process.stdin, input))
+    if on_progress:
+        tasks.append(_read_progress(process.stdout, on_progress))
+    if capture_stdout:
+        tasks.append(process.stdout.read())
+
+    async def communicate():
+        results = await asyncio.gather(*tasks)
+        await process.wait()
+        return results[-1] if capture_stdout else None
+
+    try:
+        stdout = await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill(process)
+        raise FFMpegProcessingError(
+            f"{error_message} (timed out after {timeout}s)",
+            stderr=b"".join(stderr_tail),
+        )
+    except BaseException:
+        # Cancelled (or a progress callback failed), don't leave ffmpeg running
+        await _kill(process)
+        raise
+
+    if process.returncode != 0:
+        raise FFMpegProcessingError(error_message, stderr=b"".join(stderr_tail))
+
+    return stdout
+
+
+async def run_ffprobe(
+    path: str, error_message: str, timeout: float | None = None, **kwargs
+) -> dict:
+    """
+    Run ffprobe on a media file as an asyncio subprocess, without blocking the event loop. The
+    async counterpart of ffmpeg.probe, taking the same extra ffprobe options as keyword arguments.
+    If the awaiting task is cancelled or the timeout expires, the ffprobe process is killed.
+
+    Args:
+        path (str): The path to the media file.
+        error_message (str): The message of the FFMpegProcessingError raised if ffprobe fails.
+        timeout (float): Seconds after which ffprobe is killed, if any.
+
+    Returns:
+        dict: The parsed JSON output of ffprobe.
+
+    Raises:
+        FFMpegProcessingError: If ffprobe fails or times out.
+    """
+    args = ["ffprobe", "-show_format", "-show_streams", "-of", "json"]
+    for key, value in kwargs.items():
+        args += [f"-{key}", str(value)]
+    args.append(path)
+    log.debug("Running ffprobe: %s", args)
+
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill(process)
+        raise FFMpegProcessingError(f"{error_message} (timed out after {timeout}s)")
+    except BaseException:
+        await _kill(process)
+        raise
+
+    if process.returncode != 0:
+        raise FFMpegProcessingError(error_message, stderr=stderr)
+
+    return json.loads(stdout)
+
+
+async def _kill(process: asyncio.subprocess.Process):
+    if process.returncode is None:
+        log.warning(f"Killing ffmpeg process {process.pid}")
+        process.kill()
+        await process.wait()
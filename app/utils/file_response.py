@@ -0,0 +1,198 @@
+import mimetypes
+import os
+
+from email.utils import formatdate
+
+import anyio
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Bytes read (and sent) at a time, when the server can't send the file itself
+CHUNK_SIZE = 256 * 1024
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """
+    The strong ETag of a file. Files are written once, then replaced whole (ie a re-render), which
+    changes their modification time, so it identifies their content without hashing it.
+    """
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(range_header: str, size: int) -> tuple | None:
+    """
+    Parse the Range header of a request for a file.
+
+    Args:
+        range_header (str): The Range header, ie 'bytes=0-1023', 'bytes=1024-' or 'bytes=-1024'.
+        size (int): The size of the file.
+
+    Returns:
+        tuple: The first and last byte of the range (inclusive), None if the whole file should be
+            sent (the header is malformed, or asks for several ranges).
+
+    Raises:
+        ValueError: If the range is outside of the file.
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    if (
+        not (first or last)
+        or not (first or "0").isdigit()
+        or not (last or "0").isdigit()
+    ):
+        return None
+    if first and last and int(last) < int(first):
+        return None
+
+    if not first:
+        # The last bytes of the file
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError(
+                f"Range {range_header} outside of the {size} bytes of the file"
+            )
+        return max(0, size - suffix), size - 1
+
+    start = int(first)
+    if start >= size:
+        raise ValueError(
+            f"Range {range_header} outside of the {size} bytes of the file"
+        )
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class _FileRangeResponse(Response):
+    """Sends a range of a file, with the server's zero-copy sendfile if it offers it."""
+
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        end: int,
+        status_code: int,
+        headers: dict,
+        send_body: bool,
+    ):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.send_body = send_body
+        self.status_code = status_code
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        count = self.end - self.start + 1
+        if not self.send_body or count <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": f,
+                        "offset": self.start,
+                        "count": count,
+                    }
+                )
+            return
+
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                remaining = remaining - len(chunk) if chunk else 0
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": remaining > 0,
+                    }
+                )
+
+
+def file_response(
+    request: Request,
+    path: str,
+    cache_control: str,
+    download_name: str | None = None,
+) -> Response:
+    """
+    Respond to a GET (or HEAD) request for a file, with byte range and conditional request support.
+
+    A range request (ie a browser seeking in a video) gets 206 with the bytes of the range, and a
+    request whose If-None-Match has the current ETag of the file gets 304, without reading the file.
+
+    Args:
+        request (Request): The request.
+        path (str): The path to the file.
+        cache_control (str): The Cache-Control header of the response.
+        download_name (str): The name to download the file as, None to show it inline.
+
+    Returns:
+        Response: The response, 416 if the requested range is outside of the file.
+
+    Raises:
+        FileNotFoundError: If there is no such file.
+    """
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "cache-control": cache_control,
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    ):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers["content-type"] = media_type
+    if download_name:
+        headers["content-disposition"] = f'attachment; filename="{download_name}"'
+
+    size = stat.st_size
+    byte_range = None
+    range_header = request.headers.get("range")
+    # A range of an older version of the file (If-Range) would be corrupt, send the whole file instead
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=416, headers={**headers, "content-range": f"bytes */{size}"}
+            )
+
+    start, end = byte_range or (0, size - 1)
+    if byte_range:
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+    headers["content-length"] = str(end - start + 1)
+
+    return _FileRangeResponse(
+        path,
+        start,
+        end,
+        206 if byte_range else 200,
+        headers,
+        send_body=request.method != "HEAD",
+    )
@@ -1,30 +1,67 @@
-import requests
+import httpx
 import os
 import json
 from typing import cast
 import re
 
+from app.utils.disk_cache import DiskCache, hash_file, make_cache_key
+from app.utils.http_client import get_client
 from app.utils.logger import log
 
+# Compact alignments (see compact_alignment), keyed on the audio and the cleaned transcript
+alignment_cache = DiskCache(
+    os.getenv("ALIGNMENT_CACHE_DIR") or os.path.join("tmp", "alignment_cache"),
+    int(os.getenv("ALIGNMENT_CACHE_MAX_BYTES") or 64 * 1024**2),
+    suffix=".json",
+)
+
+# The fields of the aligned words we use, Gentle also returns the phones and offsets of every word
+ALIGNED_WORD_FIELDS = ("word", "start", "end", "case")
+
+
+def compact_alignment(aligned: str) -> str:
+    """
+    Strips a Gentle alignment down to the fields of its words we use (see ALIGNED_WORD_FIELDS).
+
+    Args:
+        aligned (str): The alignment JSON returned by Gentle.
+
+    Returns:
+        str: The compact alignment JSON, which can be used in place of the full one (ie by group_words).
+    """
+    words = [
+        {field: word[field] for field in ALIGNED_WORD_FIELDS if field in word}
+        for word in json.loads(aligned)["words"]
+    ]
+    return json.dumps({"words": words}, separators=(",", ":"))
+
+
+def get_alignment_cache_stats() -> dict:
+    """Returns the hit/miss counters and size of the alignment cache. See DiskCache.stats."""
+    return alignment_cache.stats()
+
 
 class GentleAligner:
     def __init__(self):
         self.baseUrl = cast(str, os.getenv("GENTLE_ALIGNER_URL"))
         pass
 
-    def generate_aligned(self, transcript: str, audio_file_path: str) -> dict:
+    def generate_aligned(self, transcript: str, audio_file_path: str) -> str:
         """
         Generates aligned content by sending a transcript and audio file to the Gentle Aligner Docker Service.
 
+        Alignments are cached on disk (see alignment_cache) by the hash of the audio and the cleaned
+        transcript, so aligning the same audio again doesn't call the service.
+
         Args:
             transcript (str): The transcript to be aligned.
             audio_file_path (str): The path to the audio file.
 
         Returns:
-            object: The response text from the Gentle Aligner Docker Service.
+            str: The compact alignment JSON (see compact_alignment) of the Gentle Aligner response.
 
         Raises:
-            requests.exceptions.HTTPError: If there is an HTTP error while requesting the Gentle Aligner Docker Service.
+            httpx.HTTPStatusError: If there is an HTTP error while requesting the Gentle Aligner Docker Service.
             Exception: If there is an unexpected error while requesting the Gentle Aligner Docker Service.
         """
 
@@ -33,18 +70,26 @@ class GentleAligner:
 
         transcript = self.clean_up_transcript(transcript)
 
+        key = make_cache_key(hash_file(audio_file_path), transcript)
+        cached = alignment_cache.get_bytes(key)
+        if cached is not None:
+            log.info(f"Using cached alignment {key[:12]}")
+            return cached.decode()
+
         response = None
         with open(audio_file_path, "rb") as audio_file:
             try:
-                response = requests.post(
+                response = get_client("gentle").post(
                     url, data={"transcript": transcript}, files={"audio": audio_file}
                 )
                 log.debug(f"Aligner res: {response}")
                 response.raise_for_status()
 
-                return response.text
+                aligned = compact_alignment(response.text)
+                alignment_cache.put_bytes(key, aligned.encode())
+                return aligned
 
-            except requests.exceptions.HTTPError as e:
+            except httpx.HTTPStatusError as e:
                 if response is not None:
                     log.error(
                         f"HTTP Error requesting Gentle Aligner Docker Service: {response.status_code} - {e}"
@@ -57,109 +102,85 @@ class GentleAligner:
                 )
                 raise e
 
-    def generate_srt(self, aligned_object: str, output_path: str):
+    def group_words(self, aligned_object: str) -> list:
         """
-        Generate an SRT file from the aligned object.
+        Group the aligned words into subtitles of up to 3 words.
+
+        A group is also ended early when the next word starts a new sentence (is capitalized).
+        Words that could not be aligned are skipped.
 
         Args:
-            aligned_object (dict): The aligned object containing the words and their timings.
-            output_path (str): The path to save the SRT file.
+            aligned_object (str): The aligned object containing the words and their timings.
 
         Returns:
-            None
+            list: (start, end, text) tuples of the subtitles, in seconds.
         """
 
-        srt_content = ""
-        counter = 1
-
-        # log.debug(f"Aligned object: {aligned_object}")
-
         aligned_object = json.loads(aligned_object)
         log.debug(
             f"Type of aligned_object (should be json/dict): {type(aligned_object)}"
         )
 
-        counter = 1
-        srt_content = ""
         group_size = 3
+        groups = []
         temp_words = []
         temp_start = None
         temp_end = None
 
-        len_of_aligned_object = len(aligned_object["words"])
-
-        # TODO: Clean up this code
-        for i in range(0, len_of_aligned_object, 1):
-            if aligned_object["words"][i]["case"] != "success":
-                log.debug(f"Error aligning the item: {aligned_object['words'][i]}")
+        words = aligned_object["words"]
+        for i, word in enumerate(words):
+            if word["case"] != "success":
+                log.debug(f"Error aligning the item: {word}")
                 continue
 
             # Set the start time of the group
-            if not temp_start:
-                temp_start = aligned_object["words"][i]["start"]
+            if temp_start is None:
+                temp_start = word["start"]
 
             # Update the end time to the last word's end time in the group
-            temp_end = aligned_object["words"][i]["end"]
-            temp_words.append(aligned_object["words"][i]["word"])
-
-            # If it's the last word, write the group
-            if i == len_of_aligned_object - 1:
-                start_time = int(temp_start * 1000)
-                end_time = int(temp_end * 1000)
-
-                start_srt = f"{start_time // 3600000:02}:{(start_time % 3600000) // 60000:02}:{(start_time % 60000) // 1000:02},{start_time % 1000:03}"
-                end_srt = f"{end_time // 3600000:02}:{(end_time % 3600000) // 60000:02}:{(end_time % 60000) // 1000:02},{end_time % 1000:03}"
-
-                words_str = " ".join(temp_words)
-                srt_content += f"{counter}\n{start_srt} --> {end_srt}\n{words_str}\n\n"
-                continue
-
-            # if the next word is capitalized, write the group, but only if the current word is not capitalized
-            if (
-                i + 1 < len_of_aligned_object
-                and aligned_object["words"][i + 1]["word"][0].isupper()
-                and aligned_object["words"][i]["word"][0].islower()
-            ):
-                start_time = int(temp_start * 1000)
-                end_time = int(temp_end * 1000)
-
-                start_srt = f"{start_time // 3600000:02}:{(start_time % 3600000) // 60000:02}:{(start_time % 60000) // 1000:02},{start_time % 1000:03}"
-                end_srt = f"{end_time // 3600000:02}:{(end_time % 3600000) // 60000:02}:{(end_time % 60000) // 1000:02},{end_time % 1000:03}"
-
-                words_str = " ".join(temp_words)
-                srt_content += f"{counter}\n{start_srt} --> {end_srt}\n{words_str}\n\n"
-                counter += 1
-
+            temp_end = word["end"]
+            temp_words.append(word["word"])
+
+            # if the next word is capitalized, end the group, but only if the current word is not capitalized
+            next_starts_sentence = (
+                i + 1 < len(words)
+                and words[i + 1]["word"][0].isupper()
+                and word["word"][0].islower()
+            )
+
+            if next_starts_sentence or len(temp_words) == group_size:
+                groups.append((temp_start, temp_end, " ".join(temp_words)))
                 temp_words = []
                 temp_start = None
                 temp_end = None
-                continue
 
-            if len(temp_words) == group_size:
-                start_time = int(temp_start * 1000)
-                end_time = int(temp_end * 1000)
+        # Handle any remaining words that didn't make a full group
+        if temp_words:
+            groups.append((temp_start, temp_end, " ".join(temp_words)))
 
-                start_srt = f"{start_time // 3600000:02}:{(start_time % 3600000) // 60000:02}:{(start_time % 60000) // 1000:02},{start_time % 1000:03}"
-                end_srt = f"{end_time // 3600000:02}:{(end_time % 3600000) // 60000:02}:{(end_time % 60000) // 1000:02},{end_time % 1000:03}"
+        return groups
 
-                words_str = " ".join(temp_words)
-                srt_content += f"{counter}\n{start_srt} --> {end_srt}\n{words_str}\n\n"
-                counter += 1
+    def generate_srt(self, aligned_object: str, output_path: str):
+        """
+        Generate an SRT file from the aligned object.
 
-                temp_words = []
-                temp_start = None
-                temp_end = None
+        Args:
+            aligned_object (dict): The aligned object containing the words and their timings.
+            output_path (str): The path to save the SRT file.
 
-        # Handle any remaining words that didn't make a full group
-        if temp_words:
-            start_time = int(cast(int, temp_start) * 1000)
-            end_time = int(cast(int, temp_end) * 1000)
+        Returns:
+            None
+        """
 
-            start_srt = f"{start_time // 3600000:02}:{(start_time % 3600000) // 60000:02}:{(start_time % 60000) // 1000:02},{start_time % 1000:03}"
-            end_srt = f"{end_time // 3600000:02}:{(end_time % 3600000) // 60000:02}:{(end_time % 60000) // 1000:02},{end_time % 1000:03}"
+        def format_srt_time(seconds: float) -> str:
+            ms = int(seconds * 1000)
+            return f"{ms // 3600000:02}:{(ms % 3600000) // 60000:02}:{(ms % 60000) // 1000:02},{ms % 1000:03}"
 
-            words_str = " ".join(temp_words)
-            srt_content += f"{counter}\n{start_srt} --> {end_srt}\n{words_str}\n\n"
+        srt_content = ""
+        for counter, (start, end, words_str) in enumerate(
+            self.group_words(aligned_object), 1
+        ):
+            srt_content += f"{counter}\n{format_srt_time(start)} --> {format_srt_time(end)}\n{words_str}\n\n"
 
         try:
             with open(output_path, "w") as f:
@@ -0,0 +1,158 @@
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+
+from bisect import bisect_left
+from time import time
+
+import httpx
+
+from app.utils.disk_cache import locked_json_file, write_locked_json_file
+from app.utils.logger import log
+
+# Read timeout (in seconds) of the requests to each provider, overridden by HTTP_TIMEOUT_<PROVIDER>.
+# Gentle aligns the whole audio before responding
+PROVIDER_TIMEOUTS = {"openai": 120, "elevenlabs": 60, "gentle": 300}
+# Upper bounds (in seconds) of the buckets of the latency histograms, the last bucket is unbounded
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Histograms are kept in a file, so they cover the requests of every process (the web app and the workers)
+latency_stats_path = os.path.join(
+    os.getenv("HTTP_STATS_DIR") or os.path.join("tmp", "http_stats"), "latency.json"
+)
+
+# One pool per provider and process. Async clients are bound to the event loop they are used on, and
+# Celery tasks run each job on its own loop, so they are kept per loop
+_clients = {}
+_clients_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2]), and can be disabled with HTTP2=0."""
+    if os.getenv("HTTP2", "1") == "0":
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+def _client_options(provider: str) -> dict:
+    timeout = float(
+        os.getenv(f"HTTP_TIMEOUT_{provider.upper()}")
+        or PROVIDER_TIMEOUTS.get(provider, 60)
+    )
+    return {
+        "timeout": httpx.Timeout(
+            timeout, connect=float(os.getenv("HTTP_CONNECT_TIMEOUT") or 10)
+        ),
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS") or 20),
+            max_keepalive_connections=int(
+                os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS") or 10
+            ),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY") or 30),
+        ),
+        "http2": _http2_enabled(),
+    }
+
+
+def _start_timer(request: httpx.Request):
+    request.extensions["start_time"] = time()
+
+
+def _record_latency(provider: str, response: httpx.Response):
+    """Adds the time to the response headers to the histogram of its endpoint."""
+    request = response.request
+    latency = time() - request.extensions["start_time"]
+    # Requests can name their endpoint, ie when the path holds an ID
+    endpoint = f"{provider} {request.method} {request.extensions.get('endpoint', request.url.path)}"
+    log.debug(f"{endpoint} responded {response.status_code} in {latency:.2f}s")
+
+    try:
+        with locked_json_file(latency_stats_path) as (fd, stats):
+            histogram = stats.setdefault(
+                endpoint,
+                {
+                    "count": 0,
+                    "sum": 0.0,
+                    "errors": 0,
+                    "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+                },
+            )
+            histogram["count"] += 1
+            histogram["sum"] += latency
+            histogram["errors"] += int(response.status_code >= 400)
+            histogram["buckets"][bisect_left(LATENCY_BUCKETS, latency)] += 1
+            write_locked_json_file(fd, stats)
+    except OSError as e:
+        # The stats are not worth failing a request over
+        log.error(f"Error recording the latency of {endpoint}: {e}")
+
+
+def get_client(provider: str) -> httpx.Client:
+    """
+    Returns the client of the provider, shared by every (sync) request of the process, so
+    connections are kept alive between requests.
+
+    Args:
+        provider (str): The name of the provider, deciding the timeout (see PROVIDER_TIMEOUTS).
+    """
+    # Stages call providers from worker threads
+    with _clients_lock:
+        if provider not in _clients:
+            _clients[provider] = httpx.Client(
+                **_client_options(provider),
+                event_hooks={
+                    "request": [_start_timer],
+                    "response": [lambda response: _record_latency(provider, response)],
+                },
+            )
+        return _clients[provider]
+
+
+def get_async_client(provider: str) -> httpx.AsyncClient:
+    """
+    Returns the async client of the provider, shared by every request of the running event loop.
+
+    Args:
+        provider (str): The name of the provider, deciding the timeout (see PROVIDER_TIMEOUTS).
+    """
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if provider not in clients:
+
+        async def start_timer(request: httpx.Request):
+            _start_timer(request)
+
+        async def record_latency(response: httpx.Response):
+            # The histograms are rewritten under a file lock, which would block the loop
+            await asyncio.to_thread(_record_latency, provider, response)
+
+        clients[provider] = httpx.AsyncClient(
+            **_client_options(provider),
+            event_hooks={"request": [start_timer], "response": [record_latency]},
+        )
+    return clients[provider]
+
+
+async def close_async_clients():
+    """
+    Close the async clients of the running event loop, and their connections. Called before a loop
+    is closed (ie at the end of a Celery task), as its clients can't be used on another loop.
+    """
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+def get_http_latency_stats() -> dict:
+    """Returns the latency histogram of each endpoint, with the upper bounds of its buckets."""
+    with locked_json_file(latency_stats_path) as (_, stats):
+        pass
+    return {
+        "buckets": [*LATENCY_BUCKETS, None],
+        "endpoints": {
+            endpoint: {**histogram, "mean": histogram["sum"] / histogram["count"]}
+            for endpoint, histogram in stats.items()
+        },
+    }
@@ -1,21 +1,86 @@
 from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
+from typing import NamedTuple
 import os
 import textwrap
 
+TEMPLATE_PATH = os.path.join("assets", "reddit_title_template.png")
+FONT_NAME = "Poppins-SemiBold.ttf"
+FONT_SIZE = 34
 
-def generate_title_image(output_path: str, title: str):
+
+@lru_cache(maxsize=1)
+def _load_template() -> Image.Image:
+    """Loads and decodes the title template once per process."""
+    try:
+        image = Image.open(TEMPLATE_PATH)
+        image.load()
+        return image.convert("RGBA")
+    except Exception as e:
+        raise ValueError(f"Error loading title template: {e}")
+
+
+@lru_cache(maxsize=8)
+def _load_scaled_template(width: int) -> Image.Image:
+    """Returns the title template scaled to the given width, cached per width."""
+    template = _load_template()
+    if width == template.width:
+        return template
+
+    height = round(template.height * width / template.width)
+    return template.resize((width, height), Image.LANCZOS)
+
+
+@lru_cache(maxsize=8)
+def _get_card_box(width: int) -> tuple:
+    """Returns the bounding box of the visible (non transparent) card of the scaled template."""
+    return _load_scaled_template(width).getchannel("A").getbbox()
+
+
+class TitleCard(NamedTuple):
     """
-    Generate a title image with the given title and save it to the specified output path.
+    The visible part of a title image, and where it sits within the full title image.
+
+    Attributes:
+        image (Image.Image): The RGBA title image, cropped to the visible card.
+        left (int): The x offset of the card within the full title image.
+        top (int): The y offset of the card within the full title image.
+        full_width (int): The width of the full title image.
+        full_height (int): The height of the full title image.
+    """
+
+    image: Image.Image
+    left: int
+    top: int
+    full_width: int
+    full_height: int
+
+
+@lru_cache(maxsize=8)
+def _load_font(size: int) -> ImageFont.FreeTypeFont:
+    """Loads the title font face once per size."""
+    try:
+        return ImageFont.truetype(FONT_NAME, size)
+    except Exception as e:
+        raise ValueError(f"Error loading font: {e}")
+
+
+def render_title_image(title: str, target_width: int | None = None) -> Image.Image:
+    """
+    Render a title image with the given title, in memory.
+
+    The decoded template and font are cached per process, and the image is rendered directly at
+    the target width (rather than rendered at template size and rescaled), so no files are involved.
 
     Args:
-        output_path (str): The path where the generated title image will be saved.
         title (str): The title to be displayed on the image.
+        target_width (int): The width to render the image at. Defaults to the template width.
 
     Raises:
         ValueError: If the length of the title exceeds 125 characters.
 
     Returns:
-        None
+        Image.Image: The RGBA title image.
     """
     if len(title) > 125:
         raise ValueError(
@@ -24,20 +89,16 @@ def generate_title_image(output_path: str, title: str):
 
     title = title.strip()
 
-        
-    try:
-        template_path = os.path.join("assets", "reddit_title_template.png")
-        image = Image.open(template_path)
-    except Exception as e:
-        raise ValueError(f"Error loading title template: {e}")
+    template_width = _load_template().width
+    if target_width is None:
+        target_width = template_width
+    scale = target_width / template_width
 
+    image = _load_scaled_template(target_width).copy()
     draw = ImageDraw.Draw(image)
+    font = _load_font(round(FONT_SIZE * scale))
 
-    try:
-        font = ImageFont.truetype("Poppins-SemiBold.ttf", 34)
-    except Exception as e:
-        raise ValueError(f"Error loading font: {e}")
-
+    # Layout is defined in template pixels
     x = 400
     y = 745
     if len(title) < 80:
@@ -50,17 +111,52 @@ def generate_title_image(output_path: str, title: str):
     lines = textwrap.wrap(title, width=43)
 
     for line in lines:
-        bbox = draw.textbbox((0, 0), line, font=font)
-        text_width = bbox[2] - bbox[0]
         line_position = (
-            x,
-            y,
+            round(x * scale),
+            round(y * scale),
         )
 
         draw.text(line_position, line, fill=color, font=font)
         y += line_height
 
-    image.save(output_path)
+    return image
+
+
+def render_title_card(title: str, target_width: int | None = None) -> TitleCard:
+    """
+    Render a title image (see render_title_image), cropped to the tight bounding box of the card.
+    The template is mostly transparent, so overlaying only the card is much cheaper per frame.
+
+    Args:
+        title (str): The title to be displayed on the image.
+        target_width (int): The width to render the full image at. Defaults to the template width.
+
+    Returns:
+        TitleCard: The cropped card, with its offset in the full image.
+    """
+    image = render_title_image(title, target_width)
+    left, top, right, bottom = _get_card_box(image.width)
+
+    return TitleCard(
+        image.crop((left, top, right, bottom)), left, top, image.width, image.height
+    )
+
+
+def generate_title_image(output_path: str, title: str):
+    """
+    Generate a title image with the given title and save it to the specified output path.
+
+    Args:
+        output_path (str): The path where the generated title image will be saved.
+        title (str): The title to be displayed on the image.
+
+    Raises:
+        ValueError: If the length of the title exceeds 125 characters.
+
+    Returns:
+        None
+    """
+    render_title_image(title).save(output_path)
 
 
 if __name__ == "__main__":
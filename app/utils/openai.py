@@ -1,23 +1,19 @@
-import openai
+import asyncio
 import os
+import weakref
 
-import app.config
-
-from app.utils.logger import log
+from dataclasses import dataclass, field
+from time import time
 
+from openai import AsyncOpenAI
 
-def determine_gender_from_text(text: str) -> str:
-    openai.api_key = os.getenv("OPENAI_API_KEY")
+import app.config
 
-    log.info("Determining gender via OpenAi")
+from app.utils.http_client import get_async_client
+from app.utils.logger import log
 
-    try:
-        completion = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """
+GENDER_MODEL = "gpt-3.5-turbo"
+GENDER_PROMPT = """
                     You are a gender detection AI. You have one job. Given some text, use your analytical skills to determine the potential gender of the writer of the text.
                     You should use clues such as 'my boyfriend did x y z' (this is potentially a female writer).
                     Or if they say I (M25) this may mean they are Male and 25 years old. Use the context from the message to determine the gender
@@ -25,52 +21,118 @@ def determine_gender_from_text(text: str) -> str:
                     If you are not sure, thats completely fine, you can just default as 'm'.
                     As a reminder. ONLY reply with 'm' or 'f'. Nothing else. Ever.
                     Here is the text to decide the gender for:
-                    """,
-                },
-                {"role": "user", "content": text},
-            ],
-        )
+                    """
+
+IMPROVE_MODEL = "gpt-4"
+IMPROVE_PROMPT = """
+                    You are a grammar correction AI. You have one job. Given some text, use your skills to correct the grammar of the text.
+                    Given the following reddit post, correct grammar mistakes. Don't alter curse words or swearing.
+                    Replace slashes and dashes with the appropriate word.
+                    Remove dashes between words like high-end. Add punctuation as necessary for smooth speech flow.
+                    Only respond with the modified (or unmodified if no changes were made) text. Do not include any other information in your response.
+                    """
 
-        res = completion.choices[0].message.content
-        log.debug(f"For the text: \n{text}\nOpenAI determined gender as: {res}.")
+# One OpenAI client per async client of the event loop (see get_async_client)
+_clients = weakref.WeakKeyDictionary()
 
-        assert res != None
-        return res
 
-    except Exception as e:
-        log.error(f"An error occurred making a chat gpt request: {e}")
-        raise e
+def get_client() -> AsyncOpenAI:
+    """Returns the OpenAI client on the connection pool shared by the requests of the event loop."""
+    http_client = get_async_client("openai")
+    if http_client not in _clients:
+        _clients[http_client] = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client
+        )
+    return _clients[http_client]
 
 
-def improve_content_from_text(text: str) -> str:
-    openai.api_key = os.getenv("OPENAI_API_KEY")
+@dataclass(frozen=True)
+class ContentAnalysis:
+    """The result of analyse_content."""
+
+    # 'm' or 'f', the likely gender of the writer, used to pick the voice
+    gender: str
+    # The content with its grammar corrected, for the speech
+    content: str
+    # Seconds taken by each request, by name
+    latencies: dict = field(default_factory=dict)
 
-    log.info("Improving content via OpenAi")
 
+async def _chat(
+    model: str, system_prompt: str, text: str, latencies: dict, name: str
+) -> str:
+    start_time = time()
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4",
+        completion = await get_client().chat.completions.create(
+            model=model,
             messages=[
-                {
-                    "role": "system",
-                    "content": """
-                    You are a grammar correction AI. You have one job. Given some text, use your skills to correct the grammar of the text.
-                    Given the following reddit post, correct grammar mistakes. Don't alter curse words or swearing.
-                    Replace slashes and dashes with the appropriate word.
-                    Remove dashes between words like high-end. Add punctuation as necessary for smooth speech flow.
-                    Only respond with the modified (or unmodified if no changes were made) text. Do not include any other information in your response.
-                    """,
-                },
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": text},
             ],
         )
-
-        res = response.choices[0].message.content
-        log.debug(f"Original text: {text}")
-        log.debug(f"Improved text: {res}")
-
-        assert res != None
-        return res
     except Exception as e:
         log.error(f"An error occurred making a chat gpt request: {e}")
         raise e
+    finally:
+        latencies[name] = time() - start_time
+        log.info(f"OpenAI {name} request ({model}) took {latencies[name]:.2f}s")
+
+    res = completion.choices[0].message.content
+    assert res != None
+    return res
+
+
+async def determine_gender_from_text(text: str, latencies: dict | None = None) -> str:
+    log.info("Determining gender via OpenAi")
+
+    res = await _chat(
+        GENDER_MODEL,
+        GENDER_PROMPT,
+        text,
+        {} if latencies is None else latencies,
+        "gender",
+    )
+    log.debug(f"For the text: \n{text}\nOpenAI determined gender as: {res}.")
+
+    # The prompt asks for 'm' by default, so anything but a clear 'f' is treated as such
+    return "f" if res.strip().lower().startswith("f") else "m"
+
+
+async def improve_content_from_text(text: str, latencies: dict | None = None) -> str:
+    log.info("Improving content via OpenAi")
+
+    res = await _chat(
+        IMPROVE_MODEL,
+        IMPROVE_PROMPT,
+        text,
+        {} if latencies is None else latencies,
+        "improve",
+    )
+    log.debug(f"Original text: {text}")
+    log.debug(f"Improved text: {res}")
+
+    return res
+
+
+async def analyse_content(text: str) -> ContentAnalysis:
+    """
+    Determine the gender of the writer and correct the grammar of the content, concurrently.
+
+    Both requests are independent (the gender is determined from the original text), so they run
+    side by side on the shared client, and the stage takes as long as the slowest of them.
+
+    Args:
+        text (str): The content of the post.
+
+    Returns:
+        ContentAnalysis: The gender, improved content and the latency of each request.
+
+    Raises:
+        Exception: If either request fails.
+    """
+    latencies = {}
+    gender, content = await asyncio.gather(
+        determine_gender_from_text(text, latencies),
+        improve_content_from_text(text, latencies),
+    )
+    return ContentAnalysis(gender, content, latencies)
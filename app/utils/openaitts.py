@@ -1,6 +1,7 @@
 import os
 
 from app.utils.tts import TTS
+from app.utils.http_client import get_client
 from app.utils.logger import log
 
 from app.utils.openaitts_voice_id import OpenAiTTSVoiceId
@@ -9,17 +10,24 @@ from openai import OpenAI
 
 
 class OpenAITTS(TTS):
+    provider = "openai"
+    model = "tts-1"
+
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # On the shared connection pool, so jobs don't each open their own connections
+        self.client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"), http_client=get_client("openai")
+        )
         pass
 
-    def generate_mp3(self, text: str, gender: str, output_path: str):
-        voiceid = OpenAiTTSVoiceId.FEMALE if gender == "f" else OpenAiTTSVoiceId.MALE
+    def get_voice_id(self, gender: str) -> str:
+        return OpenAiTTSVoiceId.FEMALE if gender == "f" else OpenAiTTSVoiceId.MALE
 
+    def synthesize(self, text: str, voice_id: str, output_path: str):
         try:
             response = self.client.audio.speech.create(
-                model="tts-1",
-                voice=voiceid,
+                model=self.model,
+                voice=voice_id,
                 input=text,
             )
             response.write_to_file(output_path)
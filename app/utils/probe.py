@@ -0,0 +1,190 @@
+import ffmpeg
+import json
+import os
+import threading
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from fractions import Fraction
+
+from app.utils.ffmpeg_runner import run_ffprobe
+from app.utils.logger import log
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    """Parsed ffprobe output of a media file."""
+
+    path: str
+    raw: dict
+
+    def _first_stream(self, codec_type: str) -> dict | None:
+        return next(
+            (
+                stream
+                for stream in self.raw["streams"]
+                if stream["codec_type"] == codec_type
+            ),
+            None,
+        )
+
+    @property
+    def video_stream(self) -> dict | None:
+        return self._first_stream("video")
+
+    @property
+    def audio_stream(self) -> dict | None:
+        return self._first_stream("audio")
+
+    @property
+    def video_duration(self) -> float:
+        stream = self.video_stream
+        if stream is None:
+            raise ValueError(f"No video stream found in {self.path}")
+        return float(stream["duration"])
+
+    @property
+    def audio_duration(self) -> float | None:
+        stream = self.audio_stream
+        if stream is None:
+            return None
+        return float(stream["duration"])
+
+    @property
+    def bit_rate(self) -> int | None:
+        """The overall bit rate of the file in bits per second, if known."""
+        bit_rate = self.raw.get("format", {}).get("bit_rate")
+        return int(bit_rate) if bit_rate else None
+
+    @property
+    def frame_rate(self) -> Fraction:
+        stream = self.video_stream
+        if stream is None:
+            raise ValueError(f"No video stream found in {self.path}")
+        return Fraction(stream["r_frame_rate"])
+
+    @property
+    def dimensions(self) -> tuple:
+        stream = self.video_stream
+        if stream is None:
+            raise ValueError(f"No video stream found in {self.path}")
+        return int(stream["width"]), int(stream["height"])
+
+
+class ProbeCache:
+    """
+    Process-wide LRU cache of ffprobe results.
+
+    Entries are keyed on (path, size, mtime), so a file that is rewritten is probed again.
+    Long-lived assets (such as background videos) can additionally persist their probe in a
+    '<path>.probe.json' sidecar, so new worker processes don't have to probe them again either.
+    """
+
+    SIDECAR_SUFFIX = ".probe.json"
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, ProbeResult] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def probe(self, path: str, sidecar: bool = False) -> ProbeResult:
+        """
+        Get the probe of a media file, running ffprobe only if it has not been probed before.
+
+        Args:
+            path (str): The path to the media file.
+            sidecar (bool): Whether to read/write an on-disk sidecar for the probe.
+
+        Returns:
+            ProbeResult: The parsed probe of the file.
+        """
+        stat = os.stat(path)
+        result = self._get(path, stat)
+        if result is not None:
+            return result
+
+        raw = self._read_sidecar(path, stat) if sidecar else None
+        if raw is None:
+            log.debug("Probing %s", path)
+            raw = ffmpeg.probe(path)
+            if sidecar:
+                self._write_sidecar(path, stat, raw)
+
+        return self._put(path, stat, raw)
+
+    async def probe_async(self, path: str, sidecar: bool = False) -> ProbeResult:
+        """Like probe, but runs ffprobe without blocking the event loop, see run_ffprobe."""
+        stat = os.stat(path)
+        result = self._get(path, stat)
+        if result is not None:
+            return result
+
+        raw = self._read_sidecar(path, stat) if sidecar else None
+        if raw is None:
+            log.debug("Probing %s", path)
+            raw = await run_ffprobe(path, f"Error probing {path}")
+            if sidecar:
+                self._write_sidecar(path, stat, raw)
+
+        return self._put(path, stat, raw)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _key(self, path: str, stat: os.stat_result) -> tuple:
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def _get(self, path: str, stat: os.stat_result) -> ProbeResult | None:
+        key = self._key(path, stat)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def _put(self, path: str, stat: os.stat_result, raw: dict) -> ProbeResult:
+        key = self._key(path, stat)
+        result = ProbeResult(path, raw)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def _read_sidecar(self, path: str, stat: os.stat_result) -> dict | None:
+        try:
+            with open(path + self.SIDECAR_SUFFIX, "r") as f:
+                sidecar = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (
+            sidecar.get("size") != stat.st_size
+            or sidecar.get("mtime_ns") != stat.st_mtime_ns
+        ):
+            log.debug("Ignoring stale probe sidecar for %s", path)
+            return None
+        return sidecar["probe"]
+
+    def _write_sidecar(self, path: str, stat: os.stat_result, raw: dict):
+        sidecar = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "probe": raw}
+        try:
+            with open(path + self.SIDECAR_SUFFIX, "w") as f:
+                json.dump(sidecar, f)
+        except OSError as e:
+            log.warning(f"Unable to write probe sidecar for {path}: {e}")
+
+
+probe_cache = ProbeCache(int(os.getenv("PROBE_CACHE_SIZE", "256")))
+
+
+def probe_media(path: str, sidecar: bool = False) -> ProbeResult:
+    """Returns the (cached) probe of a media file. See ProbeCache.probe."""
+    return probe_cache.probe(path, sidecar)
+
+
+async def probe_media_async(path: str, sidecar: bool = False) -> ProbeResult:
+    """Returns the (cached) probe of a media file. See ProbeCache.probe_async."""
+    return await probe_cache.probe_async(path, sidecar)
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+
+from app.utils.logger import log
+
+# Space kept free on the RAM disk, for other jobs and processes using it
+RAM_HEADROOM_BYTES = 64 * 1024**2
+
+
+def _default_ram_root() -> str | None:
+    """Returns the RAM backed directory of the host, if there is one we can write to."""
+    root = os.getenv("SCRATCH_DIR") or "/dev/shm"
+    if os.path.isdir(root) and os.access(root, os.W_OK):
+        return root
+    return None
+
+
+class ScratchDir:
+    """
+    Working directory for the intermediate files of a job.
+
+    Files are placed in a RAM backed directory (/dev/shm by default), as long as the job stays
+    under its size cap and the RAM disk has room, so stages hand files to each other without
+    touching the (shared) volume. Past the cap, files fall back to a local disk directory.
+    Both directories are removed when the scratch dir is closed, unless it is kept.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_ram_bytes: int | None = None,
+        ram_root: str | None = None,
+        disk_root: str | None = None,
+        keep: bool = False,
+    ):
+        """
+        Args:
+            name (str): The name of the job's directories, unique per job.
+            max_ram_bytes (int): The cap on the bytes the job keeps in RAM. Defaults to SCRATCH_MAX_BYTES.
+            ram_root (str): The RAM backed directory. Defaults to SCRATCH_DIR, or /dev/shm. None if there is none.
+            disk_root (str): The directory to fall back to. Defaults to SCRATCH_DISK_DIR, or the system temp dir.
+            keep (bool): Whether to keep the files when closing, for debugging.
+        """
+        if max_ram_bytes is None:
+            max_ram_bytes = int(os.getenv("SCRATCH_MAX_BYTES") or 512 * 1024**2)
+        if ram_root is None:
+            ram_root = _default_ram_root()
+        if disk_root is None:
+            disk_root = os.getenv("SCRATCH_DISK_DIR") or tempfile.gettempdir()
+
+        self.max_ram_bytes = max_ram_bytes
+        self.ram_dir = os.path.join(ram_root, name) if ram_root else None
+        self.disk_dir = os.path.join(disk_root, name)
+        self.keep = keep
+
+    @classmethod
+    def in_dir(cls, directory: str):
+        """A scratch dir keeping every file in the given directory (ie the output dir)."""
+        scratch = cls(os.path.basename(os.path.normpath(directory)), keep=True)
+        scratch.ram_dir = None
+        scratch.disk_dir = directory
+        return scratch
+
+    def ram_usage(self) -> int:
+        """Returns the bytes currently held in RAM by the job."""
+        if not self.ram_dir or not os.path.isdir(self.ram_dir):
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(self.ram_dir))
+
+    def path(self, file_name: str, expected_bytes: int = 0) -> str:
+        """
+        Returns the path to write an intermediate file to.
+
+        Args:
+            file_name (str): The name of the file.
+            expected_bytes (int): The (estimated) size of the file, used to decide whether it fits in RAM.
+
+        Returns:
+            str: The path of the file, in RAM if it fits, on disk otherwise.
+        """
+        if self.ram_dir and self._fits_in_ram(expected_bytes):
+            os.makedirs(self.ram_dir, exist_ok=True)
+            return os.path.join(self.ram_dir, file_name)
+
+        if self.ram_dir:
+            log.info(
+                f"Scratch file {file_name} ({expected_bytes} bytes) doesn't fit in RAM, using disk"
+            )
+        os.makedirs(self.disk_dir, exist_ok=True)
+        return os.path.join(self.disk_dir, file_name)
+
+    def _fits_in_ram(self, expected_bytes: int) -> bool:
+        if self.ram_usage() + expected_bytes > self.max_ram_bytes:
+            return False
+        free = shutil.disk_usage(os.path.dirname(self.ram_dir)).free
+        return expected_bytes + RAM_HEADROOM_BYTES <= free
+
+    def close(self):
+        """Removes the intermediate files, unless they are kept."""
+        if self.keep:
+            return
+        for directory in (self.ram_dir, self.disk_dir):
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
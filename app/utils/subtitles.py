@@ -0,0 +1,129 @@
+import os
+
+from app.utils.logger import log
+
+# Bundled fonts, passed to libass so the subtitle font is found even if not installed
+FONTS_DIR = "assets"
+
+# Additional latency added to the subtitles, on top of the offset (in seconds)
+SUBTITLE_LATENCY = 0.1
+
+# Matches the resolution libass renders SRT subtitles at, so font sizes are unchanged from our SRTs
+PLAY_RES_X = 384
+PLAY_RES_Y = 288
+
+ASS_HEADER = f"""[Script Info]
+ScriptType: v4.00+
+PlayResX: {PLAY_RES_X}
+PlayResY: {PLAY_RES_Y}
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Mont,18,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,1,1.5,0,5,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def format_ass_time(seconds: float) -> str:
+    """Formats seconds as an ASS timestamp (H:MM:SS.cc)."""
+    centiseconds = max(0, round(seconds * 100))
+    return f"{centiseconds // 360000}:{(centiseconds % 360000) // 6000:02}:{(centiseconds % 6000) // 100:02}.{centiseconds % 100:02}"
+
+
+def parse_ass_time(timestamp: str) -> float:
+    """Parses an ASS timestamp (H:MM:SS.cc) into seconds."""
+    hours, minutes, seconds = timestamp.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def escape_ass_text(text: str) -> str:
+    """Escapes text so libass doesn't interpret it as override tags or line breaks."""
+    return text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}")
+
+
+def write_ass(groups: list, output_path: str, offset: float = 0):
+    """
+    Write a styled ASS subtitle file from grouped word timings.
+
+    The offset (ie the duration of the title) and the subtitle latency are applied to the timings
+    here, so no separate pass is needed to delay the subtitles.
+
+    Args:
+        groups (list): (start, end, text) tuples of the subtitles, in seconds. See GentleAligner.group_words.
+        output_path (str): The path to save the ASS file.
+        offset (float): The number of seconds to delay the subtitles by.
+
+    Returns:
+        None
+    """
+    log.info(f"Writing ass subtitles, delayed by {offset} seconds.")
+    log.debug("Output path: %s", output_path)
+
+    delay = offset + SUBTITLE_LATENCY
+
+    events = [
+        f"Dialogue: 0,{format_ass_time(start + delay)},{format_ass_time(end + delay)},Default,,0,0,0,,{escape_ass_text(text)}"
+        for start, end, text in groups
+    ]
+
+    try:
+        with open(output_path, "w") as f:
+            f.write(ASS_HEADER)
+            f.write("\n".join(events) + "\n")
+    except Exception as e:
+        log.error(f"Error writing ASS file: {e}")
+        raise e
+
+
+def slice_ass(ass_path: str, start: float, end: float, output_path: str) -> int:
+    """
+    Write the part of an ASS subtitle file between start and end, shifted to start at 0.
+
+    Events overlapping the window are clipped to it, so a segment of the video rendered on its own
+    (see render_segmented) shows exactly the subtitles it would show in the full render.
+
+    Args:
+        ass_path (str): The path to the ASS file, as written by write_ass.
+        start (float): The start of the window in seconds.
+        end (float): The end of the window in seconds.
+        output_path (str): The path to save the sliced ASS file.
+
+    Returns:
+        int: The number of events in the slice.
+    """
+    log.debug(f"Slicing ass subtitles {ass_path} from {start} to {end}")
+
+    header = []
+    events = []
+    with open(ass_path, "r") as f:
+        for line in f.read().splitlines():
+            if not line.startswith("Dialogue:"):
+                if not events:
+                    header.append(line)
+                continue
+
+            # Dialogue: Layer, Start, End, ... - the text is the last field, and may contain commas
+            fields = line[len("Dialogue:") :].split(",", 9)
+            event_start = parse_ass_time(fields[1])
+            event_end = parse_ass_time(fields[2])
+            if event_end <= start or event_start >= end:
+                continue
+
+            fields[1] = format_ass_time(max(event_start, start) - start)
+            fields[2] = format_ass_time(min(event_end, end) - start)
+            events.append("Dialogue:" + ",".join(fields))
+
+    with open(output_path, "w") as f:
+        f.write("\n".join(header).rstrip("\n") + "\n")
+        f.write("".join(event + "\n" for event in events))
+
+    return len(events)
+
+
+def get_fonts_dir() -> str:
+    """Returns the absolute path of our bundled fonts, for the ffmpeg ass filter."""
+    return os.path.abspath(FONTS_DIR)
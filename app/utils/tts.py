@@ -1,18 +1,69 @@
+import os
+
 from abc import ABC, abstractmethod
 
+from app.utils.disk_cache import DiskCache, make_cache_key
+from app.utils.logger import log
+
+# Shared by every TTS provider, keyed on the provider, model, voice and text
+tts_cache = DiskCache(
+    os.getenv("TTS_CACHE_DIR") or os.path.join("tmp", "tts_cache"),
+    int(os.getenv("TTS_CACHE_MAX_BYTES") or 256 * 1024**2),
+    suffix=".mp3",
+)
+
 
 class TTS(ABC):
-    @abstractmethod
+    # The name and model of the provider, part of the cache key of the generated audio
+    provider: str
+    model: str
+
     def generate_mp3(self, text: str, gender: str, output_path: str):
         """
         Generates an MP3 file from the given text using the specified gender voice.
 
+        The audio is cached on disk (see tts_cache), so the same text, voice and model is only
+        synthesized once, even across retries and resubmissions of a post.
+
         Args:
             text (str): The text to convert to speech.
             gender (str): The gender of the voice to use for the speech generation.
             output_path (str): The path to save the generated MP3 file.
 
+        Returns:
+            None
+        """
+        voice_id = self.get_voice_id(gender)
+        key = make_cache_key(self.provider, self.model, voice_id, text)
+
+        if tts_cache.get(key, output_path):
+            log.info(f"Using cached {self.provider} audio {key[:12]}")
+            return
+
+        self.synthesize(text, voice_id, output_path)
+        tts_cache.put(key, output_path)
+
+    @abstractmethod
+    def get_voice_id(self, gender: str) -> str:
+        """Returns the voice of the provider for the given gender."""
+        pass
+
+    @abstractmethod
+    def synthesize(self, text: str, voice_id: str, output_path: str):
+        """
+        Generates an MP3 file from the given text with the provider, without caching.
+
+        Args:
+            text (str): The text to convert to speech.
+            voice_id (str): The voice of the provider to use, see get_voice_id.
+            output_path (str): The path to save the generated MP3 file.
+
         Returns:
             None
         """
         pass
+
+
+def get_tts_cache_stats() -> dict:
+    """Returns the hit/miss counters and size of the TTS cache. See DiskCache.stats."""
+    return tts_cache.stats()
@@ -1,17 +1,38 @@
 import os
 import asyncio
+import json
 from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import FastAPI, Request, Form, Depends, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, Form, Depends, BackgroundTasks, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from app.service.task import generate_video
 from app.service.database import init_db, get_db_session
+from app.service.job_events import (
+    job_state_event,
+    publish_job_event,
+    subscribe_job_events,
+)
 from app.utils.logger import log
-from app.repository.job_repository import add_job, get_jobs
+from app.utils.encode_scheduler import get_encode_allocation
+from app.utils.tts import get_tts_cache_stats
+from app.utils.gentle_aligner import get_alignment_cache_stats
+from app.utils.http_client import get_http_latency_stats
+from app.utils.file_response import file_response
+from app.repository.job_repository import (
+    add_job,
+    get_jobs_page,
+    get_job_post,
+    get_job_steps,
+    get_job_summary,
+    JOB_STATUSES,
+    JOBS_PAGE_SIZE,
+)
 
 import app.config
+from app.config import ffmpeg_config
 
 
 @asynccontextmanager
@@ -27,22 +48,217 @@ templates = Jinja2Templates(directory="app/templates")
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 os.makedirs("tmp", exist_ok=True)
+# Kept for links to videos from before /media
 app.mount("/tmp", StaticFiles(directory="tmp"), name="tmp")
 
+# The files of a job served by /media, its final video and the renditions of the presets
+MEDIA_FILE_NAMES = {"final.mp4"} | {
+    settings["file_name"]
+    for settings in ffmpeg_config.values()
+    if "file_name" in settings
+}
+# A job's files are only replaced if it's rerun, which changes their ETag
+MEDIA_CACHE_CONTROL = "public, max-age=3600"
+
+
+def media_url(path: str | None) -> str | None:
+    """The /media URL of a file in the output dir of a job (tmp/<job_id>/<file_name>)"""
+    if not path:
+        return path
+    job_dir, file_name = os.path.split(path)
+    return f"/media/{os.path.basename(job_dir)}/{file_name}"
+
+
+templates.env.globals["media_url"] = media_url
+
 
 @app.get("/tools/json_generator")
 async def json_generator(request: Request):
     return templates.TemplateResponse("json_generator.html", {"request": request})
 
 
+async def _jobs_page(
+    db: AsyncSession,
+    status: str | None,
+    cursor: str | None,
+    limit: int = JOBS_PAGE_SIZE,
+) -> tuple:
+    """Loads a page of jobs for the job list, rejecting invalid query parameters."""
+    if status and status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status {status}")
+    if not 1 <= limit <= 100:
+        raise HTTPException(
+            status_code=400, detail="The limit must be between 1 and 100"
+        )
+
+    try:
+        return await get_jobs_page(db, limit, status, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {cursor}")
+
+
 @app.get("/")
-async def read_root(request: Request, db: AsyncSession = Depends(get_db_session)):
-    completed_jobs = await get_jobs(db)
+async def read_root(
+    request: Request,
+    status: str | None = None,
+    db: AsyncSession = Depends(get_db_session),
+):
+    jobs, next_cursor = await _jobs_page(db, status, None)
+    return templates.TemplateResponse(
+        "index.html",
+        {
+            "request": request,
+            "jobs": jobs,
+            "next_cursor": next_cursor,
+            "status": status,
+            "statuses": JOB_STATUSES,
+        },
+    )
+
+
+@app.get("/jobs")
+async def job_cards(
+    request: Request,
+    status: str | None = None,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db_session),
+):
+    """The cards of the next page of the job list, appended by 'Load more'"""
+    jobs, next_cursor = await _jobs_page(db, status, cursor)
     return templates.TemplateResponse(
-        "index.html", {"request": request, "jobs": completed_jobs}
+        "job_cards.html",
+        {"request": request, "jobs": jobs},
+        headers={"X-Next-Cursor": next_cursor or ""},
     )
 
 
+@app.get("/jobs/{job_id}")
+async def job_card(
+    request: Request, job_id: int, db: AsyncSession = Depends(get_db_session)
+):
+    """
+    The card of a job, added to the job list when a new job is published on /events
+    """
+    job = await get_job_summary(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return templates.TemplateResponse(
+        "job_cards.html", {"request": request, "jobs": [job]}
+    )
+
+
+@app.get("/events")
+async def job_events(request: Request):
+    """
+    The state and render progress of the jobs, pushed as the workers publish them
+    (Server-Sent Events), so the job list is updated in place rather than reloaded
+    """
+
+    async def stream():
+        # How long the browser waits to reconnect, ie if Redis restarts
+        yield "retry: 5000\n\n"
+        # StreamingResponse watches for the disconnect of the client in a task, and
+        # cancels the stream (so the subscription) as soon as the page is closed
+        async for event in subscribe_job_events():
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: job\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # Not buffered by a proxy in front of the app
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.api_route("/media/{job_id}/{file_name}", methods=["GET", "HEAD"])
+async def job_media(
+    request: Request, job_id: int, file_name: str, download: bool = False
+):
+    """
+    A video (or rendition) of a job, with byte range requests (for seeking and resumed
+    downloads), ETags and Cache-Control. Pass download=true to download it rather than
+    play it
+    """
+    if file_name not in MEDIA_FILE_NAMES:
+        raise HTTPException(status_code=404, detail=f"File {file_name} not found")
+    try:
+        return file_response(
+            request,
+            os.path.join("tmp", str(job_id), file_name),
+            MEDIA_CACHE_CONTROL,
+            download_name=f"{job_id}-{file_name}" if download else None,
+        )
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404, detail=f"File {file_name} of job {job_id} not found"
+        )
+
+
+@app.get("/api/jobs")
+async def list_jobs(
+    status: str | None = None,
+    cursor: str | None = None,
+    limit: int = JOBS_PAGE_SIZE,
+    db: AsyncSession = Depends(get_db_session),
+):
+    """
+    A page of jobs, newest first. Pass the returned next_cursor to get the next page
+    """
+    jobs, next_cursor = await _jobs_page(db, status, cursor, limit)
+    return JSONResponse(
+        content={
+            "jobs": jsonable_encoder([job._asdict() for job in jobs]),
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+@app.get("/api/jobs/{job_id}/post")
+async def job_post(job_id: int, db: AsyncSession = Depends(get_db_session)):
+    """The whole post of a job, loaded when its tooltip is opened"""
+    post = await get_job_post(db, job_id)
+    if post is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JSONResponse(content={"reddit_post": post})
+
+
+@app.get("/api/jobs/{job_id}/steps")
+async def job_steps(job_id: int, db: AsyncSession = Depends(get_db_session)):
+    """
+    The steps the job went through, with when it entered and left each (and how long
+    it took)
+    """
+    steps = await get_job_steps(db, job_id)
+    return JSONResponse(content={"steps": jsonable_encoder(steps)})
+
+
+@app.get("/api/encode_allocation")
+def encode_allocation():
+    """The encodes currently running on this host, and their thread budgets"""
+    return JSONResponse(content=get_encode_allocation())
+
+
+@app.get("/api/tts_cache")
+def tts_cache():
+    """The hit/miss counters and size of the TTS audio cache"""
+    return JSONResponse(content=get_tts_cache_stats())
+
+
+@app.get("/api/alignment_cache")
+def alignment_cache():
+    """The hit/miss counters and size of the Gentle alignment cache"""
+    return JSONResponse(content=get_alignment_cache_stats())
+
+
+@app.get("/api/http_latency")
+def http_latency():
+    """The latency histograms of the requests to each provider endpoint"""
+    return JSONResponse(content=get_http_latency_stats())
+
+
 def run_async(func, *args, **kwargs):
     """Helper function to run a function asynchronously"""
     asyncio.create_task(func(*args, **kwargs))
@@ -69,6 +285,8 @@ async def post_root(
     try:
         job = await add_job(db, post_title, post_content, background_video)
         log.info(f"Job created with ID: {job.id}")
+        # Adds the job to the open job lists
+        await asyncio.to_thread(publish_job_event, job_state_event(job))
 
         output_dir = os.path.join("tmp", str(job.id))
         os.makedirs(output_dir, exist_ok=True)
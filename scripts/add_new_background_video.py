@@ -4,7 +4,9 @@ It will crop and compress the video to a suitable size for Tiktok.
 """
 
 from app.utils.ffmpeg import resize_video, compress_video, FFMpegProcessingError
+from app.utils.background_video import index_background_video
 
+import asyncio
 import sys
 import os
 
@@ -24,7 +26,9 @@ if sys.argv[1].endswith(".mp4"):
     os.makedirs(output_dir, exist_ok=True)
     try:
         print("This may take a few minutes depending on the resolution and length of the original video...")
-        resize_video(sys.argv[1], formatted_file)
+        asyncio.run(resize_video(sys.argv[1], formatted_file))
+        print("Indexing video into a clip pool...")
+        asyncio.run(index_background_video(formatted_file))
     except FFMpegProcessingError as e:
         print(f"Error: {e.stderr}")
         sys.exit(1)
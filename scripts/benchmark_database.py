@@ -0,0 +1,143 @@
+"""
+Benchmarks concurrent update_job_step writers on a SQLite database, with the default settings of SQLite
+and with the pragmas of SQLITE_PRAGMAS (WAL, synchronous=NORMAL, busy_timeout and mmap_size).
+Each writer is its own process with its own engine, like the web app and the Celery workers sharing video_jobs.db,
+and steps its own jobs through the job steps. The throughput, the latency of the updates, and the updates
+that failed with 'database is locked' are reported for each profile.
+
+Usage: python -m scripts.benchmark_database <writers> <updates_per_writer>
+"""
+
+import asyncio
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+from time import time
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.model.models import Base
+from app.repository.job_repository import add_job, update_job_step
+from app.service.database import SQLITE_PRAGMAS, create_engine
+
+STEPS = [
+    "generating_audio",
+    "generating_srt",
+    "generating_title_image",
+    "generating_background_video",
+    "generating_preview",
+    "generating_final_video",
+]
+JOBS_PER_WRITER = 3
+
+
+async def setup_database(url: str, sqlite_pragmas: dict | None, writers: int) -> list:
+    """Create the jobs table and the jobs of each writer, returns the job IDs of each writer."""
+    engine = create_engine(url, role="worker", sqlite_pragmas=sqlite_pragmas)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    job_ids = []
+    async with session_maker() as session:
+        for _ in range(writers):
+            jobs = [
+                await add_job(session, "AITA benchmark", "content", "background.mp4")
+                for _ in range(JOBS_PER_WRITER)
+            ]
+            job_ids.append([job.id for job in jobs])
+
+    await engine.dispose()
+    return job_ids
+
+
+async def write(
+    url: str, sqlite_pragmas: dict | None, job_ids: list, updates: int
+) -> tuple:
+    """Update the steps of the jobs, returns when the writer started and ended, the latency of each update and the number that were locked out."""
+    engine = create_engine(url, role="worker", sqlite_pragmas=sqlite_pragmas)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    latencies = []
+    locked = 0
+    writer_start = time()
+    for i in range(updates):
+        start_time = time()
+        try:
+            async with session_maker() as session:
+                await update_job_step(
+                    session, job_ids[i % len(job_ids)], STEPS[i % len(STEPS)]
+                )
+            latencies.append(time() - start_time)
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked += 1
+
+    writer_end = time()
+
+    await engine.dispose()
+    return writer_start, writer_end, latencies, locked
+
+
+def run_writer(args: tuple) -> tuple:
+    return asyncio.run(write(*args))
+
+
+def benchmark(name: str, sqlite_pragmas: dict | None, writers: int, updates: int):
+    # On the disk of the app (as video_jobs.db), rather than /tmp, which may be in memory
+    os.makedirs("tmp", exist_ok=True)
+    db_dir = tempfile.mkdtemp(dir="tmp")
+    url = f"sqlite+aiosqlite:///{os.path.join(db_dir, 'benchmark.db')}"
+    try:
+        job_ids = asyncio.run(setup_database(url, sqlite_pragmas, writers))
+
+        with multiprocessing.get_context("spawn").Pool(writers) as pool:
+            results = pool.map(
+                run_writer, [(url, sqlite_pragmas, ids, updates) for ids in job_ids]
+            )
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    # Timed from the first writer starting to the last finishing, excluding the start of the processes
+    elapsed = max(end for _, end, _, _ in results) - min(
+        start for start, _, _, _ in results
+    )
+    latencies = sorted(latency for _, _, writer, _ in results for latency in writer)
+    locked = sum(locked for _, _, _, locked in results)
+
+    print(f"{name}:")
+    print(
+        f"  {len(latencies)} updates in {elapsed:.2f}s ({len(latencies) / elapsed:.0f} updates/s)"
+    )
+    if latencies:
+        print(
+            f"  latency p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms, "
+            f"max {latencies[-1] * 1000:.1f}ms"
+        )
+    print(f"  {locked} updates failed with 'database is locked'")
+
+
+def main(writers: int, updates: int):
+    print(f"{writers} writers, {updates} updates each")
+    benchmark("SQLite defaults", None, writers, updates)
+    benchmark(
+        f"Tuned ({', '.join(f'{k}={v}' for k, v in SQLITE_PRAGMAS.items())})",
+        SQLITE_PRAGMAS,
+        writers,
+        updates,
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(
+            "Usage: python -m scripts.benchmark_database <writers> <updates_per_writer>"
+        )
+        sys.exit(1)
+
+    main(int(sys.argv[1]), int(sys.argv[2]))
@@ -0,0 +1,253 @@
+"""
+Benchmarks the different render modes of the final video against each other, using the test fixtures.
+Each mode renders the same background, title image, audio and subtitles, so the timings are comparable.
+The loop modes of loop_video_to_audio are benchmarked separately, looping the background to a 3 minute story.
+The title overlay is benchmarked (in frames per second) with the full title image and with the cropped title card.
+The multi output render writes the final video, a preview, a poster and an animated WebP from one graph, to compare with single_pass.
+The segmented render is benchmarked on a 3 minute story for each segment count, reporting its speed-up over a single segment.
+
+Usage: python -m scripts.benchmark_render <config_preset> <runs>
+"""
+
+import asyncio
+import os
+import sys
+from fractions import Fraction
+from time import time
+
+from PIL import Image
+
+from app.utils.ffmpeg import (
+    get_audio_duration,
+    loop_video_to_audio,
+    get_video_dimensions,
+    get_video_duration,
+    get_title_image_width,
+    resize_image,
+    overlay_image_on_video,
+    embed_srt_and_audio,
+    render_single_pass,
+    render_outputs,
+    render_segmented,
+    OutputSpec,
+)
+from app.utils.gentle_aligner import GentleAligner
+from app.utils.image_generator import generate_title_image, render_title_card
+from app.utils.probe import probe_media
+from app.utils.subtitles import write_ass
+
+import app.config
+
+fixtures_dir = os.path.join("tests", "fixtures", "unit", "utils")
+background_video = os.path.join(fixtures_dir, "ffmpeg", "test_5_second_video.mp4")
+audio = os.path.join(fixtures_dir, "ffmpeg", "test_10_second_audio.mp3")
+aligned = os.path.join(fixtures_dir, "gentle_aligner", "test_aligned.txt")
+
+output_dir = os.path.join("tmp", "benchmark")
+title_duration = 2
+loop_duration = 180
+segment_counts = [1, 2, 4, 8]
+
+
+async def three_step(
+    srt_file: str, title_image: str, duration: float, config_preset: str
+):
+    looped_background_video = os.path.join(output_dir, "looped_background.mp4")
+    await loop_video_to_audio(
+        duration, background_video, looped_background_video, config_preset
+    )
+
+    video_width = get_video_dimensions(looped_background_video)[0]
+    resized_title_image = os.path.join(output_dir, "resized_title_image.png")
+    await resize_image(title_image, video_width, resized_title_image)
+
+    overlayed_video = os.path.join(output_dir, "overlayed.mp4")
+    await overlay_image_on_video(
+        looped_background_video,
+        resized_title_image,
+        title_duration,
+        overlayed_video,
+        config_preset,
+    )
+
+    await embed_srt_and_audio(
+        overlayed_video,
+        audio,
+        srt_file,
+        os.path.join(output_dir, "three_step.mp4"),
+        config_preset,
+    )
+
+
+async def single_pass(
+    srt_file: str, title_image: str, duration: float, config_preset: str
+):
+    await render_single_pass(
+        background_video,
+        title_image,
+        title_duration,
+        audio,
+        srt_file,
+        duration,
+        os.path.join(output_dir, "single_pass.mp4"),
+        config_preset,
+    )
+
+
+async def outputs(srt_file: str, title_image: str, duration: float, config_preset: str):
+    await render_outputs(
+        background_video,
+        title_image,
+        title_duration,
+        audio,
+        srt_file,
+        duration,
+        [
+            OutputSpec(os.path.join(output_dir, "outputs.mp4"), config_preset),
+            OutputSpec(os.path.join(output_dir, "outputs_preview.mp4"), "preview"),
+            OutputSpec(os.path.join(output_dir, "outputs_poster.jpg"), "poster"),
+            OutputSpec(os.path.join(output_dir, "outputs.webp"), "animated_preview"),
+        ],
+        config_preset,
+    )
+
+
+async def segmented(srt_file: str, title_image: str, segments: int, config_preset: str):
+    # The audio is shorter than the story, which doesn't matter for the timing of the video encode
+    await render_segmented(
+        background_video,
+        title_image,
+        title_duration,
+        audio,
+        srt_file,
+        loop_duration,
+        os.path.join(output_dir, f"segmented_{segments}.mp4"),
+        config_preset,
+        segments=segments,
+    )
+
+
+async def loop(loop_mode: str, config_preset: str):
+    # Run the same preset with the loop mode under test
+    preset = f"benchmark_loop_{loop_mode}"
+    app.config.ffmpeg_config[preset] = {
+        **app.config.ffmpeg_config[config_preset],
+        "loop_mode": loop_mode,
+    }
+
+    await loop_video_to_audio(
+        loop_duration,
+        background_video,
+        os.path.join(output_dir, f"loop_{loop_mode}.mp4"),
+        preset,
+    )
+
+
+async def overlay(cropped: bool, config_preset: str):
+    # The title is shown for the whole background, so this only measures the title segment
+    video_width, _ = get_video_dimensions(background_video)
+    title_card = render_title_card(
+        "AITA for benchmarking my title overlay?", get_title_image_width(video_width)
+    )
+
+    if cropped:
+        image = title_card.image
+        x = f"(W-{title_card.full_width})/2+{title_card.left}"
+        y = f"(H-{title_card.full_height})/2+{title_card.top}"
+    else:
+        image = Image.new("RGBA", (title_card.full_width, title_card.full_height))
+        image.paste(title_card.image, (title_card.left, title_card.top))
+        x, y = "(W-w)/2", "(H-h)/2"
+
+    image_file = os.path.join(output_dir, f"overlay_{cropped}.png")
+    image.save(image_file)
+
+    await overlay_image_on_video(
+        background_video,
+        image_file,
+        get_video_duration(background_video),
+        os.path.join(output_dir, f"overlay_{cropped}.mp4"),
+        config_preset,
+        x,
+        y,
+    )
+
+
+def print_results(results: dict, frames: dict):
+    print(f"+{'-'*48}+")
+    for name, timings in results.items():
+        average = sum(timings) / len(timings)
+        print(f"| {name:15} | {average:8.2f} seconds (avg of {len(timings)}) |")
+        if name in frames:
+            print(f"| {'':15} | {frames[name] / average:8.2f} frames per second  |")
+    print(f"+{'-'*48}+")
+
+    # Speed-up of the segmented render over a single segment (ie a single encode)
+    averages = {name: sum(timings) / len(timings) for name, timings in results.items()}
+    for segments in segment_counts:
+        name = f"segmented_{segments}"
+        speed_up = averages["segmented_1"] / averages[name]
+        print(f"| {name:15} | {speed_up:8.2f}x speed-up vs 1 seg |")
+    print(f"+{'-'*48}+")
+
+
+async def main(config_preset: str, runs: int):
+    os.makedirs(output_dir, exist_ok=True)
+
+    srt_file = os.path.join(output_dir, "content.ass")
+    with open(aligned, "r") as f:
+        write_ass(GentleAligner().group_words(f.read()), srt_file, title_duration)
+
+    title_image = os.path.join(output_dir, "title_image.png")
+    generate_title_image(title_image, "AITA for benchmarking my render pipeline?")
+
+    duration = get_audio_duration(audio)
+
+    modes = {
+        "three_step": lambda: three_step(
+            srt_file, title_image, duration, config_preset
+        ),
+        "single_pass": lambda: single_pass(
+            srt_file, title_image, duration, config_preset
+        ),
+        "multi_output": lambda: outputs(srt_file, title_image, duration, config_preset),
+        "loop_reencode": lambda: loop("reencode", config_preset),
+        "loop_copy": lambda: loop("copy", config_preset),
+        "overlay_full": lambda: overlay(False, config_preset),
+        "overlay_cropped": lambda: overlay(True, config_preset),
+        **{
+            f"segmented_{segments}": lambda segments=segments: segmented(
+                srt_file, title_image, segments, config_preset
+            )
+            for segments in segment_counts
+        },
+    }
+
+    video_stream = probe_media(background_video).video_stream
+    background_frames = float(
+        Fraction(video_stream["r_frame_rate"]) * Fraction(video_stream["duration"])
+    )
+    frames = {"overlay_full": background_frames, "overlay_cropped": background_frames}
+
+    results = {name: [] for name in modes}
+    for _ in range(runs):
+        for name, run in modes.items():
+            start_time = time()
+            await run()
+            results[name].append(time() - start_time)
+
+    print_results(results, frames)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Incorrect number of arguments")
+        print("Usage: python -m scripts.benchmark_render <config_preset> <runs>")
+        sys.exit(1)
+
+    config_preset = sys.argv[1]
+    if config_preset not in app.config.ffmpeg_config:
+        print(f"Invalid config preset: {config_preset}")
+        sys.exit(1)
+
+    asyncio.run(main(config_preset, int(sys.argv[2])))
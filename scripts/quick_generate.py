@@ -1,10 +1,7 @@
 from app.utils.logger import log
+from app.utils.audio import AudioBuffer
 from app.utils.ffmpeg import (
-    get_audio_duration,
-    buffer_audio,
     loop_video_to_audio,
-    concatenate_audios,
-    delay_srt,
     embed_srt_and_audio,
     overlay_image_on_video,
     get_video_dimensions,
@@ -14,6 +11,8 @@ from app.utils.ffmpeg import (
 from app.utils.background_video import get_random_chunk_from_video
 from app.utils.gentle_aligner import GentleAligner
 from app.utils.image_generator import generate_title_image
+from app.utils.subtitles import write_ass
+import asyncio
 import os
 import app.config
 
@@ -35,60 +34,74 @@ base_background_video = os.path.join("assets", "minecraft_background_video_1.mp4
 
 test_dir = os.path.join("tests", "fixtures", "integration", "service", "generate")
 
-try:
-    # Mocking the generation of audio files
-    pre_content_audio = os.path.join(test_dir, "pre_content.mp3")
-    pre_title_audio = os.path.join(test_dir, "pre_title.mp3")
 
-    # The rest should 'just work'
-    content_audio = os.path.join(output_dir, "content.mp3")
-    buffer_audio(pre_content_audio, "END", 1, content_audio)
-
-    pre_title_audio_duration = get_audio_duration(pre_title_audio)
-    title_audio = os.path.join(output_dir, "title.mp3")
-    buffer_audio(pre_title_audio, "END", 1, title_audio)
-    title_audio_duration = get_audio_duration(title_audio)
-
-    gentle_aligner = GentleAligner()
-    aligned_text = gentle_aligner.generate_aligned(content, content_audio)
-
-    srt_file = os.path.join(output_dir, "content.srt")
-    gentle_aligner.generate_srt(aligned_text, srt_file)
-
-    title_image = os.path.join(output_dir, "title_image.png")
-    generate_title_image(title_image, title)
-
-    video_audio = os.path.join(output_dir, "video.mp3")
-    concatenate_audios(title_audio, content_audio, video_audio)
-    total_video_audio_length = get_audio_duration(video_audio)
-
-    background_video = os.path.join(output_dir, "background.mp4")
-    get_random_chunk_from_video(base_background_video, 60, background_video)
-
-    looped_background_video = os.path.join(output_dir, "looped_background.mp4")
-    loop_video_to_audio(
-        total_video_audio_length, background_video, looped_background_video
-    )
-    video_width = get_video_dimensions(looped_background_video)[0]
-
-    resized_title_image = os.path.join(output_dir, "resized_title_image.png")
-    resize_image(title_image, video_width, resized_title_image)
-
-    overlayed_video = os.path.join(output_dir, "overlayed.mp4")
-    overlay_image_on_video(
-        looped_background_video,
-        resized_title_image,
-        pre_title_audio_duration,
-        overlayed_video,
-    )
-
-    delayed_srt_file = os.path.join(output_dir, "delayed_content.srt")
-    delay_srt(srt_file, title_audio_duration, delayed_srt_file)
-
-    final_video = os.path.join(output_dir, "final.mp4")
-    embed_srt_and_audio(overlayed_video, video_audio, delayed_srt_file, final_video)
-
-    log.info(f"Final video generated at {final_video}")
-
-except FFMpegProcessingError as e:
-    log.error(f"FFMpegProcessingError: {e}")
+async def main():
+    try:
+        # Mocking the generation of audio files
+        pre_content_audio = os.path.join(test_dir, "pre_content.mp3")
+        pre_title_audio = os.path.join(test_dir, "pre_title.mp3")
+
+        # The rest should 'just work'
+        content_audio_buffer = (await AudioBuffer.from_file(pre_content_audio)).pad(
+            "END", 1
+        )
+        content_audio = os.path.join(output_dir, "content.wav")
+        content_audio_buffer.write_wav(content_audio)
+
+        pre_title_audio_buffer = await AudioBuffer.from_file(pre_title_audio)
+        pre_title_audio_duration = pre_title_audio_buffer.duration
+        title_audio_buffer = pre_title_audio_buffer.pad("END", 1)
+        title_audio_duration = title_audio_buffer.duration
+
+        gentle_aligner = GentleAligner()
+        aligned_text = gentle_aligner.generate_aligned(content, content_audio)
+
+        subtitles_file = os.path.join(output_dir, "content.ass")
+        write_ass(
+            gentle_aligner.group_words(aligned_text),
+            subtitles_file,
+            title_audio_duration,
+        )
+
+        title_image = os.path.join(output_dir, "title_image.png")
+        generate_title_image(title_image, title)
+
+        video_audio_buffer = AudioBuffer.concatenate(
+            title_audio_buffer, content_audio_buffer
+        )
+        video_audio = os.path.join(output_dir, "video.wav")
+        video_audio_buffer.write_wav(video_audio)
+        total_video_audio_length = video_audio_buffer.duration
+
+        background_video = os.path.join(output_dir, "background.mp4")
+        await get_random_chunk_from_video(base_background_video, 60, background_video)
+
+        looped_background_video = os.path.join(output_dir, "looped_background.mp4")
+        await loop_video_to_audio(
+            total_video_audio_length, background_video, looped_background_video
+        )
+        video_width = get_video_dimensions(looped_background_video)[0]
+
+        resized_title_image = os.path.join(output_dir, "resized_title_image.png")
+        await resize_image(title_image, video_width, resized_title_image)
+
+        overlayed_video = os.path.join(output_dir, "overlayed.mp4")
+        await overlay_image_on_video(
+            looped_background_video,
+            resized_title_image,
+            pre_title_audio_duration,
+            overlayed_video,
+        )
+
+        final_video = os.path.join(output_dir, "final.mp4")
+        await embed_srt_and_audio(
+            overlayed_video, video_audio, subtitles_file, final_video
+        )
+
+        log.info(f"Final video generated at {final_video}")
+
+    except FFMpegProcessingError as e:
+        log.error(f"FFMpegProcessingError: {e}")
+
+
+asyncio.run(main())
@@ -1,15 +1,29 @@
 import unittest
 import os
+import shutil
 from unittest.mock import patch, AsyncMock
 import app.service.generate as generate
 import asyncio
 
 
 class TestVideoGeneration(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Start from scratch, rather than resuming from the manifest of the previous run
+        manifest_path = os.path.join(
+            "tests",
+            "fixtures",
+            "integration",
+            "service",
+            "generate",
+            generate.MANIFEST_FILE,
+        )
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
     @patch("app.service.generate.OpenAITTS")
-    @patch("app.service.generate.determine_gender_from_text")
-    @patch("app.service.generate.update_job_step", new_callable=AsyncMock)
-    @patch("app.service.generate.fail_job", new_callable=AsyncMock)
+    @patch("app.utils.openai.determine_gender_from_text", new_callable=AsyncMock)
+    @patch("app.service.job_writer.update_job_step", new_callable=AsyncMock)
+    @patch("app.service.job_writer.fail_job", new_callable=AsyncMock)
     async def test_generate_video_from_content(
         self,
         mock_fail_job,
@@ -24,8 +38,24 @@ class TestVideoGeneration(unittest.IsolatedAsyncioTestCase):
         mock_fail_job.return_value.set_result(None)
 
         mock_determine_gender.return_value = "m"
+        output_dir = os.path.join(
+            "tests",
+            "fixtures",
+            "integration",
+            "service",
+            "generate",
+            # , id
+        )
+
+        # Intermediate files are written to a scratch dir, so 'generate' the audio from the fixtures
+        def generate_mp3(text, gender, output_path):
+            file_name = "pre_title.mp3" if "AITA" in text else "pre_content.mp3"
+            shutil.copy(os.path.join(output_dir, file_name), output_path)
+
         mock_elevenlabs_instance = mock_elevenlabs.return_value
-        mock_elevenlabs_instance.generate_mp3.return_value = None
+        mock_elevenlabs_instance.generate_mp3.side_effect = generate_mp3
+        mock_elevenlabs_instance.provider = "openai"
+        mock_elevenlabs_instance.model = "tts-1"
 
         mock_session = AsyncMock()
 
@@ -39,15 +69,6 @@ class TestVideoGeneration(unittest.IsolatedAsyncioTestCase):
 
         test_base_vid_path = os.path.join("assets", "minecraft_background_video_1.mp4")
 
-        output_dir = os.path.join(
-            "tests",
-            "fixtures",
-            "integration",
-            "service",
-            "generate",
-            # , id
-        )
-
         await generate.generate_video_from_content(
             test_id,
             test_title,
@@ -63,6 +84,91 @@ class TestVideoGeneration(unittest.IsolatedAsyncioTestCase):
         self.assertTrue(os.path.exists(expected_final_video_path))
         self.assertTrue(os.path.getsize(expected_final_video_path) > 0)
 
+    @patch("app.service.generate.OpenAITTS")
+    @patch("app.utils.openai.determine_gender_from_text", new_callable=AsyncMock)
+    @patch("app.service.job_writer.update_job_step", new_callable=AsyncMock)
+    @patch("app.service.job_writer.set_job_preview", new_callable=AsyncMock)
+    @patch("app.service.job_writer.fail_job", new_callable=AsyncMock)
+    async def test_generate_video_with_preview(
+        self,
+        mock_fail_job,
+        mock_set_job_preview,
+        mock_update_job_step,
+        mock_determine_gender,
+        mock_elevenlabs,
+    ):
+        mock_determine_gender.return_value = "m"
+        output_dir = os.path.join(
+            "tests", "fixtures", "integration", "service", "generate"
+        )
+
+        def generate_mp3(text, gender, output_path):
+            file_name = "pre_title.mp3" if "AITA" in text else "pre_content.mp3"
+            shutil.copy(os.path.join(output_dir, file_name), output_path)
+
+        mock_elevenlabs.return_value.generate_mp3.side_effect = generate_mp3
+        mock_elevenlabs.return_value.provider = "openai"
+        mock_elevenlabs.return_value.model = "tts-1"
+
+        mock_session = AsyncMock()
+        test_id = "tempid"
+        test_base_vid_path = os.path.join("assets", "minecraft_background_video_1.mp4")
+
+        # The default preset renders a preview first, and defers the final render
+        deferred = []
+        await generate.generate_video_from_content(
+            test_id,
+            "AITA Short and sweet",
+            "I'll keep it brief because it's so timely.",
+            test_base_vid_path,
+            output_dir,
+            mock_session,
+            "default",
+            defer_final_render=deferred.append,
+        )
+
+        expected_preview_video_path = os.path.join(output_dir, "preview.mp4")
+        self.assertTrue(os.path.exists(expected_preview_video_path))
+        mock_set_job_preview.assert_awaited_once_with(
+            mock_session, test_id, expected_preview_video_path
+        )
+        self.assertEqual(len(deferred), 1)
+
+        await generate.render_final_video_from_plan(deferred[0], mock_session)
+
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "final.mp4")))
+        self.assertFalse(os.path.exists(deferred[0]))
+
+    @patch("app.service.generate.analyse_content", new_callable=AsyncMock)
+    @patch("app.service.job_writer.update_job_step", new_callable=AsyncMock)
+    @patch("app.service.job_writer.fail_job", new_callable=AsyncMock)
+    async def test_generate_video_not_failed_if_retried(
+        self, mock_fail_job, mock_update_job_step, mock_analyse_content
+    ):
+        """Test that a job is only marked as failed once it won't be retried"""
+        mock_analyse_content.side_effect = ConnectionError("OpenAI unreachable")
+        output_dir = os.path.join("tmp", "test", "generate_retry")
+        os.makedirs(output_dir, exist_ok=True)
+        test_base_vid_path = os.path.join(
+            "tests", "fixtures", "unit", "utils", "ffmpeg", "test_5_second_video.mp4"
+        )
+
+        for will_retry in (True, False):
+            with self.assertRaises(ConnectionError):
+                await generate.generate_video_from_content(
+                    "tempid",
+                    "AITA Short and sweet",
+                    "I'll keep it brief because it's so timely.",
+                    test_base_vid_path,
+                    output_dir,
+                    AsyncMock(),
+                    "test",
+                    will_retry=lambda e: will_retry,
+                )
+            self.assertEqual(mock_fail_job.await_count, 0 if will_retry else 1)
+
+        shutil.rmtree(output_dir)
+
 
 if __name__ == "__main__":
     unittest.main()
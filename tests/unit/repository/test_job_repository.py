@@ -0,0 +1,119 @@
+import unittest
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.model.models import Base, Job
+from app.repository.job_repository import (
+    fail_job,
+    get_job_post,
+    get_job_steps,
+    get_jobs_page,
+    update_job_step,
+)
+
+
+class TestJobRepository(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            # Several jobs per second, so pages have to be split between jobs of the same created_at
+            created_at = datetime(2024, 4, 18, 20, 0, 0)
+            await conn.execute(
+                insert(Job),
+                [
+                    {
+                        "reddit_title": f"Title {i}",
+                        "reddit_post": "Post " * (i + 20),
+                        "background_video": "minecraft_parkour",
+                        "status": "failed" if i % 3 == 0 else "completed",
+                        "created_at": created_at + timedelta(seconds=i // 4),
+                    }
+                    for i in range(1, 26)
+                ],
+            )
+
+        self.session = async_sessionmaker(
+            self.engine, class_=AsyncSession, expire_on_commit=False
+        )()
+
+    async def test_get_jobs_page(self):
+        """Test that the jobs are listed newest first, in pages that don't overlap"""
+        ids = []
+        cursor = None
+        while True:
+            jobs, cursor = await get_jobs_page(self.session, limit=7, cursor=cursor)
+            self.assertLessEqual(len(jobs), 7)
+            ids.extend(job.id for job in jobs)
+            if cursor is None:
+                break
+
+        self.assertEqual(ids, list(range(25, 0, -1)))
+
+    async def test_get_jobs_page_by_status(self):
+        """Test that the jobs can be filtered by status"""
+        jobs, cursor = await get_jobs_page(self.session, limit=5, status="failed")
+        self.assertEqual([job.id for job in jobs], [24, 21, 18, 15, 12])
+
+        jobs, cursor = await get_jobs_page(
+            self.session, limit=5, status="failed", cursor=cursor
+        )
+        self.assertEqual([job.id for job in jobs], [9, 6, 3])
+        self.assertIsNone(cursor)
+
+    async def test_get_jobs_page_loads_the_start_of_the_post(self):
+        """Test that only the start of the post is loaded, the whole post is fetched on its own"""
+        jobs, _ = await get_jobs_page(self.session, limit=1)
+
+        self.assertEqual(len(jobs[0].post_preview), 100)
+        self.assertEqual(jobs[0].post_length, len("Post " * 45))
+        self.assertEqual(await get_job_post(self.session, jobs[0].id), "Post " * 45)
+        self.assertIsNone(await get_job_post(self.session, 1000))
+
+    async def test_update_job_step(self):
+        """Test that a failed job is restarted by a step update, and completed with its final video"""
+        job = await update_job_step(self.session, 3, "generating_audio")
+        self.assertEqual(
+            (job.status, job.step, job.error_msg),
+            ("processing", "generating_audio", None),
+        )
+
+        job = await fail_job(self.session, 3, "Error")
+        self.assertEqual((job.status, job.error_msg), ("failed", "Error"))
+
+        final_video = "tests/fixtures/unit/utils/ffmpeg/test_5_second_video.mp4"
+        job = await update_job_step(self.session, 3, "completed", final_video)
+        self.assertEqual((job.status, job.step), ("completed", "generating_audio"))
+        self.assertEqual(job.final_video_path, final_video)
+        self.assertTrue(job.size.endswith(" MB"))
+
+    async def test_get_job_steps(self):
+        """Test that the step transitions of a job are recorded with their timestamps"""
+        start = datetime(2024, 4, 18, 21, 0, 0)
+        await update_job_step(self.session, 1, "generating_audio", at=start)
+        await update_job_step(
+            self.session, 1, "generating_srt", at=start + timedelta(seconds=2)
+        )
+        await fail_job(self.session, 1, "Error", at=start + timedelta(seconds=5))
+        await update_job_step(
+            self.session, 1, "generating_srt", at=start + timedelta(seconds=10)
+        )
+
+        steps = await get_job_steps(self.session, 1)
+
+        self.assertEqual(
+            [(step["step"], step["duration"]) for step in steps],
+            [("generating_audio", 2), ("generating_srt", 3), ("generating_srt", None)],
+        )
+        self.assertEqual(await get_job_steps(self.session, 2), [])
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+from app.service.database import POOL_SIZES, create_engine
+
+
+class TestDatabase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+        self.url = f"sqlite+aiosqlite:///{self.test_dir}/test_database.db"
+
+    async def test_sqlite_pragmas(self):
+        """Test that the pragmas are set on every SQLite connection"""
+        engine = create_engine(
+            self.url, sqlite_pragmas={"journal_mode": "WAL", "busy_timeout": 1234}
+        )
+
+        async with engine.connect() as conn:
+            journal_mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+            busy_timeout = (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+        await engine.dispose()
+
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(busy_timeout, 1234)
+
+    async def test_pool_size_of_role(self):
+        """Test that the connection pool is sized by the role of the process"""
+        with patch.dict(
+            os.environ, {"DATABASE_POOL_SIZE": "", "DATABASE_MAX_OVERFLOW": ""}
+        ):
+            web_engine = create_engine(self.url, role="web")
+            worker_engine = create_engine(self.url, role="worker")
+
+        self.assertEqual(web_engine.pool.size(), POOL_SIZES["web"][0])
+        self.assertEqual(worker_engine.pool.size(), POOL_SIZES["worker"][0])
+
+        with self.assertRaises(ValueError):
+            create_engine(self.url, role="scheduler")
+
+    async def test_echo_only_in_dev(self):
+        """Test that SQL statements are only logged in dev"""
+        with patch.dict(os.environ, {"ENV": "prod"}):
+            os.environ.pop("DATABASE_ECHO", None)
+            self.assertFalse(create_engine(self.url).echo)
+
+        with patch.dict(os.environ, {"ENV": "dev"}):
+            os.environ.pop("DATABASE_ECHO", None)
+            self.assertTrue(create_engine(self.url).echo)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
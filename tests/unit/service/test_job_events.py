@@ -0,0 +1,81 @@
+import asyncio
+import json
+import unittest
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import anyio
+import redis
+
+from app.service.job_events import (
+    JOB_EVENTS_CHANNEL,
+    publish_job_event,
+    subscribe_job_events,
+)
+
+
+class TestJobEvents(unittest.IsolatedAsyncioTestCase):
+    @patch("app.service.job_events._get_client")
+    def test_publish_job_event(self, mock_get_client):
+        """Test that events are published as JSON, and a Redis error isn't raised"""
+        publish_job_event({"id": 1, "status": "processing"})
+
+        mock_get_client.return_value.publish.assert_called_once_with(
+            JOB_EVENTS_CHANNEL, json.dumps({"id": 1, "status": "processing"})
+        )
+
+        mock_get_client.return_value.publish.side_effect = redis.ConnectionError()
+        publish_job_event({"id": 1, "status": "processing"})
+
+    @patch("app.service.job_events.redis.asyncio.Redis.from_url")
+    async def test_subscribe_job_events(self, mock_from_url):
+        """Test that the published events are yielded, with None for a heartbeat"""
+        pubsub = MagicMock()
+        pubsub.subscribe = AsyncMock()
+        pubsub.aclose = AsyncMock()
+        pubsub.get_message = AsyncMock(
+            side_effect=[
+                {"data": json.dumps({"id": 1, "progress": 0.5}).encode()},
+                None,
+            ]
+        )
+        mock_from_url.return_value.pubsub.return_value = pubsub
+        mock_from_url.return_value.aclose = AsyncMock()
+
+        events = subscribe_job_events()
+        self.assertEqual(await anext(events), {"id": 1, "progress": 0.5})
+        self.assertIsNone(await anext(events))
+        await events.aclose()
+
+        pubsub.subscribe.assert_awaited_once_with(JOB_EVENTS_CHANNEL)
+        pubsub.aclose.assert_awaited_once()
+
+    @patch("app.service.job_events.redis.asyncio.Redis.from_url")
+    async def test_subscribe_job_events_cancelled(self, mock_from_url):
+        """Test that a cancelled subscriber (ie of a closed page) still closes its connection"""
+        closed = []
+
+        async def get_message(**kwargs):
+            await asyncio.sleep(10)
+
+        async def aclose():
+            await asyncio.sleep(0)
+            closed.append(True)
+
+        pubsub = MagicMock()
+        pubsub.subscribe = AsyncMock()
+        pubsub.get_message = get_message
+        pubsub.aclose = aclose
+        mock_from_url.return_value.pubsub.return_value = pubsub
+        mock_from_url.return_value.aclose = AsyncMock()
+
+        with anyio.move_on_after(0.05):
+            async for _ in subscribe_job_events():
+                pass
+
+        self.assertEqual(closed, [True])
+        mock_from_url.return_value.aclose.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+
+from unittest.mock import AsyncMock, patch
+
+from app.service.job_writer import JobWriter
+
+
+@patch("app.service.job_writer.job_state_event", lambda job: {})
+@patch("app.service.job_writer.publish_job_event")
+class TestJobWriter(unittest.IsolatedAsyncioTestCase):
+    @patch("app.service.job_writer.fail_job", new_callable=AsyncMock)
+    @patch("app.service.job_writer.set_job_preview", new_callable=AsyncMock)
+    @patch("app.service.job_writer.update_job_step", new_callable=AsyncMock)
+    async def test_writes_in_order(
+        self,
+        mock_update_job_step,
+        mock_set_job_preview,
+        mock_fail_job,
+        mock_publish_job_event,
+    ):
+        """Test that the writes are made in the background, in order, and skip repeated steps"""
+        order = []
+        mock_update_job_step.side_effect = (
+            lambda db, id, step, *args, **kwargs: order.append(step)
+        )
+        mock_set_job_preview.side_effect = lambda db, id, path: order.append(path)
+        mock_fail_job.side_effect = lambda db, id, error_msg, **kwargs: order.append(
+            error_msg
+        )
+
+        db = AsyncMock()
+        async with JobWriter(db, 1) as writer:
+            writer.update_step("generating_audio")
+            writer.update_step("generating_audio")
+            writer.set_preview("preview.mp4")
+            writer.update_step("generating_final_video")
+            writer.fail("Error")
+            # Nothing is written until the job yields to the writer
+            self.assertEqual(order, [])
+
+        self.assertEqual(
+            order,
+            ["generating_audio", "preview.mp4", "generating_final_video", "Error"],
+        )
+        self.assertIn("at", mock_update_job_step.call_args.kwargs)
+        # The state of the job is published after each write
+        self.assertEqual(mock_publish_job_event.call_count, 4)
+
+    @patch("app.service.job_writer.update_job_step", new_callable=AsyncMock)
+    async def test_failed_write(self, mock_update_job_step, mock_publish_job_event):
+        """Test that a failed write is logged, rather than raised, and later writes are still made"""
+        mock_update_job_step.side_effect = [Exception("database is locked"), None]
+
+        async with JobWriter(AsyncMock(), 1) as writer:
+            writer.update_step("generating_audio")
+            writer.update_step("generating_srt")
+
+        self.assertEqual(mock_update_job_step.await_count, 2)
+        self.assertEqual(mock_publish_job_event.call_count, 1)
+
+    async def test_progress(self, mock_publish_job_event):
+        """Test that the render progress is published at most every PROGRESS_INTERVAL, and when done"""
+        async with JobWriter(AsyncMock(), 1) as writer:
+            writer.progress(0.1)
+            writer.progress(0.2)
+            writer.progress(1.0)
+
+        self.assertEqual(
+            [
+                call.args[0]["progress"]
+                for call in mock_publish_job_event.call_args_list
+            ],
+            [0.1, 1.0],
+        )
+
+    @patch("app.service.job_writer.update_job_step", new_callable=AsyncMock)
+    async def test_without_session(self, mock_update_job_step, mock_publish_job_event):
+        """Test that nothing is written if the job isn't tracked"""
+        async with JobWriter(None, 1) as writer:
+            writer.update_step("generating_audio")
+            await asyncio.sleep(0)
+
+        mock_update_job_step.assert_not_awaited()
+        mock_publish_job_event.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
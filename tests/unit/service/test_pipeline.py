@@ -0,0 +1,167 @@
+import asyncio
+import os
+import time
+import unittest
+
+from app.service.pipeline import Manifest, Stage, run_pipeline
+
+
+class TestPipeline(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+    async def test_run_pipeline(self):
+        async def fetch(delay: float, value):
+            await asyncio.sleep(delay)
+            return value
+
+        def add(a: int, b: int) -> int:
+            time.sleep(0.1)
+            return a + b
+
+        started = []
+
+        async def on_stage_start(stage: Stage):
+            started.append(stage.name)
+
+        stages = [
+            Stage("total", add, ("a", "b"), executor="thread"),
+            Stage("a", lambda: fetch(0.2, 1)),
+            Stage("b", lambda: fetch(0.1, 2)),
+            Stage(
+                "split",
+                lambda total: fetch(0, (total, -total)),
+                ("total",),
+                outputs=("positive", "negative"),
+            ),
+        ]
+
+        start_time = time.time()
+        values, report = await run_pipeline(
+            stages, {"unused": 0}, on_stage_start=on_stage_start
+        )
+        elapsed = time.time() - start_time
+
+        self.assertEqual(values["total"], 3)
+        self.assertEqual(values["positive"], 3)
+        self.assertEqual(values["negative"], -3)
+        self.assertEqual(started, ["a", "b", "total", "split"])
+        # a and b run concurrently
+        self.assertLess(elapsed, 0.5)
+        self.assertLess(report.timings["b"].start, report.timings["a"].end)
+        self.assertEqual(report.timings["total"].depends_on, ("a", "b"))
+        # total waited on a, the slowest of its dependencies
+        self.assertEqual(report.critical_path, ["a", "total", "split"])
+        self.assertIn("critical path: a -> total -> split", report.format())
+
+    async def test_run_pipeline_cancels_running_stages_on_failure(self):
+        cancelled = asyncio.Event()
+
+        async def fail():
+            await asyncio.sleep(0.05)
+            raise RuntimeError("Stage failed")
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        stages = [
+            Stage("fail", fail),
+            Stage("slow", slow),
+            Stage("after", lambda fail: fail, ("fail",)),
+        ]
+
+        with self.assertRaises(RuntimeError):
+            await run_pipeline(stages)
+        self.assertTrue(cancelled.is_set())
+
+    async def test_run_pipeline_rejects_invalid_graphs(self):
+        async def noop(**kwargs):
+            return None
+
+        with self.assertRaises(ValueError):
+            await run_pipeline([Stage("a", noop, ("missing",))])
+
+        with self.assertRaises(ValueError):
+            await run_pipeline([Stage("a", noop, ("b",)), Stage("b", noop, ("a",))])
+
+        with self.assertRaises(ValueError):
+            await run_pipeline([Stage("a", noop), Stage("b", noop, outputs=("a",))])
+
+    async def test_run_pipeline_resumes_from_manifest(self):
+        manifest_path = os.path.join(self.test_dir, "manifest.json")
+        output_file = os.path.join(self.test_dir, "pipeline_output.txt")
+        calls = []
+
+        def write(text: str) -> str:
+            calls.append("write")
+            with open(output_file, "w") as f:
+                f.write(text)
+            return output_file
+
+        def count(write: str) -> int:
+            calls.append("count")
+            with open(write, "r") as f:
+                return len(f.read())
+
+        def stages(text: str) -> list:
+            return [
+                Stage(
+                    "write",
+                    write,
+                    ("text",),
+                    executor="thread",
+                    checkpoint=True,
+                    files=("write",),
+                    params={"version": 1},
+                ),
+                Stage("count", count, ("write",), executor="thread", checkpoint=True),
+            ]
+
+        values, _ = await run_pipeline(
+            stages("hello"), {"text": "hello"}, manifest=Manifest(manifest_path)
+        )
+        self.assertEqual(values["count"], 5)
+        self.assertEqual(calls, ["write", "count"])
+
+        # Nothing changed, both stages are resumed
+        calls.clear()
+        values, report = await run_pipeline(
+            stages("hello"), {"text": "hello"}, manifest=Manifest(manifest_path)
+        )
+        self.assertEqual(values["count"], 5)
+        self.assertEqual(calls, [])
+        self.assertTrue(all(timing.resumed for timing in report.timings.values()))
+
+        # The file was changed, so it is written again. Its content is the same as before, so the
+        # stage after it is still resumed
+        with open(output_file, "w") as f:
+            f.write("changed")
+        values, _ = await run_pipeline(
+            stages("hello"), {"text": "hello"}, manifest=Manifest(manifest_path)
+        )
+        self.assertEqual(values["count"], 5)
+        self.assertEqual(calls, ["write"])
+
+        # A different input invalidates the stage using it, and the stages after it
+        calls.clear()
+        values, _ = await run_pipeline(
+            stages("hi"), {"text": "hi"}, manifest=Manifest(manifest_path)
+        )
+        self.assertEqual(values["count"], 2)
+        self.assertEqual(calls, ["write", "count"])
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import wave
+
+from app.utils.audio import AudioBuffer
+from app.utils.ffmpeg import get_audio_duration
+
+
+class TestAudioBuffer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+        self.audio_file = "tests/fixtures/unit/utils/ffmpeg/test_5_second_audio.mp3"
+
+    async def test_from_file(self):
+        """Test that an audio file can be decoded, with the duration taken from the samples"""
+        audio = await AudioBuffer.from_file(self.audio_file)
+
+        self.assertAlmostEqual(audio.duration, 5, delta=0.2)
+
+    async def test_pad(self):
+        """Test that silence can be added to the start and end of the audio"""
+        audio = await AudioBuffer.from_file(self.audio_file)
+
+        self.assertAlmostEqual(audio.pad("START", 10).duration, audio.duration + 10)
+        self.assertAlmostEqual(audio.pad("END", 1).duration, audio.duration + 1)
+
+        with self.assertRaises(ValueError):
+            audio.pad("MIDDLE", 1)
+
+    async def test_concatenate(self):
+        """Test that audio buffers can be concatenated"""
+        audio = await AudioBuffer.from_file(self.audio_file)
+
+        concatenated = AudioBuffer.concatenate(audio, audio.pad("END", 1))
+
+        self.assertAlmostEqual(concatenated.duration, 2 * audio.duration + 1)
+
+    async def test_write_wav(self):
+        """Test that the audio can be written to a wav file"""
+        audio = (await AudioBuffer.from_file(self.audio_file)).pad("END", 1)
+
+        output_file = os.path.join(self.test_dir, "test_audio.wav")
+        audio.write_wav(output_file)
+
+        with wave.open(output_file, "rb") as f:
+            self.assertEqual(f.getnframes(), len(audio.samples))
+
+        self.assertAlmostEqual(
+            get_audio_duration(output_file), audio.duration, delta=0.1
+        )
+
+    async def test_read_wav(self):
+        """Test that a wav file written by write_wav can be read back"""
+        audio = await AudioBuffer.from_file(self.audio_file)
+
+        output_file = os.path.join(self.test_dir, "test_audio.wav")
+        audio.write_wav(output_file)
+        read = AudioBuffer.read_wav(output_file)
+
+        self.assertEqual(read.sample_rate, audio.sample_rate)
+        self.assertTrue((read.samples == audio.samples).all())
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
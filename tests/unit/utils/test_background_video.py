@@ -0,0 +1,90 @@
+import unittest
+import os
+import json
+import shutil
+
+import ffmpeg
+
+from app.utils.ffmpeg import get_video_duration
+from app.utils.background_video import (
+    get_clip_pool_dir,
+    get_random_chunk_from_pool,
+    index_background_video,
+    load_clip_pool,
+)
+
+
+class TestBackgroundVideo(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+        # A 10 second background with a keyframe every second
+        self.video_file = os.path.join(self.test_dir, "test_background_video.mp4")
+        (
+            ffmpeg.input(
+                "tests/fixtures/unit/utils/ffmpeg/test_5_second_video.mp4",
+                stream_loop=1,
+            )
+            .output(self.video_file, vcodec="libx264", preset="ultrafast", g=25)
+            .global_args("-loglevel", "error")
+            .run(overwrite_output=True)
+        )
+
+    async def test_index_background_video(self):
+        """Test that a background video can be indexed into a pool of keyframe aligned clips"""
+        index_path = await index_background_video(self.video_file, 2)
+
+        with open(index_path, "r") as f:
+            index = json.load(f)
+
+        self.assertGreater(len(index["clips"]), 1)
+        self.assertAlmostEqual(index["duration"], 10, delta=0.2)
+        for clip in index["clips"]:
+            self.assertEqual(clip["keyframes"][0], 0)
+
+    async def test_get_random_chunk_from_pool(self):
+        """Test that a chunk of the requested length can be taken from the pool"""
+        await index_background_video(self.video_file, 2)
+        clip_pool = load_clip_pool(self.video_file)
+
+        output_file = os.path.join(self.test_dir, "test_pool_chunk.mp4")
+        await get_random_chunk_from_pool(clip_pool, 3.5, output_file)
+
+        self.assertTrue(os.path.exists(output_file))
+
+        # The chunk ends on the first keyframe after the requested duration
+        duration = get_video_duration(output_file)
+        self.assertGreaterEqual(duration, 3.5)
+        self.assertLessEqual(duration, 4.6)
+
+    async def test_get_random_chunk_longer_than_pool(self):
+        """Test that a chunk longer than the pool loops the pool"""
+        await index_background_video(self.video_file, 2)
+        clip_pool = load_clip_pool(self.video_file)
+
+        output_file = os.path.join(self.test_dir, "test_pool_chunk.mp4")
+        await get_random_chunk_from_pool(clip_pool, 25, output_file)
+
+        duration = get_video_duration(output_file)
+        self.assertGreaterEqual(duration, 25)
+        self.assertLessEqual(duration, 26.1)
+
+    async def test_stale_pool_is_ignored(self):
+        """Test that the pool is ignored once the source video changes"""
+        await index_background_video(self.video_file, 2)
+        os.utime(self.video_file, ns=(0, 0))
+
+        self.assertIsNone(load_clip_pool(self.video_file))
+
+    def tearDown(self):
+        """Clean up after tests"""
+        shutil.rmtree(get_clip_pool_dir(self.video_file), ignore_errors=True)
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import os
+import shutil
+
+from unittest.mock import patch
+
+from app.utils.disk_cache import DiskCache, make_cache_key
+from app.utils.tts import TTS
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+        self.cache_dir = os.path.join(self.test_dir, "cache")
+        self.cache = DiskCache(self.cache_dir, 1024, suffix=".mp3")
+
+        self.output_file = os.path.join(self.test_dir, "output.mp3")
+
+    def _write(self, size: int) -> str:
+        file = os.path.join(self.test_dir, "input.mp3")
+        with open(file, "wb") as f:
+            f.write(os.urandom(size))
+        return file
+
+    def test_make_cache_key(self):
+        """Test that keys depend on every part"""
+        self.assertEqual(make_cache_key("a", "b"), make_cache_key("a", "b"))
+        self.assertNotEqual(make_cache_key("a", "b"), make_cache_key("a", "c"))
+        self.assertNotEqual(make_cache_key("ab", "c"), make_cache_key("a", "bc"))
+
+    def test_get_and_put(self):
+        """Test that a stored entry is copied to the output, and counted as a hit"""
+        self.assertFalse(self.cache.get("key", self.output_file))
+
+        input_file = self._write(100)
+        self.cache.put("key", input_file)
+
+        self.assertTrue(self.cache.get("key", self.output_file))
+        with open(input_file, "rb") as expected, open(self.output_file, "rb") as actual:
+            self.assertEqual(expected.read(), actual.read())
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+        self.assertEqual(stats["bytes"], 100)
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entries are evicted past the budget"""
+        for age, key in enumerate(["first", "second"]):
+            self.cache.put(key, self._write(400))
+            # mtimes can share a timestamp on coarse clocks, make the order explicit
+            os.utime(self.cache._entry_path(key), (age, age))
+
+        # Using the first entry makes the second one the least recently used
+        self.assertTrue(self.cache.get("first", self.output_file))
+        self.cache.put("third", self._write(400))
+
+        self.assertTrue(self.cache.get("first", self.output_file))
+        self.assertFalse(self.cache.get("second", self.output_file))
+        self.assertLessEqual(self.cache.stats()["bytes"], 1024)
+        self.assertGreater(self.cache.stats()["evictions"], 0)
+
+    def test_disabled(self):
+        """Test that a cache without a budget stores nothing"""
+        cache = DiskCache(self.cache_dir, 0)
+        cache.put("key", self._write(100))
+
+        self.assertFalse(cache.get("key", self.output_file))
+        self.assertEqual(cache.stats(), {"enabled": False})
+
+    def test_tts_uses_cache(self):
+        """Test that a TTS provider only synthesizes the same text and voice once"""
+
+        class FakeTTS(TTS):
+            provider = "fake"
+            model = "fake-1"
+            calls = 0
+
+            def get_voice_id(self, gender):
+                return gender
+
+            def synthesize(self, text, voice_id, output_path):
+                FakeTTS.calls += 1
+                with open(output_path, "w") as f:
+                    f.write(f"{voice_id}: {text}")
+
+        with patch("app.utils.tts.tts_cache", self.cache):
+            tts = FakeTTS()
+            tts.generate_mp3("Hello", "m", self.output_file)
+            tts.generate_mp3("Hello", "m", self.output_file)
+            tts.generate_mp3("Hello", "f", self.output_file)
+
+        self.assertEqual(FakeTTS.calls, 2)
+        with open(self.output_file, "r") as f:
+            self.assertEqual(f.read(), "f: Hello")
+
+    def tearDown(self):
+        """Clean up after tests"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import asyncio
+import os
+import shutil
+
+from app.utils.encode_scheduler import EncodeScheduler
+
+
+class TestEncodeScheduler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+        self.slot_dir = os.path.join(self.test_dir, "encode_slots")
+        self.scheduler = EncodeScheduler(self.slot_dir, 2, 8, poll_interval=0.01)
+
+    def test_thread_budget(self):
+        """Test that the cores are split between the running and queued encodes"""
+        self.assertEqual(self.scheduler.thread_budget(1, 0), 8)
+        self.assertEqual(self.scheduler.thread_budget(2, 0), 4)
+        # Never split further than the number of slots
+        self.assertEqual(self.scheduler.thread_budget(2, 5), 4)
+
+    async def test_slot_caps_concurrency(self):
+        """Test that no more encodes than there are slots run at once"""
+        running = 0
+        max_running = 0
+
+        async def encode():
+            nonlocal running, max_running
+            async with self.scheduler.slot() as threads:
+                running += 1
+                max_running = max(max_running, running)
+                self.assertGreaterEqual(threads, 4)
+                await asyncio.sleep(0.05)
+                running -= 1
+
+        await asyncio.gather(*[encode() for _ in range(5)])
+
+        self.assertEqual(max_running, 2)
+
+    async def test_get_allocation(self):
+        """Test that the running and queued encodes are reported"""
+        async with self.scheduler.slot("first") as first_threads:
+            self.assertEqual(first_threads, 8)
+
+            async with self.scheduler.slot("second") as second_threads:
+                self.assertEqual(second_threads, 4)
+
+                waiting = asyncio.create_task(self._hold_slot("third"))
+                await asyncio.sleep(0.05)
+
+                allocation = self.scheduler.get_allocation()
+                self.assertEqual(
+                    [encode["label"] for encode in allocation["active"]],
+                    ["first", "second"],
+                )
+                self.assertEqual(allocation["waiting"], 1)
+
+            await waiting
+
+        allocation = self.scheduler.get_allocation()
+        self.assertEqual(allocation["active"], [])
+        self.assertEqual(allocation["waiting"], 0)
+
+    async def _hold_slot(self, label: str):
+        async with self.scheduler.slot(label):
+            pass
+
+    def tearDown(self):
+        """Clean up after tests"""
+        shutil.rmtree(self.slot_dir, ignore_errors=True)
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 import os
 
+from fractions import Fraction
+
 from app.utils.ffmpeg import (
     resize_video,
     loop_video_to_audio,
@@ -8,16 +10,37 @@ from app.utils.ffmpeg import (
     get_audio_duration,
     concatenate_audios,
     buffer_audio,
+    render_single_pass,
+    render_outputs,
+    render_segmented,
+    OutputSpec,
+    get_video_dimensions,
+    get_segment_boundaries,
+    write_loop_concat_list,
 )
+from app.utils.subtitles import write_ass
+
+
+def top_level_atoms(mp4_path: str) -> list:
+    """Returns the types of the top level atoms of an MP4 file, in order."""
+    atoms = []
+    with open(mp4_path, "rb") as f:
+        while header := f.read(8):
+            size, atom_type = int.from_bytes(header[:4], "big"), header[4:].decode()
+            if size == 1:
+                size = int.from_bytes(f.read(8), "big") - 8
+            atoms.append(atom_type)
+            f.seek(size - 8, os.SEEK_CUR)
+    return atoms
 
 
-class TestFFmpegUtils(unittest.TestCase):
+class TestFFmpegUtils(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         # Create directory for test files if it does not exist
         self.test_dir = "tmp/test"
         os.makedirs(self.test_dir, exist_ok=True)
 
-    def test_resize_video(self):
+    async def test_resize_video(self):
         """Test that a video can be resized to maintain a 16:9 aspect ratio"""
         file_under_test = (
             "tests/fixtures/unit/utils/ffmpeg/test_5_second_uncropped_video.mp4"
@@ -25,7 +48,7 @@ class TestFFmpegUtils(unittest.TestCase):
 
         output_file = os.path.join(self.test_dir, "test_resized_video.mp4")
 
-        resize_video(file_under_test, output_file)
+        await resize_video(file_under_test, output_file)
 
         self.assertTrue(os.path.exists(output_file))
 
@@ -35,14 +58,14 @@ class TestFFmpegUtils(unittest.TestCase):
 
         self.assertTrue(os.path.getsize(output_file) < os.path.getsize(file_under_test))
 
-    def test_loop_video_to_audio(self):
+    async def test_loop_video_to_audio(self):
         """Test that a video can be looped to audio"""
 
         file_under_test = "tests/fixtures/unit/utils/ffmpeg/test_5_second_video.mp4"
 
         output_file = os.path.join(self.test_dir, "test_looped_video.mp4")
 
-        loop_video_to_audio(10, file_under_test, output_file)
+        await loop_video_to_audio(10, file_under_test, output_file)
 
         self.assertTrue(os.path.exists(output_file))
 
@@ -53,14 +76,30 @@ class TestFFmpegUtils(unittest.TestCase):
 
         self.assertEqual(get_video_duration(output_file), 10)
 
-    def test_concatenate_audios(self):
+    async def test_write_loop_concat_list(self):
+        """Test that a loop concat list repeats the video and ends with a keyframe aligned tail"""
+
+        file_under_test = "tests/fixtures/unit/utils/ffmpeg/test_5_second_video.mp4"
+
+        concat_list = os.path.join(self.test_dir, "test_looped_video.ffconcat")
+
+        await write_loop_concat_list(12, file_under_test, concat_list, 5)
+
+        with open(concat_list, "r") as f:
+            lines = f.read().splitlines()
+
+        # Two whole loops, plus the tail (which has no keyframe after 2s, so is played in full)
+        self.assertEqual(lines[0], "ffconcat version 1.0")
+        self.assertEqual(len([line for line in lines if line.startswith("file")]), 3)
+
+    async def test_concatenate_audios(self):
         """Test that two audio files can be concatenated"""
         file1 = "tests/fixtures/unit/utils/ffmpeg/test_5_second_audio.mp3"
         file2 = "tests/fixtures/unit/utils/ffmpeg/test_5_second_audio.mp3"
 
         output_file = os.path.join(self.test_dir, "test_concatenated_audio.mp3")
 
-        concatenate_audios(file1, file2, output_file)
+        await concatenate_audios(file1, file2, output_file)
 
         self.assertTrue(os.path.exists(output_file))
 
@@ -78,14 +117,14 @@ class TestFFmpegUtils(unittest.TestCase):
         """Test that an image can be resized"""
         pass
 
-    def test_buffer_audio_start(self):
+    async def test_buffer_audio_start(self):
         """Test that audio can be buffered"""
 
         file_under_test = "tests/fixtures/unit/utils/ffmpeg/test_5_second_audio.mp3"
 
         output_file = os.path.join(self.test_dir, "test_buffered_audio.mp3")
 
-        buffer_audio(file_under_test, "START", 10, output_file)
+        await buffer_audio(file_under_test, "START", 10, output_file)
 
         self.assertTrue(os.path.exists(output_file))
 
@@ -93,14 +132,14 @@ class TestFFmpegUtils(unittest.TestCase):
 
         self.assertAlmostEqual(duration, 15, delta=0.5)
 
-    def test_buffer_audio_end(self):
+    async def test_buffer_audio_end(self):
         """Test that audio can be buffered"""
 
         file_under_test = "tests/fixtures/unit/utils/ffmpeg/test_5_second_audio.mp3"
 
         output_file = os.path.join(self.test_dir, "test_buffered_audio.mp3")
 
-        buffer_audio(file_under_test, "END", 10, output_file)
+        await buffer_audio(file_under_test, "END", 10, output_file)
 
         self.assertTrue(os.path.exists(output_file))
 
@@ -108,10 +147,113 @@ class TestFFmpegUtils(unittest.TestCase):
 
         self.assertAlmostEqual(duration, 15, delta=0.5)
 
-    # TODO
-    def test_delay_srt_(self):
-        """Test that an srt file can be delayed"""
-        pass
+    async def test_render_single_pass(self):
+        """Test that the final video can be rendered in a single pass"""
+        video_file = "tests/fixtures/unit/utils/ffmpeg/test_5_second_video.mp4"
+        audio_file = "tests/fixtures/unit/utils/ffmpeg/test_10_second_audio.mp3"
+        image_file = (
+            "tests/fixtures/unit/utils/image_generator/reddit_title_template.png"
+        )
+
+        srt_file = os.path.join(self.test_dir, "test_subtitles.ass")
+        write_ass([(0, 2, "Hello world")], srt_file, 2)
+
+        output_file = os.path.join(self.test_dir, "test_single_pass.mp4")
+
+        await render_single_pass(
+            video_file, image_file, 2, audio_file, srt_file, 10, output_file, "test"
+        )
+
+        self.assertTrue(os.path.exists(output_file))
+
+        # The background video should have been looped to the audio duration
+        self.assertAlmostEqual(get_video_duration(output_file), 10, delta=0.2)
+
+        # Written with +faststart, so players don't need the end of the file to start
+        atoms = top_level_atoms(output_file)
+        self.assertLess(atoms.index("moov"), atoms.index("mdat"))
+
+    async def test_render_outputs(self):
+        """Test that every rendition is written from a single render"""
+        video_file = "tests/fixtures/unit/utils/ffmpeg/test_5_second_video.mp4"
+        audio_file = "tests/fixtures/unit/utils/ffmpeg/test_10_second_audio.mp3"
+        image_file = (
+            "tests/fixtures/unit/utils/image_generator/reddit_title_template.png"
+        )
+
+        srt_file = os.path.join(self.test_dir, "test_subtitles.ass")
+        write_ass([(0, 2, "Hello world")], srt_file, 2)
+
+        final_file = os.path.join(self.test_dir, "test_final.mp4")
+        preview_file = os.path.join(self.test_dir, "test_preview.mp4")
+        poster_file = os.path.join(self.test_dir, "test_poster.jpg")
+        webp_file = os.path.join(self.test_dir, "test_preview.webp")
+
+        await render_outputs(
+            video_file,
+            image_file,
+            2,
+            audio_file,
+            srt_file,
+            10,
+            [
+                OutputSpec(final_file, "test"),
+                OutputSpec(preview_file, "preview"),
+                OutputSpec(poster_file, "poster"),
+                OutputSpec(webp_file, "animated_preview"),
+            ],
+            "test",
+        )
+
+        self.assertAlmostEqual(get_video_duration(final_file), 10, delta=0.2)
+        self.assertAlmostEqual(get_video_duration(preview_file), 10, delta=0.2)
+        self.assertLessEqual(get_video_dimensions(preview_file)[1], 540)
+        self.assertTrue(os.path.getsize(poster_file) > 0)
+        self.assertTrue(os.path.getsize(webp_file) > 0)
+
+    async def test_render_segmented(self):
+        """Test that the final video can be rendered in segments, joined to the full duration"""
+        video_file = "tests/fixtures/unit/utils/ffmpeg/test_5_second_video.mp4"
+        audio_file = "tests/fixtures/unit/utils/ffmpeg/test_10_second_audio.mp3"
+        image_file = (
+            "tests/fixtures/unit/utils/image_generator/reddit_title_template.png"
+        )
+
+        srt_file = os.path.join(self.test_dir, "test_subtitles.ass")
+        write_ass([(0, 2, "Hello world"), (5, 7, "Goodbye world")], srt_file, 2)
+
+        output_file = os.path.join(self.test_dir, "test_segmented.mp4")
+
+        await render_segmented(
+            video_file,
+            image_file,
+            2,
+            audio_file,
+            srt_file,
+            10,
+            output_file,
+            "test",
+            segments=3,
+        )
+
+        self.assertTrue(os.path.exists(output_file))
+        self.assertAlmostEqual(get_video_duration(output_file), 10, delta=0.2)
+
+        # The segments are removed once joined
+        self.assertFalse(
+            [file for file in os.listdir(self.test_dir) if "_segments" in file]
+        )
+
+    def test_get_segment_boundaries(self):
+        """Test that segments cover the timeline and start on frame boundaries"""
+        boundaries = get_segment_boundaries(10, 3, Fraction(30))
+
+        self.assertEqual(len(boundaries), 3)
+        self.assertEqual(boundaries[0][0], 0)
+        self.assertEqual(boundaries[-1][1], 10)
+        for (_, end), (start, _) in zip(boundaries, boundaries[1:]):
+            self.assertEqual(end, start)
+            self.assertAlmostEqual(start * 30, round(start * 30))
 
     def test_get_video_duration(self):
         """Test that the duration of a video can be retrieved"""
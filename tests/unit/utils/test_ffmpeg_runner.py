@@ -0,0 +1,129 @@
+import unittest
+import asyncio
+import os
+from time import time
+
+import ffmpeg
+
+from app.utils.ffmpeg_runner import (
+    FFMpegProcessingError,
+    parse_progress,
+    run_ffmpeg,
+    run_ffprobe,
+)
+
+
+class TestFFmpegRunner(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+        self.output_file = os.path.join(self.test_dir, "test_runner.mp4")
+
+    def _test_source(self, duration: float, realtime: bool = False):
+        """A generated test video, read at its native rate if realtime, so it takes 'duration' seconds"""
+        kwargs = {"re": None} if realtime else {}
+        return (
+            ffmpeg.input(
+                f"testsrc=duration={duration}:size=64x64", format="lavfi", **kwargs
+            )
+            .output(self.output_file, vcodec="libx264", preset="ultrafast")
+            .global_args("-loglevel", "error")
+        )
+
+    def test_parse_progress(self):
+        """Test that the fields written by -progress are parsed"""
+        progress = parse_progress(
+            {"frame": "42", "out_time_us": "1500000", "speed": "2.5x"}
+        )
+
+        self.assertEqual(progress.frame, 42)
+        self.assertEqual(progress.out_time, 1.5)
+        self.assertEqual(progress.speed, 2.5)
+
+        # ffmpeg writes N/A until it has an estimate
+        self.assertIsNone(parse_progress({"speed": "N/A"}).speed)
+
+    async def test_run_ffmpeg_progress(self):
+        """Test that progress events are emitted while the command runs"""
+        events = []
+        await run_ffmpeg(self._test_source(2), "Error", on_progress=events.append)
+
+        self.assertTrue(os.path.exists(self.output_file))
+        self.assertGreater(len(events), 0)
+        self.assertAlmostEqual(events[-1].out_time, 2, delta=0.2)
+
+    async def test_run_ffmpeg_error(self):
+        """Test that a failed command raises with its stderr"""
+        command = (
+            ffmpeg.input("does_not_exist.mp4")
+            .output(self.output_file)
+            .global_args("-loglevel", "error")
+        )
+
+        with self.assertRaises(FFMpegProcessingError) as context:
+            await run_ffmpeg(command, "Error during test ffmpeg command")
+
+        self.assertEqual(str(context.exception), "Error during test ffmpeg command")
+        self.assertIn(b"does_not_exist.mp4", context.exception.stderr)
+
+    async def test_run_ffmpeg_input(self):
+        """Test that input is piped to the command, and stdout can be captured"""
+        command = ffmpeg.input("pipe:", format="s16le", ar=8000, ac=1).output(
+            "pipe:", format="s16le"
+        )
+
+        out = await run_ffmpeg(
+            command, "Error", input=bytes(16000), capture_stdout=True
+        )
+
+        self.assertEqual(out, bytes(16000))
+
+    async def test_run_ffmpeg_timeout(self):
+        """Test that a command running past its timeout is killed"""
+        start_time = time()
+
+        with self.assertRaises(FFMpegProcessingError):
+            await run_ffmpeg(self._test_source(30, realtime=True), "Error", timeout=0.5)
+
+        self.assertLess(time() - start_time, 5)
+
+    async def test_run_ffmpeg_cancel(self):
+        """Test that cancelling the awaiting task kills the command"""
+        task = asyncio.create_task(
+            run_ffmpeg(self._test_source(30, realtime=True), "Error")
+        )
+        await asyncio.sleep(0.5)
+
+        start_time = time()
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertLess(time() - start_time, 5)
+
+    async def test_run_ffprobe(self):
+        """Test that ffprobe gives the output of ffmpeg.probe, and a failure raises with its stderr"""
+        video_file = "tests/fixtures/unit/utils/ffmpeg/test_5_second_video.mp4"
+
+        probe = await run_ffprobe(video_file, "Error", select_streams="v:0")
+
+        self.assertEqual(
+            probe["streams"], ffmpeg.probe(video_file, select_streams="v:0")["streams"]
+        )
+
+        with self.assertRaises(FFMpegProcessingError) as context:
+            await run_ffprobe("does_not_exist.mp4", "Error during test ffprobe command")
+
+        self.assertIn(b"does_not_exist.mp4", context.exception.stderr)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
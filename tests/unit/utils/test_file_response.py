@@ -0,0 +1,115 @@
+import unittest
+import os
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.utils.file_response import file_response, parse_range
+
+
+class TestFileResponse(unittest.TestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+        self.file = os.path.join(self.test_dir, "test_file_response.mp4")
+        self.content = bytes(range(256)) * 4000
+        with open(self.file, "wb") as f:
+            f.write(self.content)
+
+        async def endpoint(request: Request):
+            return file_response(
+                request,
+                self.file,
+                "public, max-age=60",
+                download_name=(
+                    "video.mp4" if "download" in request.query_params else None
+                ),
+            )
+
+        self.client = TestClient(
+            Starlette(routes=[Route("/file", endpoint, methods=["GET", "HEAD"])])
+        )
+
+    def test_parse_range(self):
+        """Test that single byte ranges are parsed, and other ranges ignored"""
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range("bytes=900-", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=900-2000", 1000), (900, 999))
+        self.assertIsNone(parse_range("bytes=0-1,5-9", 1000))
+        self.assertIsNone(parse_range("bytes=10-5", 1000))
+        self.assertIsNone(parse_range("items=0-1", 1000))
+
+        with self.assertRaises(ValueError):
+            parse_range("bytes=1000-", 1000)
+
+    def test_whole_file(self):
+        """Test that the whole file is sent, with its validators and Cache-Control"""
+        response = self.client.get("/file")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.content)
+        self.assertEqual(response.headers["content-type"], "video/mp4")
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+        self.assertEqual(response.headers["cache-control"], "public, max-age=60")
+        self.assertTrue(response.headers["etag"].startswith('"'))
+        self.assertNotIn("content-disposition", response.headers)
+
+        response = self.client.get("/file?download")
+        self.assertEqual(
+            response.headers["content-disposition"], 'attachment; filename="video.mp4"'
+        )
+
+    def test_range(self):
+        """Test that a byte range is sent as partial content"""
+        response = self.client.get("/file", headers={"Range": "bytes=1000-1999"})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.content[1000:2000])
+        self.assertEqual(
+            response.headers["content-range"], f"bytes 1000-1999/{len(self.content)}"
+        )
+
+        response = self.client.get(
+            "/file", headers={"Range": f"bytes={len(self.content)}-"}
+        )
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(
+            response.headers["content-range"], f"bytes */{len(self.content)}"
+        )
+
+    def test_conditional_requests(self):
+        """Test that a cached copy is revalidated with the ETag, and stale ranges aren't sent"""
+        etag = self.client.head("/file").headers["etag"]
+
+        response = self.client.get("/file", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(
+            "/file", headers={"Range": "bytes=0-9", "If-Range": '"stale"'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.content), len(self.content))
+
+    def test_head(self):
+        """Test that a HEAD request gets the headers of the file, without its content"""
+        response = self.client.head("/file")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-length"], str(len(self.content)))
+        self.assertEqual(response.content, b"")
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
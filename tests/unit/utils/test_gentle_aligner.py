@@ -1,8 +1,12 @@
 import unittest
 import os
 import json
+import shutil
 
-from app.utils.gentle_aligner import GentleAligner
+from unittest.mock import patch
+
+from app.utils.disk_cache import DiskCache
+from app.utils.gentle_aligner import GentleAligner, compact_alignment
 
 
 class TestGentleAligner(unittest.TestCase):
@@ -30,8 +34,68 @@ class TestGentleAligner(unittest.TestCase):
         file_size = os.path.getsize(output_file)
         self.assertGreater(file_size, 0, "Generated SRT file is empty.")
 
+    def test_group_words(self):
+        """Test that the aligned words are grouped into subtitles of up to 3 words"""
+
+        with open(self.test_fiture_path, "r") as f:
+            groups = self.gentle_aligner.group_words(f.read())
+
+        self.assertGreater(len(groups), 0)
+        for start, end, text in groups:
+            self.assertLessEqual(start, end)
+            self.assertLessEqual(len(text.split(" ")), 3)
+
+        # Groups should not overlap
+        for previous, current in zip(groups, groups[1:]):
+            self.assertLessEqual(round(previous[1], 2), round(current[0], 2))
+
+    def test_compact_alignment(self):
+        """Test that only the word fields are kept, and the words group the same"""
+
+        with open(self.test_fiture_path, "r") as f:
+            aligned = f.read()
+
+        compact = compact_alignment(aligned)
+
+        self.assertLess(len(compact), len(aligned))
+        for word in json.loads(compact)["words"]:
+            self.assertLessEqual(set(word), {"word", "start", "end", "case"})
+        self.assertEqual(
+            self.gentle_aligner.group_words(compact),
+            self.gentle_aligner.group_words(aligned),
+        )
+
+    def test_generate_aligned_uses_cache(self):
+        """Test that the same audio and transcript is only sent to the aligner once"""
+
+        with open(self.test_fiture_path, "r") as f:
+            aligned = f.read()
+
+        os.makedirs(self.test_dir, exist_ok=True)
+        audio_file = os.path.join(self.test_dir, "test_audio.wav")
+        with open(audio_file, "wb") as f:
+            f.write(b"audio")
+
+        cache = DiskCache(os.path.join(self.test_dir, "alignment_cache"), 1024**2)
+        with patch("app.utils.gentle_aligner.alignment_cache", cache), patch(
+            "app.utils.gentle_aligner.get_client"
+        ) as mock_get_client:
+            mock_post = mock_get_client.return_value.post
+            mock_post.return_value.text = aligned
+
+            first = self.gentle_aligner.generate_aligned("Some transcript", audio_file)
+            second = self.gentle_aligner.generate_aligned("Some transcript", audio_file)
+            self.gentle_aligner.generate_aligned("Another transcript", audio_file)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, compact_alignment(aligned))
+        self.assertEqual(mock_post.call_count, 2)
+
     def tearDown(self):
         """Clean up after tests"""
+        shutil.rmtree(
+            os.path.join(self.test_dir, "alignment_cache"), ignore_errors=True
+        )
         for file in os.listdir(self.test_dir):
             if os.path.isfile(os.path.join(self.test_dir, file)):
                 os.remove(os.path.join(self.test_dir, file))
@@ -0,0 +1,100 @@
+import asyncio
+import http.server
+import os
+import threading
+import unittest
+
+from unittest.mock import patch
+
+from app.utils import http_client
+from app.utils.http_client import (
+    LATENCY_BUCKETS,
+    close_async_clients,
+    get_async_client,
+    get_client,
+    get_http_latency_stats,
+)
+
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+        self.server = http.server.HTTPServer(
+            ("127.0.0.1", 0), http.server.SimpleHTTPRequestHandler
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+        self.stats_path = patch.object(
+            http_client,
+            "latency_stats_path",
+            os.path.join(self.test_dir, "latency.json"),
+        )
+        self.stats_path.start()
+
+    def test_get_client(self):
+        """Test that the client of a provider is shared, and records the latency of each endpoint"""
+        self.assertIs(get_client("test"), get_client("test"))
+        self.assertIsNot(get_client("test"), get_client("other"))
+
+        get_client("test").get(f"{self.url}/tests")
+        get_client("test").get(
+            f"{self.url}/does/not/exist", extensions={"endpoint": "/does/{id}"}
+        )
+        get_client("test").get(f"{self.url}/tests")
+
+        stats = get_http_latency_stats()
+        self.assertEqual(len(stats["buckets"]), len(LATENCY_BUCKETS) + 1)
+
+        endpoint = stats["endpoints"]["test GET /tests"]
+        self.assertEqual(endpoint["count"], 2)
+        self.assertEqual(endpoint["errors"], 0)
+        self.assertEqual(sum(endpoint["buckets"]), 2)
+        self.assertGreater(endpoint["mean"], 0)
+
+        self.assertEqual(stats["endpoints"]["test GET /does/{id}"]["errors"], 1)
+
+    def test_get_async_client(self):
+        """Test that async clients are shared by the requests of an event loop, not across loops"""
+
+        async def request():
+            client = get_async_client("test")
+            self.assertIs(client, get_async_client("test"))
+            await client.get(f"{self.url}/tests")
+            return client
+
+        first = asyncio.run(request())
+        second = asyncio.run(request())
+
+        self.assertIsNot(first, second)
+        self.assertEqual(
+            get_http_latency_stats()["endpoints"]["test GET /tests"]["count"], 2
+        )
+
+    def test_close_async_clients(self):
+        """Test that closing the async clients of an event loop closes them, and a new one replaces them"""
+
+        async def close():
+            client = get_async_client("test")
+            await close_async_clients()
+            self.assertTrue(client.is_closed)
+            self.assertIsNot(client, get_async_client("test"))
+            await close_async_clients()
+
+        asyncio.run(close())
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.stats_path.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
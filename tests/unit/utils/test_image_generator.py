@@ -1,7 +1,12 @@
 import unittest
 import os
 
-from app.utils.image_generator import generate_title_image
+from app.utils.image_generator import (
+    generate_title_image,
+    render_title_image,
+    render_title_card,
+    _load_template,
+)
 
 
 class TestTitleImageGenerator(unittest.TestCase):
@@ -30,6 +35,46 @@ class TestTitleImageGenerator(unittest.TestCase):
         # Check that the generated image is larger than the template
         self.assertTrue(os.path.getsize(output_file) > os.path.getsize(test_template))
 
+    def test_render_title_image_at_target_width(self):
+        """Test that a title image can be rendered in memory, directly at a target width"""
+        image = render_title_image("This is a title rendered at video width", 604)
+
+        template = _load_template()
+        self.assertEqual(image.mode, "RGBA")
+        self.assertEqual(image.width, 604)
+        self.assertEqual(image.height, round(template.height * 604 / template.width))
+
+    def test_render_title_card(self):
+        """Test that the title card is cropped to the visible part of the title image"""
+        card = render_title_card("This is a title rendered at video width", 604)
+
+        self.assertEqual(card.full_width, 604)
+        self.assertLess(card.image.width, card.full_width)
+        self.assertLess(card.image.height, card.full_height)
+        self.assertGreater(card.left, 0)
+        self.assertGreater(card.top, 0)
+
+        # Nothing visible was cropped off
+        full = render_title_image("This is a title rendered at video width", 604)
+        self.assertEqual(
+            full.getchannel("A").getbbox(),
+            (
+                card.left,
+                card.top,
+                card.left + card.image.width,
+                card.top + card.image.height,
+            ),
+        )
+
+    def test_template_is_cached(self):
+        """Test that the template is only loaded from disk once"""
+        render_title_image("First title")
+        misses = _load_template.cache_info().misses
+
+        render_title_image("Second title")
+
+        self.assertEqual(_load_template.cache_info().misses, misses)
+
     def test_max_title_length(self):
         """Test that a ValueError is raised if the title is too long"""
         title = "This is a very long title that will throw an error if its used for the title of a post. The reason is there is only so much space available for the title."
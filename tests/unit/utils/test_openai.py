@@ -0,0 +1,66 @@
+import asyncio
+import unittest
+
+from time import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from app.utils.http_client import close_async_clients
+from app.utils.openai import GENDER_MODEL, ContentAnalysis, analyse_content, get_client
+
+
+def completion(content: str):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+    )
+
+
+class TestOpenAI(unittest.IsolatedAsyncioTestCase):
+    @patch("app.utils.openai.get_client")
+    async def test_analyse_content(self, mock_get_client):
+        async def create(model, messages):
+            await asyncio.sleep(0.2)
+            if model == GENDER_MODEL:
+                return completion(" F\n")
+            return completion("The improved text.")
+
+        mock_get_client.return_value = MagicMock()
+        mock_get_client.return_value.chat.completions.create = create
+
+        start_time = time()
+        analysis = await analyse_content("I (25F) have a high-end car.")
+        elapsed = time() - start_time
+
+        self.assertEqual(analysis.gender, "f")
+        self.assertEqual(analysis.content, "The improved text.")
+        self.assertEqual(set(analysis.latencies), {"gender", "improve"})
+        self.assertTrue(all(latency >= 0.2 for latency in analysis.latencies.values()))
+        # Both requests run concurrently
+        self.assertLess(elapsed, 0.35)
+        self.assertIsInstance(analysis, ContentAnalysis)
+
+    @patch("app.utils.openai.get_client")
+    async def test_analyse_content_fails_if_a_request_fails(self, mock_get_client):
+        async def create(model, messages):
+            if model == GENDER_MODEL:
+                raise Exception("Rate limited")
+            return completion("The improved text.")
+
+        mock_get_client.return_value = MagicMock()
+        mock_get_client.return_value.chat.completions.create = create
+
+        with self.assertRaises(Exception):
+            await analyse_content("Some text.")
+
+    async def test_get_client(self):
+        """Test that the client is shared by the requests of the event loop, until its pool is closed"""
+        client = get_client()
+        self.assertIs(client, get_client())
+
+        await close_async_clients()
+        self.assertIsNot(client, get_client())
+        await close_async_clients()
+
+
+if __name__ == "__main__":
+    unittest.main()
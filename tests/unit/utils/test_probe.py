@@ -0,0 +1,94 @@
+import unittest
+import asyncio
+import os
+import shutil
+from unittest.mock import patch
+
+import ffmpeg
+
+from app.utils.probe import ProbeCache
+
+
+class TestProbeCache(unittest.TestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+        self.video_file = os.path.join(self.test_dir, "test_probe_video.mp4")
+        shutil.copy(
+            "tests/fixtures/unit/utils/ffmpeg/test_5_second_video.mp4", self.video_file
+        )
+
+    def test_probe_is_cached(self):
+        """Test that probing the same file twice only runs ffprobe once"""
+        cache = ProbeCache()
+
+        with patch("app.utils.probe.ffmpeg.probe", wraps=ffmpeg.probe) as mock_probe:
+            first = cache.probe(self.video_file)
+            second = cache.probe(self.video_file)
+
+        self.assertEqual(mock_probe.call_count, 1)
+        self.assertIs(first, second)
+        self.assertAlmostEqual(first.video_duration, 5, delta=0.2)
+
+    def test_modified_file_is_probed_again(self):
+        """Test that a changed file is not served from the cache"""
+        cache = ProbeCache()
+
+        with patch("app.utils.probe.ffmpeg.probe", wraps=ffmpeg.probe) as mock_probe:
+            cache.probe(self.video_file)
+            shutil.copy(
+                "tests/fixtures/unit/utils/ffmpeg/test_5_second_audio.mp3",
+                self.video_file,
+            )
+            result = cache.probe(self.video_file)
+
+        self.assertEqual(mock_probe.call_count, 2)
+        self.assertIsNone(result.video_stream)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used probe is evicted when the cache is full"""
+        cache = ProbeCache(max_entries=1)
+        audio_file = "tests/fixtures/unit/utils/ffmpeg/test_5_second_audio.mp3"
+
+        with patch("app.utils.probe.ffmpeg.probe", wraps=ffmpeg.probe) as mock_probe:
+            cache.probe(self.video_file)
+            cache.probe(audio_file)
+            cache.probe(self.video_file)
+
+        self.assertEqual(mock_probe.call_count, 3)
+
+    def test_sidecar(self):
+        """Test that a sidecar probe is reused by a new cache (ie a new process)"""
+        ProbeCache().probe(self.video_file, sidecar=True)
+
+        self.assertTrue(os.path.exists(self.video_file + ProbeCache.SIDECAR_SUFFIX))
+
+        with patch("app.utils.probe.ffmpeg.probe") as mock_probe:
+            result = ProbeCache().probe(self.video_file, sidecar=True)
+
+        mock_probe.assert_not_called()
+        self.assertAlmostEqual(result.video_duration, 5, delta=0.2)
+
+    def test_probe_async(self):
+        """Test that async probes share the cache of sync probes, without running ffmpeg.probe"""
+        cache = ProbeCache()
+
+        with patch("app.utils.probe.ffmpeg.probe") as mock_probe:
+            first = asyncio.run(cache.probe_async(self.video_file))
+            second = cache.probe(self.video_file)
+
+        mock_probe.assert_not_called()
+        self.assertIs(first, second)
+        self.assertAlmostEqual(first.video_duration, 5, delta=0.2)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
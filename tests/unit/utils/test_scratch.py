@@ -0,0 +1,65 @@
+import unittest
+import os
+import shutil
+
+from app.utils.scratch import ScratchDir
+
+
+class TestScratchDir(unittest.TestCase):
+    def setUp(self):
+        # Create directory for test files if it does not exist
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+
+        self.ram_root = os.path.join(self.test_dir, "ram")
+        self.disk_root = os.path.join(self.test_dir, "disk")
+        os.makedirs(self.ram_root, exist_ok=True)
+
+        self.scratch = ScratchDir("job", 1024, self.ram_root, self.disk_root)
+
+    def test_path_in_ram(self):
+        """Test that files under the cap are placed in the RAM dir"""
+        path = self.scratch.path("small.wav", 512)
+
+        self.assertEqual(os.path.dirname(path), os.path.join(self.ram_root, "job"))
+
+    def test_path_falls_back_to_disk(self):
+        """Test that files are placed on disk once the cap would be exceeded"""
+        with open(self.scratch.path("first.wav", 512), "wb") as f:
+            f.write(bytes(768))
+
+        path = self.scratch.path("second.wav", 512)
+
+        self.assertEqual(os.path.dirname(path), os.path.join(self.disk_root, "job"))
+        self.assertEqual(self.scratch.ram_usage(), 768)
+
+    def test_close(self):
+        """Test that closing removes the intermediate files, unless they are kept"""
+        with self.scratch as scratch:
+            ram_file = scratch.path("small.wav")
+            disk_file = scratch.path("large.mp4", 2048)
+            for path in (ram_file, disk_file):
+                open(path, "w").close()
+
+        self.assertFalse(os.path.exists(ram_file))
+        self.assertFalse(os.path.exists(disk_file))
+
+        output_dir = os.path.join(self.test_dir, "output")
+        with ScratchDir.in_dir(output_dir) as scratch:
+            kept_file = scratch.path("small.wav")
+            open(kept_file, "w").close()
+
+        self.assertEqual(kept_file, os.path.join(output_dir, "small.wav"))
+        self.assertTrue(os.path.exists(kept_file))
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for directory in ("ram", "disk", "output"):
+            shutil.rmtree(os.path.join(self.test_dir, directory), ignore_errors=True)
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()
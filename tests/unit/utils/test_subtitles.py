@@ -0,0 +1,101 @@
+import unittest
+import os
+
+from app.utils.gentle_aligner import GentleAligner
+from app.utils.subtitles import (
+    SUBTITLE_LATENCY,
+    format_ass_time,
+    escape_ass_text,
+    parse_ass_time,
+    slice_ass,
+    write_ass,
+)
+
+
+class TestSubtitles(unittest.TestCase):
+    def setUp(self):
+        """Set up test variables and environment"""
+        self.test_dir = "tmp/test"
+        os.makedirs(self.test_dir, exist_ok=True)
+        self.test_fixture_path = os.path.join(
+            "tests/fixtures/unit/utils/gentle_aligner", "test_aligned.txt"
+        )
+
+    def test_format_ass_time(self):
+        """Test that seconds are formatted as ASS timestamps"""
+        self.assertEqual(format_ass_time(0), "0:00:00.00")
+        self.assertEqual(format_ass_time(62.34), "0:01:02.34")
+        self.assertEqual(format_ass_time(3723.5), "1:02:03.50")
+
+    def test_parse_ass_time(self):
+        """Test that ASS timestamps are parsed back into seconds"""
+        self.assertAlmostEqual(parse_ass_time(format_ass_time(3723.5)), 3723.5)
+
+    def test_slice_ass(self):
+        """Test that a slice only has the events in its window, shifted and clipped to it"""
+        ass_file = os.path.join(self.test_dir, "test_subtitles.ass")
+        write_ass(
+            [
+                (0, 1, "Before"),
+                (1.5, 2.5, "Across, the start"),
+                (3, 3.5, "Inside"),
+                (5, 6, "After"),
+            ],
+            ass_file,
+        )
+
+        output_file = os.path.join(self.test_dir, "test_sliced.ass")
+        count = slice_ass(ass_file, 2, 4, output_file)
+
+        with open(output_file, "r") as f:
+            lines = f.read().splitlines()
+
+        self.assertEqual(count, 2)
+        self.assertIn("[Events]", lines)
+        events = [line for line in lines if line.startswith("Dialogue:")]
+        self.assertEqual(
+            events,
+            [
+                f"Dialogue: 0,{format_ass_time(0)},{format_ass_time(0.5 + SUBTITLE_LATENCY)},Default,,0,0,0,,Across, the start",
+                f"Dialogue: 0,{format_ass_time(1 + SUBTITLE_LATENCY)},{format_ass_time(1.5 + SUBTITLE_LATENCY)},Default,,0,0,0,,Inside",
+            ],
+        )
+
+    def test_escape_ass_text(self):
+        """Test that override tags in the text are escaped"""
+        self.assertEqual(escape_ass_text("a {b} c"), "a \\{b\\} c")
+
+    def test_write_ass_applies_offset(self):
+        """Test that the offset and latency are applied to the subtitle timings"""
+        output_file = os.path.join(self.test_dir, "test_subtitles.ass")
+        write_ass([(0.5, 1.25, "Hello world")], output_file, 2)
+
+        with open(output_file, "r") as f:
+            lines = f.read().splitlines()
+
+        start = format_ass_time(2.5 + SUBTITLE_LATENCY)
+        end = format_ass_time(3.25 + SUBTITLE_LATENCY)
+        self.assertIn(f"Dialogue: 0,{start},{end},Default,,0,0,0,,Hello world", lines)
+
+    def test_write_ass_from_aligned(self):
+        """Test that an ASS file can be written from the aligned words"""
+        with open(self.test_fixture_path, "r") as f:
+            groups = GentleAligner().group_words(f.read())
+
+        output_file = os.path.join(self.test_dir, "test_aligned.ass")
+        write_ass(groups, output_file)
+
+        with open(output_file, "r") as f:
+            dialogues = [line for line in f if line.startswith("Dialogue:")]
+
+        self.assertEqual(len(dialogues), len(groups))
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for file in os.listdir(self.test_dir):
+            if os.path.isfile(os.path.join(self.test_dir, file)):
+                os.remove(os.path.join(self.test_dir, file))
+
+
+if __name__ == "__main__":
+    unittest.main()